@@ -0,0 +1,19 @@
+"""
+Gunicorn Configuration
+Worker layout from the environment, exported to the workers so pool and stream sizing match it
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+# Each open notification stream holds one of these for its lifetime
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = 120
+
+def post_fork(server, worker):
+    # Runs before the app is imported, so utils.db and utils.notification_stream
+    # size themselves from the real layout even when it came from the command line
+    os.environ['WEB_CONCURRENCY'] = str(worker.cfg.workers)
+    os.environ['GUNICORN_THREADS'] = str(worker.cfg.threads)
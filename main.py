@@ -1,11 +1,9 @@
 from flask import Flask, render_template
 from flask_login import LoginManager
 import os
-import logging
-from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 from utils.error_handling import register_error_handlers, HealthCheck
-from utils.db import db
+from utils.db import db, init_db
 
 def create_app():
     # Load environment variables from .env file
@@ -41,23 +39,48 @@ def create_app():
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     
-    # Ensure upload folder exists
+    # Encryption at rest for uploaded evidence
+    app.config['ENCRYPTED_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'encrypted')
+    app.config['ENCRYPT_UPLOADS'] = os.environ.get('ENCRYPT_UPLOADS', 'false').lower() == 'true'
+    # Plaintext bytes per encrypted frame; also the granularity of ranged decryption
+    app.config['ENCRYPTION_FRAME_SIZE'] = int(os.environ.get('ENCRYPTION_FRAME_SIZE', 64 * 1024))
+
+    # Ensure upload folders exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['ENCRYPTED_FOLDER'], exist_ok=True)
     
-    # Initialize database
-    db.init_app(app)
+    # Initialize database (pool sizing, SQLite pragmas and query budgets from the environment)
+    init_db(app)
 
-    # Configure logging
-    log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, 'app.log')
-    
-    handler = RotatingFileHandler(log_file, maxBytes=10000, backupCount=1)
-    handler.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    app.logger.addHandler(handler)
+    # Time budget per request; retries and outbound calls stop at this deadline
+    # (kept below the gunicorn worker timeout of 120s)
+    app.config['REQUEST_DEADLINE'] = float(os.environ.get('REQUEST_DEADLINE', 60))
+
+    from flask import g
+    from utils.retry import set_deadline, clear_deadline
+    from utils.system_metrics import system_metrics
+
+    @app.before_request
+    def start_request_deadline():
+        g.deadline_token = set_deadline(app.config['REQUEST_DEADLINE'])
+
+    # Sample only in processes that serve requests (each gunicorn worker, not CLI commands)
+    @app.before_request
+    def start_system_metrics():
+        system_metrics.start()
 
+    @app.teardown_request
+    def clear_request_deadline(exc):
+        token = g.pop('deadline_token', None)
+        if token is not None:
+            clear_deadline(token)
+
+    # Request, database, cache and outbound metrics at /metrics, merged across workers
+    from utils.metrics import init_metrics
+    init_metrics(app)
+
+    # No handlers on app.logger: records propagate to the root logger, whose queue
+    # handler (utils.log_pipeline, set up by utils.error_handling) writes logs/app.log
 
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -122,6 +145,20 @@ def create_app():
     # Register error handlers
     register_error_handlers(app)
     
+    # Health probes; checks run in the background (utils.health) and requests read the last snapshot
+    from utils.health import health_monitor
+    health_monitor.init_app(app)
+
+    @app.route('/livez')
+    def liveness_check():
+        # No I/O: only proves this worker is serving requests
+        return {'status': 'alive'}
+
+    @app.route('/readyz')
+    def readiness_check():
+        ready, status = health_monitor.readiness()
+        return status, 200 if ready else 503
+
     # Health check route with detailed logging
     @app.route('/health')
     def health_check():
@@ -11,11 +11,14 @@ from utils.db import db
 from models.user import User
 # Import all models to ensure they are registered with SQLAlchemy
 from models.case import Case
-from models.evidence import Evidence
+from models.case_milestone import CaseMilestone
+from models.case_progress import CaseProgress
+from models.evidence import Evidence, EvidenceBlob
 from models.court_form import CourtForm, FormField, FormSubmission
 from models.legal_journey import LegalJourney, JourneyStep
 from models.notification import Notification
 from models.payment import Payment
+from models.job import Job
 
 # Secure password generation for production
 import secrets
@@ -45,6 +48,11 @@ def init_db_command(env):
         db.create_all()
         click.echo("✅ Database tables created successfully.")
 
+        # Bring databases created by older releases up to date
+        from utils.migrations import run_migrations
+        for version in run_migrations():
+            click.echo(f"✅ Applied migration {version}.")
+
         if env == 'production':
             # Production: Create only a secure admin user
             admin_user = User.query.filter_by(email='admin@smartdispute.ca').first()
@@ -78,7 +86,102 @@ def init_db_command(env):
 
         click.echo(f"\n🎉 Database initialization for {env} complete!")
 
+@click.command(name='migrate')
+@click.option('--list', 'list_only', is_flag=True, help='Only list pending migrations.')
+def migrate_command(list_only):
+    """Applies pending schema migrations (e.g. indexes added to existing tables)."""
+    from utils.migrations import pending_migrations, run_migrations
+    app = create_app()
+    with app.app_context():
+        if list_only:
+            pending = pending_migrations()
+            click.echo("\n".join(pending) if pending else "No pending migrations.")
+            return
+        applied = run_migrations()
+        for version in applied:
+            click.echo(f"✅ Applied migration {version}.")
+        if not applied:
+            click.echo("ℹ️ Database schema is up to date.")
+
+@click.command(name='rebuild-progress')
+@click.option('--user-id', type=int, default=None, help='Only rebuild snapshots for this user\'s cases.')
+@click.option('--batch-size', type=int, default=500, help='Cases recomputed per transaction.')
+def rebuild_progress_command(user_id, batch_size):
+    """Recomputes the per-case progress snapshots from evidence, forms and journeys."""
+    from utils.case_tracking import CaseTracker
+    app = create_app()
+    with app.app_context():
+        rebuilt = CaseTracker().rebuild_snapshots(user_id=user_id, batch_size=batch_size)
+        click.echo(f"✅ Rebuilt progress snapshots for {rebuilt} case(s).")
+
+@click.command(name='recount-notifications')
+@click.option('--user-id', type=int, default=None, help='Only recount this user\'s notifications.')
+def recount_notifications_command(user_id):
+    """Rebuilds the per-user notification counters from the notifications table."""
+    from utils.notification_system import notification_manager
+    app = create_app()
+    with app.app_context():
+        recounted = notification_manager.recount([user_id] if user_id else None)
+        click.echo(f"✅ Recounted notifications for {recounted} user(s).")
+
+@click.command(name='gc-blobs')
+@click.option('--min-age', type=int, default=None, help='Only remove files older than this many seconds (default: 3600).')
+def gc_blobs_command(min_age):
+    """Removes stored evidence blobs that no database row references."""
+    from utils.blob_store import BlobStore
+    app = create_app()
+    with app.app_context():
+        removed = BlobStore().collect_garbage(min_age)
+        click.echo(f"✅ Removed {removed} unreferenced blob(s).")
+
+@click.command(name='gc-uploads')
+@click.option('--max-age', type=int, default=None, help='Remove sessions idle for this many seconds (default: UPLOAD_SESSION_TTL).')
+def gc_uploads_command(max_age):
+    """Removes abandoned resumable upload sessions."""
+    from utils.chunked_upload import ChunkedUploadManager
+    app = create_app()
+    with app.app_context():
+        removed = ChunkedUploadManager().collect_garbage(max_age)
+        click.echo(f"✅ Removed {removed} abandoned upload session(s).")
+
+@click.command(name='worker')
+@click.option('--processes', type=int, default=1, help='Number of worker processes.')
+@click.option('--concurrency', type=int, default=2, help='Jobs run concurrently per process.')
+@click.option('--visibility-timeout', type=int, default=300, help='Seconds a claimed job stays hidden from other workers.')
+@click.option('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+def worker_command(processes, concurrency, visibility_timeout, poll_interval):
+    """Runs background job workers (evidence analysis, notifications)."""
+    from utils.job_queue import run_worker_process
+    click.echo(f"Starting {processes} worker process(es) x {concurrency} thread(s)...")
+    if processes == 1:
+        run_worker_process(concurrency, visibility_timeout, poll_interval)
+        return
+
+    import multiprocessing
+    import signal
+    workers = [
+        multiprocessing.Process(target=run_worker_process, args=(concurrency, visibility_timeout, poll_interval))
+        for _ in range(processes)
+    ]
+    for process in workers:
+        process.start()
+
+    def shutdown(signum, frame):
+        for process in workers:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for process in workers:
+        process.join()
+
 cli.add_command(init_db_command)
+cli.add_command(migrate_command)
+cli.add_command(rebuild_progress_command)
+cli.add_command(recount_notifications_command)
+cli.add_command(gc_blobs_command)
+cli.add_command(gc_uploads_command)
+cli.add_command(worker_command)
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
@@ -22,6 +22,11 @@ class CaseStatus(Enum):
 
 class Case(db.Model):
     __tablename__ = 'cases'
+    __table_args__ = (
+        # Per-user case lists, newest or most recently updated first
+        db.Index('ix_cases_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_cases_user_id_updated_at', 'user_id', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -0,0 +1,34 @@
+from utils.db import db
+from datetime import datetime
+
+class CaseMilestone(db.Model):
+    """Append-only milestone event for a case; rows are inserted, never updated"""
+    __tablename__ = 'case_milestones'
+    __table_args__ = (
+        # Ordered, bounded scans of one case's history
+        db.Index('ix_case_milestones_case_id_occurred_at', 'case_id', 'occurred_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id', ondelete='CASCADE'), nullable=False)
+    milestone_type = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    data = db.Column(db.JSON)
+    created_by = db.Column(db.Integer)
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CaseMilestone {self.id}: {self.milestone_type} on case {self.case_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'case_id': self.case_id,
+            'type': self.milestone_type,
+            'title': self.title,
+            'description': self.description,
+            'data': self.data or {},
+            'date': self.occurred_at.isoformat() if self.occurred_at else None
+        }
@@ -0,0 +1,61 @@
+from utils.db import db
+from datetime import datetime
+
+class CaseProgress(db.Model):
+    """Materialized progress for one case, kept current by the hooks in utils.case_tracking"""
+    __tablename__ = 'case_progress'
+    __table_args__ = (
+        db.Index('ix_case_progress_user_id', 'user_id'),
+    )
+
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    overall_progress = db.Column(db.Integer, nullable=False, default=0)
+    current_stage = db.Column(db.String(50), nullable=False, default='preparation')
+    milestone_count = db.Column(db.Integer, nullable=False, default=0)
+    evidence_count = db.Column(db.Integer, nullable=False, default=0)
+    form_count = db.Column(db.Integer, nullable=False, default=0)
+    stage_progress = db.Column(db.JSON)
+    next_actions = db.Column(db.JSON)
+    blocking_issues = db.Column(db.JSON)
+    progress_trend = db.Column(db.JSON)
+    last_activity = db.Column(db.DateTime)
+    estimated_completion = db.Column(db.Date)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CaseProgress {self.case_id}: {self.overall_progress}%>'
+
+    def update_from(self, progress):
+        """Copy a progress dict from CaseTracker into this snapshot"""
+        self.overall_progress = progress['overall_progress']
+        self.current_stage = progress['current_stage']
+        self.milestone_count = progress['milestone_count']
+        self.evidence_count = progress['evidence_count']
+        self.form_count = progress['form_count']
+        self.stage_progress = progress['stage_progress']
+        self.next_actions = progress['next_actions']
+        self.blocking_issues = progress['blocking_issues']
+        self.progress_trend = progress['progress_trend']
+        self.last_activity = datetime.fromisoformat(progress['last_activity']) if progress['last_activity'] else None
+        self.estimated_completion = (datetime.fromisoformat(progress['estimated_completion']).date()
+                                     if progress['estimated_completion'] else None)
+        self.computed_at = datetime.utcnow()
+
+    def to_dict(self):
+        return {
+            'case_id': self.case_id,
+            'overall_progress': self.overall_progress,
+            'current_stage': self.current_stage,
+            'stage_progress': self.stage_progress or {},
+            'next_actions': self.next_actions or [],
+            'blocking_issues': self.blocking_issues or [],
+            'progress_trend': self.progress_trend or {},
+            'milestone_count': self.milestone_count,
+            'evidence_count': self.evidence_count,
+            'form_count': self.form_count,
+            'last_activity': self.last_activity.isoformat() if self.last_activity else None,
+            'estimated_completion': self.estimated_completion.isoformat() if self.estimated_completion else None,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None,
+            'milestones': []
+        }
@@ -10,6 +10,10 @@ class EvidenceStatus(PyEnum):
 
 class Evidence(db.Model):
     __tablename__ = 'evidence'
+    __table_args__ = (
+        db.Index('ix_evidence_case_id_uploaded_at', 'case_id', 'uploaded_at'),
+        db.Index('ix_evidence_user_id_uploaded_at', 'user_id', 'uploaded_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -29,6 +33,7 @@ class Evidence(db.Model):
     # Relationships
     case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    case = db.relationship('Case', backref=db.backref('evidence', lazy=True))
 
     # AI Analysis fields (optional, for future use)
     ai_relevance_score = db.Column(db.Float, nullable=True)
@@ -40,4 +45,19 @@ class Evidence(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)  # When file was uploaded
 
     def __repr__(self):
-        return f'<Evidence {self.id}: {self.original_filename}>'
\ No newline at end of file
+        return f'<Evidence {self.id}: {self.original_filename}>'
+
+class EvidenceBlob(db.Model):
+    """Content-addressed file shared by every Evidence row with the same hash"""
+    __tablename__ = 'evidence_blobs'
+
+    file_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the plaintext
+    file_path = db.Column(db.String(500), nullable=False)
+    file_size = db.Column(db.Integer)
+    mime_type = db.Column(db.String(100))
+    encrypted = db.Column(db.Boolean, default=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EvidenceBlob {self.file_hash[:12]} refs={self.ref_count}>'
@@ -63,7 +63,8 @@ class LegalJourney(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    stages = db.relationship('JourneyStage', backref='journey', lazy=True, cascade='all, delete-orphan')
+    stages = db.relationship('JourneyStage', backref='journey', lazy=True, cascade='all, delete-orphan',
+                             foreign_keys='JourneyStage.journey_id')
     
     def __repr__(self):
         return f'<LegalJourney {self.id}: {self.journey_type}>'
@@ -20,6 +20,12 @@ class NotificationPriority(PyEnum):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+        # Unread badge and unread lists only touch unread rows
+        db.Index('ix_notifications_unread', 'user_id', 'created_at',
+                 postgresql_where=db.text('is_read = false'), sqlite_where=db.text('is_read = 0')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -33,4 +39,19 @@ class Notification(db.Model):
     action_url = db.Column(db.String(255))
     
     def __repr__(self):
-        return f'<Notification {self.id}: {self.title}>'
\ No newline at end of file
+        return f'<Notification {self.id}: {self.title}>'
+
+class NotificationCounter(db.Model):
+    """Per-user notification counts, adjusted by NotificationManager in the same transaction as the rows"""
+    __tablename__ = 'notification_counters'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    urgent_count = db.Column(db.Integer, nullable=False, default=0)
+    high_count = db.Column(db.Integer, nullable=False, default=0)
+    deadline_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificationCounter {self.user_id}: {self.unread_count} unread>'
@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
 from utils.db import db
+from utils.pagination import paginate_request, wants_json
+from utils.system_metrics import system_metrics
 from models.user import User
 from flask_login import login_required, current_user
 
@@ -12,8 +14,11 @@ def dashboard():
         flash('Access denied: Admins only', 'danger')
         return redirect(url_for('dashboard.main'))
     
-    users = db.session.query(User).all()
-    return render_template('admin/dashboard.html', users=users)
+    # Users have no creation timestamp; newest ids first
+    page = paginate_request(db.session.query(User), (User.id,))
+    if wants_json():
+        return jsonify(page.to_dict(_user_json, key='users'))
+    return render_template('admin/dashboard.html', users=page.items, page=page)
 
 @admin_bp.route('/manage_users')
 @login_required
@@ -22,5 +27,28 @@ def manage_users():
         flash('Access denied: Admins only', 'danger')
         return redirect(url_for('dashboard.main'))
     
-    users = db.session.query(User).all()
-    return render_template('admin/manage_users.html', users=users)
+    page = paginate_request(db.session.query(User), (User.id,), default_limit=50)
+    if wants_json():
+        return jsonify(page.to_dict(_user_json, key='users'))
+    return render_template('admin/manage_users.html', users=page.items, page=page)
+
+@admin_bp.route('/api/system_stats')
+@login_required
+def api_system_stats():
+    """Process and per-worker resource usage from the background sampler; no psutil calls"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    window = request.args.get('window', type=float)
+    return jsonify({
+        'process': system_metrics.summary(window=window),
+        'workers': system_metrics.workers()
+    })
+
+def _user_json(user):
+    return {
+        'id': user.id,
+        'email': user.email,
+        'is_admin': user.is_admin,
+        'is_active': user.is_active
+    }
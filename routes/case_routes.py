@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from utils.db import db
+from utils.pagination import paginate_request, wants_json
 from models.case import Case
 from flask_login import login_required, current_user
 
@@ -35,8 +36,24 @@ def create_case():
 @case_bp.route('/list')
 @login_required
 def list_cases():
-    user_cases = db.session.query(Case).filter_by(user_id=current_user.id).all()
-    return render_template('cases/list.html', cases=user_cases)
+    page = paginate_request(db.session.query(Case).filter_by(user_id=current_user.id),
+                            (Case.created_at, Case.id))
+    if wants_json():
+        return jsonify(page.to_dict(_case_json, key='cases'))
+    return render_template('cases/list.html', cases=page.items, page=page)
+
+def _case_json(case):
+    return {
+        'id': case.id,
+        'title': case.title,
+        'case_number': case.case_number,
+        'status': case.status.value if case.status else None,
+        'case_type': case.case_type.value if case.case_type else None,
+        'province': case.province,
+        'completion_percentage': case.completion_percentage or 0,
+        'created_at': case.created_at.isoformat() if case.created_at else None,
+        'updated_at': case.updated_at.isoformat() if case.updated_at else None
+    }
 
 @case_bp.route('/view/<int:case_id>')
 @login_required
@@ -5,7 +5,7 @@ from models.case import Case
 from models.evidence import Evidence
 from models.court_form import FormSubmission
 from models.notification import Notification
-from utils.dashboard import DashboardManager
+from utils.dashboard import dashboard_manager
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -13,6 +13,5 @@ dashboard_bp = Blueprint('dashboard', __name__)
 @login_required
 def main_dashboard():
     """Main dashboard view"""
-    manager = DashboardManager()
-    dashboard_data = manager.get_user_dashboard(current_user.id)
+    dashboard_data = dashboard_manager.get_user_dashboard(current_user.id)
     return render_template('dashboard/main.html', **dashboard_data)
\ No newline at end of file
@@ -1,9 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from models.evidence import Evidence
 from models.case import Case
 from utils.db import db
 from utils.file_upload import get_file_upload_handler
+from utils.blob_store import create_evidence, delete_evidence as delete_evidence_record
+from utils.chunked_upload import ChunkedUploadManager, ChunkedUploadError
+from utils.evidence_processor import schedule_evidence_processing
 
 evidence_bp = Blueprint('evidence', __name__, url_prefix='/evidence')
 
@@ -24,15 +27,17 @@ def upload_evidence(case_id):
         
         try:
             handler = get_file_upload_handler()
-            file_path = handler.upload_file(file, case_id, current_user.id)
+            staged_path, file_info = handler.save_file(file, 'temp')
             
-            evidence = Evidence(
-                case_id=case_id,
-                file_path=file_path,
+            # Identical content already on file is shared rather than stored again
+            evidence = create_evidence(
+                case, current_user.id, staged_path, file_info,
+                title=request.form.get('title', ''),
                 description=request.form.get('description', ''),
-                uploaded_by=current_user.id
+                evidence_type=request.form.get('evidence_type', '')
             )
-            db.session.add(evidence)
+            # AI analysis and notifications run in the background job queue
+            schedule_evidence_processing(evidence)
             db.session.commit()
             
             flash('Evidence uploaded successfully', 'success')
@@ -44,6 +49,118 @@ def upload_evidence(case_id):
     
     return render_template('evidence/upload.html', case=case)
 
+@evidence_bp.route('/upload/<int:case_id>/sessions', methods=['POST'])
+@login_required
+def init_chunked_upload(case_id):
+    """Start a resumable upload session for a large evidence file"""
+    case = Case.query.get_or_404(case_id)
+    if case.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Case not found or access denied'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        session = ChunkedUploadManager().init_session(
+            user_id=current_user.id,
+            case_id=case_id,
+            filename=data.get('filename', ''),
+            total_size=_parse_size(data.get('total_size')),
+            metadata={
+                'title': data.get('title', ''),
+                'description': data.get('description', ''),
+                'evidence_type': data.get('evidence_type', '')
+            }
+        )
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({'success': True, **session}), 201
+
+def _parse_size(value):
+    """A declared byte count from JSON: an integer or a string of digits"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ChunkedUploadError("total_size must be a whole number of bytes")
+
+@evidence_bp.route('/upload/sessions/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def put_upload_chunk(upload_id, index):
+    """Store one numbered chunk; safe to retry"""
+    try:
+        session = ChunkedUploadManager().put_chunk(
+            upload_id, current_user.id, index, request.stream,
+            expected_sha256=request.headers.get('X-Chunk-SHA256')
+        )
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({'success': True, **session})
+
+@evidence_bp.route('/upload/sessions/<upload_id>', methods=['GET'])
+@login_required
+def upload_session_status(upload_id):
+    """Report which chunks have been received so a client can resume"""
+    try:
+        session = ChunkedUploadManager().status(upload_id, current_user.id)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    
+    return jsonify({'success': True, **session})
+
+@evidence_bp.route('/upload/sessions/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_chunked_upload(upload_id):
+    """Abandon an upload session and remove its chunks"""
+    manager = ChunkedUploadManager()
+    try:
+        manager.load_session(upload_id, current_user.id)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    
+    manager.discard(upload_id)
+    return jsonify({'success': True})
+
+@evidence_bp.route('/upload/sessions/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_chunked_upload(upload_id):
+    """Assemble the chunks and create the Evidence record"""
+    manager = ChunkedUploadManager()
+    try:
+        reader, manifest = manager.open_assembled(upload_id, current_user.id)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    case = Case.query.get(manifest['case_id'])
+    if not case or case.user_id != current_user.id:
+        manager.discard(upload_id)
+        return jsonify({'success': False, 'error': 'Case not found or access denied'}), 404
+    
+    try:
+        # Assembly goes through the same validating ingest as single-request uploads
+        handler = get_file_upload_handler()
+        staged_path, file_info = handler.ingest_stream(
+            reader, manifest['filename'], 'temp',
+            encrypt=current_app.config.get('ENCRYPT_UPLOADS', False)
+        )
+        evidence = create_evidence(case, current_user.id, staged_path, file_info, **manifest['metadata'])
+        schedule_evidence_processing(evidence)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        manager.release(upload_id)
+        return jsonify({'success': False, 'error': f'Error uploading evidence: {str(e)}'}), 400
+    finally:
+        reader.close()
+    
+    manager.discard(upload_id)
+    return jsonify({
+        'success': True,
+        'evidence_id': evidence.id,
+        'file_hash': evidence.file_hash,
+        'redirect_url': url_for('case.view_case', case_id=case.id)
+    }), 201
+
 @evidence_bp.route('/review/<int:evidence_id>')
 @login_required
 def review_evidence(evidence_id):
@@ -64,14 +181,13 @@ def delete_evidence(evidence_id):
         flash('You do not have permission to delete this evidence', 'danger')
         return redirect(url_for('case.list_cases'))
     
+    case_id = evidence.case_id
     try:
-        handler = get_file_upload_handler()
-        handler.delete_file(evidence.file_path)
-        db.session.delete(evidence)
-        db.session.commit()
+        # The stored file is only unlinked once no other evidence references it
+        delete_evidence_record(evidence)
         flash('Evidence deleted successfully', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting evidence: {str(e)}', 'danger')
     
-    return redirect(url_for('case.view_case', case_id=evidence.case_id))
\ No newline at end of file
+    return redirect(url_for('case.view_case', case_id=case_id))
\ No newline at end of file
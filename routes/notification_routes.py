@@ -3,12 +3,14 @@ Notification Routes
 Handles user notifications, reminders, and alerts
 """
 
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
+from flask import Blueprint, Response, request, jsonify, render_template, redirect, url_for, flash, stream_with_context
 from flask_login import login_required, current_user
 from models.notification import Notification, NotificationType, NotificationPriority
 from models.case import Case
 from utils.db import db
 from utils.notification_system import NotificationManager, DeadlineType, notification_manager
+from utils.notification_stream import client_disconnected, notification_broker
+from utils.pagination import paginate_request
 from datetime import datetime, timedelta
 import json
 
@@ -18,12 +20,8 @@ notification_bp = Blueprint('notifications', __name__, url_prefix='/notification
 @login_required
 def list_notifications():
     """Display user's notifications"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(
-        Notification.created_at.desc()
-    ).paginate(page=page, per_page=per_page, error_out=False)
+    notifications = paginate_request(Notification.query.filter_by(user_id=current_user.id),
+                                     (Notification.created_at, Notification.id))
     
     # Get notification summary
     summary = notification_manager.get_notification_summary(current_user.id)
@@ -37,15 +35,21 @@ def list_notifications():
 def api_list_notifications():
     """API endpoint for notifications"""
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-    limit = request.args.get('limit', 50, type=int)
+    priority = request.args.get('priority')
     
-    notifications = notification_manager.get_user_notifications(
-        current_user.id, unread_only=unread_only, limit=limit
-    )
+    query = Notification.query.filter_by(user_id=current_user.id)
+    if unread_only:
+        query = query.filter_by(is_read=False)
+    if priority in {p.value for p in NotificationPriority}:
+        query = query.filter_by(priority=NotificationPriority(priority))
+    page = paginate_request(query, (Notification.created_at, Notification.id), default_limit=50)
     
-    notification_data = []
-    for notification in notifications:
-        notification_data.append({
+    # One lookup for the case titles on this page
+    case_ids = {n.related_case_id for n in page.items if n.related_case_id}
+    case_titles = dict(db.session.query(Case.id, Case.title).filter(Case.id.in_(case_ids)).all()) if case_ids else {}
+    
+    def serialize(notification):
+        return {
             'id': notification.id,
             'type': notification.notification_type.value,
             'title': notification.title,
@@ -53,17 +57,16 @@ def api_list_notifications():
             'priority': notification.priority.value,
             'is_read': notification.is_read,
             'created_at': notification.created_at.isoformat(),
-            'case_id': notification.case_id,
-            'case_title': notification.case.title if notification.case else None,
+            'case_id': notification.related_case_id,
+            'case_title': case_titles.get(notification.related_case_id),
             'action_url': notification.action_url,
             'icon': get_notification_icon(notification.notification_type),
             'color': get_notification_color(notification.priority)
-        })
+        }
     
-    return jsonify({
-        'notifications': notification_data,
-        'total_count': len(notification_data)
-    })
+    data = page.to_dict(serialize, key='notifications')
+    data['total_count'] = len(data['notifications'])
+    return jsonify(data)
 
 @notification_bp.route('/api/summary')
 @login_required
@@ -186,7 +189,7 @@ def notification_settings():
 @login_required
 def api_recent_notifications():
     """Get recent notifications for header/navbar display"""
-    limit = request.args.get('limit', 5, type=int)
+    limit = min(max(request.args.get('limit', 5, type=int), 1), 20)
     
     recent = notification_manager.get_user_notifications(
         current_user.id, unread_only=True, limit=limit
@@ -206,13 +209,51 @@ def api_recent_notifications():
             'color': get_notification_color(notification.priority)
         })
     
-    unread_count = notification_manager.get_notification_summary(current_user.id)['unread_count']
+    # Counter row, not a count over the notifications table
+    unread_count = notification_manager.get_unread_count(current_user.id)
     
     return jsonify({
         'notifications': notifications_data,
         'unread_count': unread_count
     })
 
+@notification_bp.route('/stream')
+@login_required
+def notification_stream():
+    """Server-Sent Events: new notifications and unread counts as they change"""
+    user_id = current_user.id
+    subscription = notification_broker.subscribe(user_id)
+    if subscription is None:
+        # At this worker's cap; EventSource gives up on a non-200 and main.js falls back to polling
+        return jsonify({'error': 'Too many open notification streams'}), 503, {'Retry-After': '60'}
+
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('last_event_id', type=int)
+
+    # Each load releases its connection; the stream stays open far longer than a request
+    def load_counts():
+        try:
+            return notification_manager.get_notification_summary(user_id)
+        finally:
+            db.session.close()
+
+    def load_missed(last_id):
+        try:
+            return notification_manager.get_notifications_since(user_id, last_id)
+        finally:
+            db.session.close()
+
+    stream = notification_broker.stream(subscription, last_event_id, load_counts, load_missed,
+                                        client_disconnected(request.environ))
+    response = Response(stream_with_context(stream), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # The generator's own cleanup never runs if the client leaves before the first frame
+    response.call_on_close(lambda: notification_broker.unsubscribe(subscription))
+    return response
+
 @notification_bp.route('/widget')
 @login_required
 def notification_widget():
@@ -236,7 +277,7 @@ def test_notification():
     
     notification = notification_manager.create_notification(
         user_id=current_user.id,
-        notification_type=NotificationType.SYSTEM,
+        notif_type=NotificationType.SYSTEM_ALERT,
         title="Test Notification",
         message="This is a test notification to verify the system is working correctly.",
         priority=NotificationPriority.LOW
@@ -252,13 +293,11 @@ def get_notification_icon(notification_type: NotificationType) -> str:
     """Get appropriate icon for notification type"""
     icons = {
         NotificationType.CASE_UPDATE: 'fas fa-folder',
-        NotificationType.EVIDENCE_UPDATE: 'fas fa-file-upload',
-        NotificationType.FORM_UPDATE: 'fas fa-file-alt',
-        NotificationType.JOURNEY_UPDATE: 'fas fa-route',
-        NotificationType.DEADLINE: 'fas fa-clock',
-        NotificationType.REMINDER: 'fas fa-bell',
-        NotificationType.PROGRESS_UPDATE: 'fas fa-chart-line',
-        NotificationType.SYSTEM: 'fas fa-cog'
+        NotificationType.DOCUMENT_UPLOAD: 'fas fa-file-upload',
+        NotificationType.FORM_SUBMISSION: 'fas fa-file-alt',
+        NotificationType.PAYMENT_RECEIVED: 'fas fa-dollar-sign',
+        NotificationType.HEARING_REMINDER: 'fas fa-clock',
+        NotificationType.SYSTEM_ALERT: 'fas fa-cog'
     }
     return icons.get(notification_type, 'fas fa-info-circle')
 
@@ -6,6 +6,7 @@ E-transfer payment processing for Canadian legal services
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
 from utils.payment_system import payment_manager
+from utils.pagination import CursorError, DEFAULT_PAGE_SIZE, wants_json
 from models.case import Case
 from utils.db import db  # Corrected import
 import logging
@@ -18,13 +19,33 @@ logger = logging.getLogger(__name__)
 def payment_dashboard():
     """Payment dashboard showing user's payment history"""
     try:
-        user_payments = payment_manager.get_user_payments(current_user.id)
-        return render_template('payment/dashboard.html', payments=user_payments)
+        page = payment_manager.get_user_payments(
+            current_user.id,
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        )
+        if wants_json():
+            return jsonify(page.to_dict(_payment_json, key='payments'))
+        return render_template('payment/dashboard.html', payments=page.items, page=page)
+    except CursorError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error loading payment dashboard: {str(e)}")
         flash('Error loading payment information', 'error')
         return redirect(url_for('dashboard.main'))
 
+def _payment_json(payment):
+    return {
+        'id': payment.id,
+        'service_type': payment.service_type,
+        'amount': payment.amount,
+        'currency': payment.currency,
+        'status': payment.status.value if payment.status else None,
+        'case_id': payment.case_id,
+        'created_at': payment.created_at.isoformat() if payment.created_at else None,
+        'processed_at': payment.processed_at.isoformat() if payment.processed_at else None
+    }
+
 @payment_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create_payment():
@@ -3,32 +3,132 @@ Secure File Routes
 Handles secure file upload, download, and management with access controls
 """
 
-from flask import Blueprint, request, jsonify, send_file, abort, flash, redirect, url_for, render_template
+from flask import Blueprint, Response, request, jsonify, send_file, abort, flash, redirect, url_for, render_template
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from models.case import Case
 from models.evidence import Evidence
 from utils.db import db
 from utils.secure_storage import SecureFileManager, require_file_access, get_client_ip
+from utils.blob_store import delete_evidence
+from utils.pagination import paginate_request, wants_json
 import os
 import tempfile
+import uuid
 from datetime import datetime
 
 secure_file_bp = Blueprint('secure_files', __name__, url_prefix='/secure-files')
 
 @secure_file_bp.route('/download/<int:file_id>')
+@login_required
 @require_file_access
 def download_secure_file(file_id):
-    """Download a secure file"""
+    """Download a secure file, honouring Range and If-Range requests"""
     try:
+        file = Evidence.query.get(file_id)
+        mimetype = file.mime_type or 'application/octet-stream'
+        if not _is_encrypted(file.file_path):
+            return send_file(file.file_path, mimetype=mimetype, as_attachment=True,
+                             download_name=file.original_filename, etag=file.file_hash,
+                             conditional=True)
+
         file_manager = SecureFileManager()
-        file_data = file_manager.get_file(file_id)
-        return send_file(file_data, as_attachment=True, download_name=f"file_{file_id}.bin")
+        total_size = file_manager.plaintext_size(file.file_path)
+        response = _ranged_response(file_manager, file, total_size, mimetype)
+        download_name = secure_filename(file.original_filename) or f"file_{file_id}"
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        return response
     except Exception as e:
         flash(str(e), 'error')
         return redirect(url_for('secure_files.manage_secure_files'))
 
+def _is_encrypted(file_path):
+    """Encrypted evidence is stored with an .enc suffix"""
+    return file_path.endswith('.enc')
+
+def _resolve_ranges(total_size, etag):
+    """
+    Turn the request's Range header into absolute (start, end) pairs.
+
+    Returns None when the whole file should be sent (no Range header, or an
+    If-Range validator that no longer matches) and an empty list when no
+    requested range is satisfiable.
+    """
+    byte_range = request.range
+    if byte_range is None or byte_range.units != 'bytes':
+        return None
+
+    if_range = request.if_range
+    if if_range.etag is not None or if_range.date is not None:
+        # Only strong ETag validators are usable with If-Range
+        if if_range.etag is None or if_range.etag != etag:
+            return None
+
+    ranges = []
+    for start, stop in byte_range.ranges:
+        if start < 0:
+            start = max(total_size + start, 0)
+            stop = total_size
+        elif stop is None or stop > total_size:
+            stop = total_size
+        if start < stop:
+            ranges.append((start, stop - 1))
+    return ranges
+
+def _ranged_response(file_manager, file, total_size, mimetype):
+    """Build a 200/206/304/416 response that decrypts only the requested frames"""
+    etag = file.file_hash
+
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    ranges = _resolve_ranges(total_size, etag) if etag else None
+    if ranges == []:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f'bytes */{total_size}'
+        return response
+
+    if ranges is None:
+        response = Response(file_manager.iter_decrypt(file.file_path), status=200, mimetype=mimetype)
+        response.content_length = total_size
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = Response(file_manager.iter_decrypt(file.file_path, start, end), status=206, mimetype=mimetype)
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{total_size}'
+        response.content_length = end - start + 1
+    else:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for start, end in ranges:
+            head = (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {mimetype}\r\n'
+                f'Content-Range: bytes {start}-{end}/{total_size}\r\n\r\n'
+            ).encode('latin-1')
+            parts.append((head, start, end))
+        closing = f'\r\n--{boundary}--\r\n'.encode('latin-1')
+
+        def generate():
+            for head, start, end in parts:
+                yield head
+                for chunk in file_manager.iter_decrypt(file.file_path, start, end):
+                    yield chunk
+            yield closing
+
+        response = Response(generate(), status=206,
+                            mimetype=f'multipart/byteranges; boundary={boundary}')
+        response.content_length = sum(len(head) + end - start + 1 for head, start, end in parts) + len(closing)
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Cache-Control'] = 'private, no-transform'
+    if etag:
+        response.set_etag(etag)
+    return response
+
 @secure_file_bp.route('/view/<int:file_id>')
+@login_required
 @require_file_access
 def view_secure_file(file_id):
     """View file metadata"""
@@ -39,14 +139,15 @@ def view_secure_file(file_id):
     return render_template('files/view.html', file=file)
 
 @secure_file_bp.route('/delete/<int:file_id>', methods=['POST'])
+@login_required
 @require_file_access
 def delete_secure_file(file_id):
     """Delete a secure file"""
     try:
-        file_manager = SecureFileManager()
-        file_manager.delete_file(file_id)
+        delete_evidence(Evidence.query.get(file_id))
         flash('File deleted successfully', 'success')
     except Exception as e:
+        db.session.rollback()
         flash(str(e), 'error')
     return redirect(url_for('secure_files.manage_secure_files'))
 
@@ -54,5 +155,31 @@ def delete_secure_file(file_id):
 @login_required
 def manage_secure_files():
     """Manage user's secure files"""
-    user_files = Evidence.query.filter_by(uploaded_by=current_user.id).all()
-    return render_template('files/manage.html', files=user_files)
\ No newline at end of file
+    page = paginate_request(Evidence.query.filter_by(user_id=current_user.id),
+                            (Evidence.uploaded_at, Evidence.id))
+    if wants_json():
+        return jsonify(page.to_dict(_file_json, key='files'))
+    return render_template('files/manage.html', files=page.items, page=page)
+
+@secure_file_bp.route('/list/<int:case_id>')
+@login_required
+def list_secure_files(case_id):
+    """JSON page of the user's files, for one case or all cases (case_id 0)"""
+    query = Evidence.query.filter_by(user_id=current_user.id)
+    if case_id:
+        query = query.filter_by(case_id=case_id)
+    page = paginate_request(query, (Evidence.uploaded_at, Evidence.id))
+    return jsonify(dict(page.to_dict(_file_json, key='files'), success=True))
+
+def _file_json(file):
+    return {
+        'id': file.id,
+        'case_id': file.case_id,
+        'title': file.title,
+        'original_filename': file.original_filename,
+        'mime_type': file.mime_type,
+        'file_size': file.file_size,
+        'encrypted': _is_encrypted(file.file_path),
+        'status': file.status.value if file.status else None,
+        'uploaded_at': file.uploaded_at.isoformat() if file.uploaded_at else None
+    }
\ No newline at end of file
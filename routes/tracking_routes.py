@@ -8,6 +8,8 @@ from flask_login import login_required, current_user
 from models.case import Case
 from utils.db import db
 from utils.case_tracking import CaseTracker, MilestoneType
+from models.case_milestone import CaseMilestone
+from utils.pagination import paginate_request
 from datetime import datetime, timedelta
 import json
 
@@ -23,7 +25,7 @@ def case_progress(case_id):
         return redirect(url_for('cases.list_cases'))
     
     tracker = CaseTracker()
-    progress_data = tracker.get_case_progress(case_id)
+    progress_data = tracker.get_case_progress(case)
     
     return render_template('tracking/case_progress.html', 
                          case=case, 
@@ -38,7 +40,7 @@ def api_case_progress(case_id):
         return jsonify({'error': 'Case not found or access denied'}), 404
     
     tracker = CaseTracker()
-    progress_data = tracker.get_case_progress(case_id)
+    progress_data = tracker.get_case_progress(case)
     
     return jsonify(progress_data)
 
@@ -50,13 +52,12 @@ def api_case_milestones(case_id):
     if not case:
         return jsonify({'error': 'Case not found or access denied'}), 404
     
-    tracker = CaseTracker()
-    milestones = tracker._get_case_milestones(case_id)
-    
-    return jsonify({
-        'case_id': case_id,
-        'milestones': milestones
-    })
+    # Newest first, one bounded page of the milestone table at a time
+    page = paginate_request(CaseTracker().milestones_query(case_id),
+                            (CaseMilestone.occurred_at, CaseMilestone.id), default_limit=50)
+    data = page.to_dict(lambda milestone: milestone.to_dict(), key='milestones')
+    data['case_id'] = case_id
+    return jsonify(data)
 
 @tracking_bp.route('/api/case/<int:case_id>/next-actions')
 @login_required
@@ -67,7 +68,7 @@ def api_next_actions(case_id):
         return jsonify({'error': 'Case not found or access denied'}), 404
     
     tracker = CaseTracker()
-    progress_data = tracker.get_case_progress(case_id)
+    progress_data = tracker.get_case_progress(case)
     
     return jsonify({
         'case_id': case_id,
@@ -93,17 +94,12 @@ def progress_overview():
     
     tracker = CaseTracker()
     
-    # Get progress for each case
-    cases_progress = []
-    for case in user_cases:
-        progress_data = tracker.get_case_progress(case.id)
-        cases_progress.append({
-            'case': case,
-            'progress': progress_data
-        })
+    # Stored progress snapshots for every case in one lookup
+    progress = tracker.get_progress_snapshots(user_cases)
+    cases_progress = [{'case': case, 'progress': progress[case.id]} for case in user_cases]
     
     # Get overall statistics
-    stats = tracker.get_case_statistics(current_user.id)
+    stats = tracker.get_case_statistics(current_user.id, cases=user_cases, progress=progress)
     
     return render_template('tracking/progress_overview.html', 
                          cases_progress=cases_progress,
@@ -131,12 +127,12 @@ def add_milestone():
         tracker = CaseTracker()
         
         # Parse date if provided
-        custom_data = {}
+        occurred_at = None
         if milestone_date:
             try:
                 parsed_date = datetime.fromisoformat(milestone_date.replace('Z', '+00:00'))
-                custom_data['date'] = parsed_date.isoformat()
-            except:
+                occurred_at = parsed_date.replace(tzinfo=None) - (parsed_date.utcoffset() or timedelta(0))
+            except ValueError:
                 pass
         
         success = tracker.record_milestone(
@@ -144,7 +140,8 @@ def add_milestone():
             milestone_type=MilestoneType.CUSTOM,
             title=title,
             description=description,
-            custom_data=custom_data
+            occurred_at=occurred_at,
+            user_id=current_user.id
         )
         
         if success:
@@ -163,113 +160,7 @@ def api_case_timeline(case_id):
     if not case:
         return jsonify({'error': 'Case not found or access denied'}), 404
     
-    # Build comprehensive timeline from various sources
-    timeline_events = []
-    
-    # Case events
-    timeline_events.append({
-        'type': 'case_created',
-        'title': 'Case Created',
-        'description': f'Case "{case.title}" was created',
-        'date': case.created_at.isoformat() if case.created_at else None,
-        'icon': 'fas fa-plus-circle',
-        'color': 'success'
-    })
-    
-    # Evidence events
-    from models.evidence import Evidence
-    evidence_list = Evidence.query.filter_by(case_id=case_id).order_by(Evidence.uploaded_at).all()
-    for evidence in evidence_list:
-        # Check if AI fields exist before accessing them
-        relevance_score = getattr(evidence, 'ai_relevance_score', None)
-        timeline_events.append({
-            'type': 'evidence_uploaded',
-            'title': 'Evidence Uploaded',
-            'description': f'Uploaded "{evidence.title}"',
-            'date': evidence.uploaded_at.isoformat() if evidence.uploaded_at else None,
-            'icon': 'fas fa-file-upload',
-            'color': 'info',
-            'details': {
-                'evidence_id': evidence.id,
-                'filename': evidence.original_filename,
-                'relevance_score': relevance_score
-            }
-        })
-        
-        # Check if AI fields exist before accessing them
-        analyzed_at = getattr(evidence, 'analyzed_at', None)
-        if analyzed_at:
-            relevance_score = getattr(evidence, 'ai_relevance_score', None)
-            timeline_events.append({
-                'type': 'evidence_analyzed',
-                'title': 'Evidence Analyzed',
-                'description': f'AI analysis completed for "{evidence.title}"',
-                'date': analyzed_at.isoformat(),
-                'icon': 'fas fa-brain',
-                'color': 'purple',
-                'details': {
-                    'evidence_id': evidence.id,
-                    'relevance_score': relevance_score
-                }
-            })
-    
-    # Form events
-    from models.court_form import CourtForm
-    court_forms = CourtForm.query.filter_by(case_id=case_id).order_by(CourtForm.created_at).all()
-    for form in court_forms:
-        timeline_events.append({
-            'type': 'form_created',
-            'title': 'Form Created',
-            'description': f'Created {form.form_name}',
-            'date': form.created_at.isoformat() if form.created_at else None,
-            'icon': 'fas fa-file-alt',
-            'color': 'primary',
-            'details': {
-                'form_id': form.id,
-                'form_name': form.form_name
-            }
-        })
-        
-        if form.updated_at and form.updated_at != form.created_at:
-            timeline_events.append({
-                'type': 'form_updated',
-                'title': 'Form Updated',
-                'description': f'Updated {form.form_name}',
-                'date': form.updated_at.isoformat(),
-                'icon': 'fas fa-edit',
-                'color': 'warning',
-                'details': {
-                    'form_id': form.id,
-                    'form_name': form.form_name,
-                    'status': form.status.value if form.status else 'draft'
-                }
-            })
-    
-    # Legal journey events
-    from models.legal_journey import LegalJourney
-    legal_journey = LegalJourney.query.filter_by(case_id=case_id).first()
-    if legal_journey:
-        timeline_events.append({
-            'type': 'journey_started',
-            'title': 'Legal Journey Started',
-            'description': f'Started guided legal process',
-            'date': legal_journey.created_at.isoformat() if legal_journey.created_at else None,
-            'icon': 'fas fa-route',
-            'color': 'secondary'
-        })
-        
-        if legal_journey.current_stage_index > 0:
-            timeline_events.append({
-                'type': 'stage_progress',
-                'title': 'Stage Progress',
-                'description': f'Advanced to stage {legal_journey.current_stage_index + 1}',
-                'date': legal_journey.updated_at.isoformat() if legal_journey.updated_at else None,
-                'icon': 'fas fa-step-forward',
-                'color': 'success'
-            })
-    
-    # Sort timeline by date
-    timeline_events.sort(key=lambda x: x['date'] or '9999-12-31', reverse=True)
+    timeline_events = CaseTracker().get_case_timeline(case)
     
     return jsonify({
         'case_id': case_id,
@@ -283,6 +174,7 @@ def api_progress_summary():
     """API endpoint for progress summary across all cases"""
     user_cases = Case.query.filter_by(user_id=current_user.id).all()
     tracker = CaseTracker()
+    progress = tracker.get_progress_snapshots(user_cases)
     
     summary = {
         'total_cases': len(user_cases),
@@ -300,7 +192,7 @@ def api_progress_summary():
     all_actions = []
     
     for case in user_cases:
-        progress_data = tracker.get_case_progress(case.id)
+        progress_data = progress[case.id]
         overall_progress = progress_data.get('overall_progress', 0)
         
         # Categorize by progress
@@ -345,7 +237,7 @@ def progress_widget(case_id):
         return "Case not found", 404
     
     tracker = CaseTracker()
-    progress_data = tracker.get_case_progress(case_id)
+    progress_data = tracker.get_case_progress(case)
     
     return render_template('tracking/progress_widget.html',
                          case=case,
@@ -361,7 +253,7 @@ def export_progress_report(case_id):
         return redirect(url_for('cases.list_cases'))
     
     tracker = CaseTracker()
-    progress_data = tracker.get_case_progress(case_id)
+    progress_data = tracker.get_case_progress(case)
     
     # For now, render a printable report
     # In the future, this could generate PDF or other formats
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hot per-user list and dashboard queries as tables grow.
+
+Fills cases, notifications, evidence and payments in steps up to the
+largest size, and at every step times each query with and without the
+composite indexes from migration 0001_hot_path_indexes. With the indexes
+the timings should stay flat while the unindexed ones grow with the row
+count.
+
+    python scripts/benchmark_indexes.py --sizes 10000,100000,1000000
+
+Runs against a throwaway SQLite file unless --database-url is given. The
+target database's tables are dropped and recreated, so never point it at
+real data.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, func, false, text
+from utils.db import db
+from utils.migrations import ensure_indexes
+from models.user import User
+from models.case import Case, CaseType, CaseStatus
+from models.notification import Notification, NotificationType, NotificationPriority
+from models.evidence import Evidence
+from models.payment import Payment, PaymentStatus
+
+HOT_INDEXES = [
+    'ix_cases_user_id_created_at',
+    'ix_cases_user_id_updated_at',
+    'ix_notifications_user_id_is_read_created_at',
+    'ix_notifications_unread',
+    'ix_evidence_case_id_uploaded_at',
+    'ix_evidence_user_id_uploaded_at',
+    'ix_payments_user_id_created_at',
+]
+TABLES = [User.__table__, Case.__table__, Notification.__table__, Evidence.__table__, Payment.__table__]
+ROWS_PER_USER = 50
+BATCH_SIZE = 10000
+
+cases = Case.__table__
+notifications = Notification.__table__
+evidence = Evidence.__table__
+payments = Payment.__table__
+
+QUERIES = {
+    'dashboard_recent_cases': lambda user_id, case_id: select(cases.c.id).where(
+        cases.c.user_id == user_id).order_by(cases.c.created_at.desc()).limit(5),
+    'case_list_by_updated': lambda user_id, case_id: select(cases.c.id, cases.c.title).where(
+        cases.c.user_id == user_id).order_by(cases.c.updated_at.desc()).limit(20),
+    'unread_notifications': lambda user_id, case_id: select(notifications.c.id).where(
+        notifications.c.user_id == user_id, notifications.c.is_read == false()
+    ).order_by(notifications.c.created_at.desc()).limit(10),
+    'unread_count': lambda user_id, case_id: select(func.count()).select_from(notifications).where(
+        notifications.c.user_id == user_id, notifications.c.is_read == false()),
+    'recent_user_evidence': lambda user_id, case_id: select(evidence.c.id).where(
+        evidence.c.user_id == user_id).order_by(evidence.c.uploaded_at.desc()).limit(5),
+    'case_evidence': lambda user_id, case_id: select(evidence.c.id).where(
+        evidence.c.case_id == case_id).order_by(evidence.c.uploaded_at),
+    'user_payments': lambda user_id, case_id: select(payments.c.id).where(
+        payments.c.user_id == user_id).order_by(payments.c.created_at.desc()).limit(20),
+}
+
+def fill(connection, start, stop, rng):
+    """Insert rows [start, stop) into every table; roughly ROWS_PER_USER cases per user"""
+    epoch = datetime(2020, 1, 1)
+    first_user = start // ROWS_PER_USER + 1
+    last_user = max(first_user, stop // ROWS_PER_USER)
+    connection.execute(User.__table__.insert(), [
+        {'id': user_id, 'email': f"user{user_id}@example.com"}
+        for user_id in range(first_user, last_user + 1)
+    ])
+    for offset in range(start, stop, BATCH_SIZE):
+        batch = range(offset + 1, min(stop, offset + BATCH_SIZE) + 1)
+        stamps = {i: epoch + timedelta(seconds=i * 60) for i in batch}
+        owners = {i: rng.randint(1, last_user) for i in batch}
+        connection.execute(cases.insert(), [{
+            'id': i, 'title': f"Case {i}", 'user_id': owners[i], 'case_type': CaseType.CIVIL,
+            'status': CaseStatus.DRAFT, 'province': 'ON', 'created_at': stamps[i],
+            'updated_at': stamps[i] + timedelta(days=rng.randint(0, 30))
+        } for i in batch])
+        connection.execute(notifications.insert(), [{
+            'id': i, 'user_id': owners[i], 'title': 'Update', 'message': 'Case updated',
+            'notification_type': NotificationType.CASE_UPDATE, 'priority': NotificationPriority.LOW,
+            'is_read': rng.random() < 0.8, 'created_at': stamps[i]
+        } for i in batch])
+        connection.execute(evidence.insert(), [{
+            'id': i, 'filename': f"{i}.pdf", 'original_filename': f"{i}.pdf", 'file_path': f"/x/{i}.pdf",
+            'evidence_type': 'document', 'case_id': rng.randint(1, i), 'user_id': owners[i],
+            'uploaded_at': stamps[i]
+        } for i in batch])
+        connection.execute(payments.insert(), [{
+            'id': i, 'user_id': owners[i], 'service_type': 'filing', 'amount': 25.0,
+            'status': PaymentStatus.COMPLETED, 'created_at': stamps[i]
+        } for i in batch if i % 5 == 0])
+    return last_user
+
+def drop_hot_indexes(connection):
+    for table in TABLES:
+        for index in table.indexes:
+            if index.name in HOT_INDEXES:
+                index.drop(connection, checkfirst=True)
+
+def time_queries(engine, users, rows, rng, repeats):
+    """Median milliseconds per query over ``repeats`` random users"""
+    results = {}
+    with engine.connect() as connection:
+        for name, build in QUERIES.items():
+            samples = []
+            for _ in range(repeats):
+                statement = build(rng.randint(1, users), rng.randint(1, rows))
+                start = time.perf_counter()
+                connection.execute(statement).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(samples)
+    return results
+
+def explain(engine):
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.connect() as connection:
+        for name, build in QUERIES.items():
+            compiled = build(1, 1).compile(engine, compile_kwargs={'literal_binds': True})
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+            print(f"  {name}: {'; '.join(row[-1] for row in plan)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='Comma-separated row counts per table to measure at')
+    parser.add_argument('--repeats', type=int, default=50, help='Samples per query and size')
+    parser.add_argument('--database-url', help='Scratch database URL (default: temporary SQLite file)')
+    parser.add_argument('--skip-unindexed', action='store_true', help='Only time the indexed queries')
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    tmpdir = None
+    url = args.database_url
+    if not url:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmpdir.name, 'benchmark.db')}"
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        db.metadata.drop_all(connection, tables=list(reversed(TABLES)))
+        db.metadata.create_all(connection, tables=TABLES)
+
+    rng = random.Random(42)
+    rows = users = 0
+    header = f"{'rows':>10}  {'query':<24} {'indexed ms':>11} {'unindexed ms':>13}"
+    print(header)
+    print('-' * len(header))
+    try:
+        for size in sizes:
+            started = time.perf_counter()
+            with engine.begin() as connection:
+                users = fill(connection, rows, size, rng)
+            rows = size
+            print(f"# filled to {rows} rows per table ({users} users) in {time.perf_counter() - started:.1f}s")
+
+            unindexed = {}
+            if not args.skip_unindexed:
+                with engine.begin() as connection:
+                    drop_hot_indexes(connection)
+                unindexed = time_queries(engine, users, rows, rng, args.repeats)
+            # Built CONCURRENTLY on PostgreSQL, which cannot run in a transaction
+            with engine.connect() as connection:
+                connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+                ensure_indexes(connection, *HOT_INDEXES)
+                if engine.dialect.name == 'sqlite':
+                    connection.execute(text('ANALYZE'))
+                elif engine.dialect.name == 'postgresql':
+                    for table in TABLES:
+                        connection.execute(text(f"ANALYZE {table.name}"))
+            indexed = time_queries(engine, users, rows, rng, args.repeats)
+
+            for name in QUERIES:
+                slow = f"{unindexed[name]:13.3f}" if name in unindexed else f"{'-':>13}"
+                print(f"{rows:>10}  {name:<24} {indexed[name]:11.3f} {slow}")
+        print("\nQuery plans with indexes:")
+        explain(engine)
+    finally:
+        engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+if __name__ == '__main__':
+    main()
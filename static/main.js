@@ -114,30 +114,78 @@ function updateNotificationBadge() {
         }
         return response.json();
     })
-    .then(data => {
-        const badge = document.querySelector('#notificationDropdown .badge');
-        if (data.unread_count > 0) {
-            if (badge) {
-                badge.textContent = data.unread_count <= 99 ? data.unread_count : '99+';
-            } else {
-                const button = document.getElementById('notificationDropdown');
-                if (button) {
-                    const newBadge = document.createElement('span');
-                    newBadge.className = 'badge bg-danger rounded-pill position-absolute';
-                    newBadge.style.cssText = 'top: -5px; right: -5px; font-size: 0.7rem;';
-                    newBadge.textContent = data.unread_count <= 99 ? data.unread_count : '99+';
-                    button.appendChild(newBadge);
-                }
-            }
-        } else if (badge) {
-            badge.remove();
-        }
-    })
+    .then(data => renderNotificationBadge(data.unread_count))
     .catch(error => {
         console.error('Error updating notification badge:', error);
     });
 }
 
+function renderNotificationBadge(unreadCount) {
+    const badge = document.querySelector('#notificationDropdown .badge');
+    if (unreadCount > 0) {
+        if (badge) {
+            badge.textContent = unreadCount <= 99 ? unreadCount : '99+';
+        } else {
+            const button = document.getElementById('notificationDropdown');
+            if (button) {
+                const newBadge = document.createElement('span');
+                newBadge.className = 'badge bg-danger rounded-pill position-absolute';
+                newBadge.style.cssText = 'top: -5px; right: -5px; font-size: 0.7rem;';
+                newBadge.textContent = unreadCount <= 99 ? unreadCount : '99+';
+                button.appendChild(newBadge);
+            }
+        }
+    } else if (badge) {
+        badge.remove();
+    }
+}
+
+// Push updates over Server-Sent Events; poll only while the stream is unavailable
+const NOTIFICATION_POLL_INTERVAL = 120000;
+const NOTIFICATION_STREAM_RETRY = 300000;
+let notificationSource = null;
+let notificationPollTimer = null;
+
+function startNotificationPolling() {
+    if (!notificationPollTimer) {
+        notificationPollTimer = setInterval(updateNotificationBadge, NOTIFICATION_POLL_INTERVAL);
+    }
+}
+
+function stopNotificationPolling() {
+    if (notificationPollTimer) {
+        clearInterval(notificationPollTimer);
+        notificationPollTimer = null;
+    }
+}
+
+function startNotificationStream() {
+    if (!document.getElementById('notificationDropdown')) {
+        return;
+    }
+    if (!window.EventSource) {
+        startNotificationPolling();
+        return;
+    }
+
+    notificationSource = new EventSource('/notifications/stream');
+    notificationSource.addEventListener('open', stopNotificationPolling);
+    notificationSource.addEventListener('unread', function(event) {
+        renderNotificationBadge(JSON.parse(event.data).unread_count);
+    });
+    notificationSource.addEventListener('notification', function(event) {
+        document.dispatchEvent(new CustomEvent('notification:received', {detail: JSON.parse(event.data)}));
+    });
+    notificationSource.addEventListener('error', function() {
+        // EventSource reconnects by itself unless the server refused the stream (e.g. 503 at capacity)
+        if (notificationSource.readyState === EventSource.CLOSED) {
+            notificationSource = null;
+            startNotificationPolling();
+            setTimeout(startNotificationStream, NOTIFICATION_STREAM_RETRY);
+        }
+    });
+}
+
 function getCsrfToken() {
     const meta = document.querySelector('meta[name=csrf-token]');
     if (meta) {
@@ -205,14 +253,8 @@ document.addEventListener('DOMContentLoaded', function() {
         
         console.log('Bootstrap 4 to 5 compatibility fixes applied');
         
-        // Auto-refresh notifications every 2 minutes (only if notification dropdown exists)
-        if (document.getElementById('notificationDropdown')) {
-            setInterval(function() {
-                if (typeof updateNotificationBadge === 'function') {
-                    updateNotificationBadge();
-                }
-            }, 120000);
-        }
+        // Live notification badge (only if notification dropdown exists)
+        startNotificationStream();
     } catch (error) {
         console.error('Error in DOMContentLoaded handler:', error);
     }
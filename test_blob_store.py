@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for reference counting and garbage collection in the content-addressed blob store.
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from testing import DatabaseTestCase
+from utils.db import db
+from utils.blob_store import BlobStore
+from models.user import User
+from models.case import Case, CaseType
+from models.evidence import Evidence, EvidenceBlob
+
+
+class TestBlobStore(DatabaseTestCase):
+    """Blobs are shared, released on the last reference and never removed under an upload."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # A file database, so a second thread gets its own connection
+        self.config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory, 'test.db')}"}
+        super().setUp()
+        self.store = BlobStore(root=os.path.join(self.directory, 'blobs'))
+        user = User(email='blobs@example.com')
+        db.session.add(user)
+        db.session.flush()
+        self.case = Case(title='Case', user_id=user.id, case_type=CaseType.CIVIL, province='ON')
+        db.session.add(self.case)
+        db.session.commit()
+        self.user_id = user.id
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stage(self, content=b'evidence bytes'):
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix='.upload')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        return path, {'file_hash': hashlib.sha256(content).hexdigest(), 'file_size': len(content),
+                      'mime_type': 'application/pdf', 'original_filename': 'a.pdf', 'encrypted': False}
+
+    def add_evidence(self, content=b'evidence bytes', store=None):
+        staged_path, file_info = self.stage(content)
+        blob = (store or self.store).add_reference(staged_path, file_info)
+        evidence = Evidence(filename='a.pdf', original_filename='a.pdf', file_path=blob.file_path,
+                            file_hash=file_info['file_hash'], evidence_type='document',
+                            case_id=self.case.id, user_id=self.user_id)
+        db.session.add(evidence)
+        db.session.commit()
+        return evidence
+
+    def delete(self, evidence):
+        path = self.store.release(evidence)
+        db.session.delete(evidence)
+        db.session.commit()
+        return path
+
+    def test_duplicates_share_a_blob_until_the_last_release(self):
+        first = self.add_evidence()
+        second = self.add_evidence()
+        self.assertEqual(first.file_path, second.file_path)
+        self.assertEqual(db.session.get(EvidenceBlob, first.file_hash).ref_count, 2)
+
+        self.assertIsNone(self.delete(first))
+        self.assertTrue(os.path.exists(second.file_path))
+        self.assertEqual(db.session.get(EvidenceBlob, second.file_hash).ref_count, 1)
+
+        path, file_hash = second.file_path, second.file_hash
+        released = self.delete(second)
+        self.assertEqual(released, path)
+        self.assertTrue(self.store.unlink(released))
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(db.session.get(EvidenceBlob, file_hash))
+
+    def test_unlink_keeps_a_blob_re_referenced_by_a_concurrent_upload(self):
+        evidence = self.add_evidence()
+        path = self.delete(evidence)
+        incremented, committed = threading.Event(), threading.Event()
+
+        def reupload():
+            with self.app.app_context():
+                staged_path, file_info = self.stage()
+                self.store.add_reference(staged_path, file_info)
+                incremented.set()
+                # Hold the row's write lock while unlink runs
+                time.sleep(0.2)
+                db.session.commit()
+                committed.set()
+                db.session.remove()
+
+        thread = threading.Thread(target=reupload)
+        thread.start()
+        self.assertTrue(incremented.wait(5))
+        self.assertFalse(self.store.unlink(path))
+        thread.join()
+        self.assertTrue(committed.is_set())
+        self.assertTrue(os.path.exists(path))
+        db.session.expire_all()
+        self.assertEqual(db.session.get(EvidenceBlob, evidence.file_hash).ref_count, 1)
+
+    def test_upload_after_unlink_stores_a_fresh_copy(self):
+        evidence = self.add_evidence()
+        self.assertTrue(self.store.unlink(self.delete(evidence)))
+        again = self.add_evidence()
+        self.assertTrue(os.path.exists(again.file_path))
+        self.assertEqual(db.session.get(EvidenceBlob, again.file_hash).ref_count, 1)
+
+    def test_gc_skips_files_of_uncommitted_uploads(self):
+        staged_path, file_info = self.stage(b'in flight')
+        blob_path = self.store.blob_path(file_info['file_hash'])
+        os.makedirs(os.path.dirname(blob_path))
+        # Moved into place by an upload whose row hasn't committed
+        os.replace(staged_path, blob_path)
+        self.assertEqual(self.store.collect_garbage(), 0)
+        self.assertTrue(os.path.exists(blob_path))
+
+        old = time.time() - 2 * BlobStore.GC_MIN_AGE
+        os.utime(blob_path, (old, old))
+        self.assertEqual(self.store.collect_garbage(), 1)
+        self.assertFalse(os.path.exists(blob_path))
+
+    def test_gc_finishes_interrupted_releases(self):
+        kept = self.add_evidence(b'kept')
+        released = self.add_evidence(b'released')
+        path = self.delete(released)
+        self.assertEqual(self.store.collect_garbage(min_age=0), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(kept.file_path))
+        self.assertEqual(db.session.query(EvidenceBlob).count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the cache backends used by the case law service.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.cache import TTLCache, SQLiteCache, RedisCache, LocalRedis, create_cache
+
+
+class CacheBehaviour:
+    """Checks shared by every backend; subclasses provide make_cache()."""
+
+    def test_get_set_delete(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get('missing'))
+        cache.set('a', {'title': 'Sample v. Example'})
+        self.assertEqual(cache.get('a'), {'title': 'Sample v. Example'})
+        self.assertIn('a', cache)
+        cache.delete('a')
+        self.assertNotIn('a', cache)
+
+    def test_expiry(self):
+        cache = self.make_cache()
+        cache.set('a', [1, 2], ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_get_or_load_counts_hits(self):
+        cache = self.make_cache()
+        calls = []
+        loader = lambda: calls.append(1) or ['result']
+        for _ in range(3):
+            self.assertEqual(cache.get_or_load('q', loader), ['result'])
+        self.assertEqual(len(calls), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+    def test_stale_while_revalidate(self):
+        cache = self.make_cache(ttl=0.05, stale_ttl=5)
+        cache.set('q', 'old')
+        time.sleep(0.1)
+        self.assertEqual(cache.get_or_load('q', lambda: 'new'), 'old')
+        deadline = time.time() + 2
+        while cache.get('q') != 'new' and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cache.get('q'), 'new')
+
+    def test_loader_errors_are_not_cached(self):
+        cache = self.make_cache()
+
+        def failing():
+            raise RuntimeError('upstream down')
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_load('q', failing)
+        self.assertIsNone(cache.get('q'))
+
+    def test_concurrent_misses_share_one_load(self):
+        cache = self.make_cache()
+        calls, results = [], []
+
+        def slow_loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return ['result']
+
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('q', slow_loader)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['result']] * 8)
+
+
+class TestTTLCache(CacheBehaviour, unittest.TestCase):
+
+    def make_cache(self, **kwargs):
+        return TTLCache('test', **kwargs)
+
+    def test_lru_eviction(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(sorted(cache._entries), ['a', 'c'])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+class TestSQLiteCache(CacheBehaviour, unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'test.sqlite3')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_cache(self, **kwargs):
+        return SQLiteCache('test', path=self.path, **kwargs)
+
+    def test_shared_between_instances(self):
+        self.make_cache().set('a', {'shared': True})
+        self.assertEqual(self.make_cache().get('a'), {'shared': True})
+
+    def test_waits_for_fill_by_another_instance(self):
+        # Stands in for another worker process holding the fill lock
+        other = self.make_cache()
+        token = other._acquire_fill_lock('q', 'other')
+        threading.Timer(0.1, lambda: (other.set('q', 'theirs'), other._release_fill_lock('q', token))).start()
+        self.assertEqual(self.make_cache().get_or_load('q', lambda: 'ours'), 'theirs')
+
+    def test_lru_eviction(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set('a', 1)
+        time.sleep(0.01)
+        cache.set('b', 2)
+        time.sleep(0.01)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['entries'], 2)
+
+
+class TestRedisCache(CacheBehaviour, unittest.TestCase):
+
+    def setUp(self):
+        self.client = LocalRedis()
+
+    def make_cache(self, **kwargs):
+        return RedisCache('test', client=self.client, **kwargs)
+
+    def test_clear_only_touches_own_keys(self):
+        self.client.set('other', 'x')
+        cache = self.make_cache()
+        cache.set('a', 1)
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(self.client.get('other'), b'x')
+
+
+class TestCreateCache(unittest.TestCase):
+
+    def test_unknown_backend_falls_back_to_memory(self):
+        with self.assertLogs('utils.cache', 'ERROR'):
+            self.assertIsInstance(create_cache('test', backend='bogus'), TTLCache)
+
+    def test_unavailable_backend_is_logged_as_an_error(self):
+        # A None entry makes ``import redis`` raise ImportError
+        with mock.patch.dict(sys.modules, {'redis': None}), \
+                mock.patch.dict(os.environ, {'REDIS_URL': 'redis://localhost:6379/0'}):
+            with self.assertLogs('utils.cache', 'ERROR') as logs:
+                self.assertIsInstance(create_cache('test'), TTLCache)
+        self.assertIn("Cache backend 'redis' unavailable", logs.output[0])
+
+    def test_local_backend(self):
+        self.assertIsInstance(create_cache('test', backend='local').client, LocalRedis)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Query-count regression tests for the batched case progress and timeline loading.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from testing import DatabaseTestCase
+from utils.db import db, track_queries
+from utils.case_tracking import CaseTracker, MilestoneType
+from models.user import User
+from models.case import Case, CaseType, CaseStatus
+from models.case_milestone import CaseMilestone
+from models.case_progress import CaseProgress
+from models.evidence import Evidence
+from models.court_form import CourtForm, FormSubmission, FormStatus
+from models.legal_journey import LegalJourney
+
+
+class TestCaseTrackingQueries(DatabaseTestCase):
+    """Progress and timelines must cost the same number of queries for 1 or many cases."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User(email='tracker@example.com')
+        self.form = CourtForm(name='Form 7A', province='ON', form_type='claim', version='1')
+        db.session.add_all([self.user, self.form])
+        db.session.commit()
+        self.tracker = CaseTracker()
+
+    def _make_cases(self, count, evidence_per_case):
+        now = datetime.utcnow()
+        cases = [Case(title=f'Case {i}', user_id=self.user.id, case_type=CaseType.CIVIL,
+                      status=CaseStatus.DRAFT, province='ON') for i in range(count)]
+        db.session.add_all(cases)
+        db.session.flush()
+        for case in cases:
+            db.session.add_all(Evidence(filename=f'{case.id}-{n}.pdf', original_filename=f'{n}.pdf',
+                                        file_path='/tmp/x', evidence_type='document', case_id=case.id,
+                                        user_id=self.user.id, uploaded_at=now - timedelta(days=n),
+                                        analyzed_at=now if n % 2 else None)
+                               for n in range(evidence_per_case))
+            db.session.add(FormSubmission(template_id=self.form.id, submitted_by=self.user.id, case_id=case.id,
+                                          submission_data={}, status=FormStatus.SUBMITTED))
+            db.session.add(LegalJourney(case_id=case.id, journey_type='small_claims',
+                                        completed_stages=1, total_stages=4))
+            db.session.add_all(CaseMilestone(case_id=case.id, milestone_type='custom', title=f'M{n}',
+                                             occurred_at=now - timedelta(hours=n))
+                               for n in range(evidence_per_case))
+        db.session.commit()
+        return [case.id for case in cases]
+
+    def _load(self, case_ids):
+        # Load the cases the way the routes do, so expired attributes don't add queries
+        return Case.query.filter(Case.id.in_(case_ids)).order_by(Case.id).all()
+
+    def _count(self, func, cases):
+        with track_queries() as stats:
+            result = func(cases)
+        return stats.count, result
+
+    def test_progress_query_count_is_fixed(self):
+        few = self._make_cases(1, 1)
+        many = self._make_cases(8, 6)
+        few, many = self._load(few), self._load(many)
+        few_count, _ = self._count(self.tracker.get_progress_for_cases, few)
+        many_count, progress = self._count(self.tracker.get_progress_for_cases, many)
+        self.assertEqual(few_count, 4)
+        self.assertEqual(many_count, 4)
+        self.assertEqual(progress[many[0].id]['evidence_count'], 6)
+        self.assertEqual(progress[many[0].id]['form_count'], 1)
+
+    def test_timeline_query_count_is_fixed(self):
+        few = self._make_cases(1, 1)
+        many = self._make_cases(8, 6)
+        few, many = self._load(few), self._load(many)
+        few_count, _ = self._count(self.tracker.get_timelines, few)
+        many_count, timelines = self._count(self.tracker.get_timelines, many)
+        self.assertEqual(few_count, 4)
+        self.assertEqual(many_count, 4)
+        types = [event['type'] for event in timelines[many[0].id]]
+        # created + 6 uploads + 3 analyses + 1 form + journey start and stage progress + 6 milestones
+        self.assertEqual(len(types), 19)
+        self.assertEqual(types.count('evidence_analyzed'), 3)
+
+    def test_statistics_reuse_loaded_progress(self):
+        cases = self._load(self._make_cases(3, 2))
+        user_id = self.user.id
+        progress = self.tracker.get_progress_for_cases(cases)
+        with track_queries() as stats:
+            summary = self.tracker.get_case_statistics(user_id, cases=cases, progress=progress)
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(summary['total_cases'], 3)
+
+
+    def test_snapshots_follow_commits(self):
+        case_id = self._make_cases(1, 2)[0]
+        self.assertEqual(db.session.get(CaseProgress, case_id).evidence_count, 2)
+
+        db.session.add(Evidence(filename='late.pdf', original_filename='late.pdf', file_path='/tmp/x',
+                                evidence_type='document', case_id=case_id, user_id=self.user.id))
+        db.session.commit()
+        snapshot = db.session.get(CaseProgress, case_id)
+        self.assertEqual(snapshot.evidence_count, 3)
+        self.assertEqual(snapshot.stage_progress['evidence_gathering'], 100)
+
+        case = db.session.get(Case, case_id)
+        case.status = CaseStatus.CLOSED
+        db.session.commit()
+        self.assertEqual(db.session.get(CaseProgress, case_id).current_stage, 'resolution')
+
+    def test_snapshot_reads_are_one_query(self):
+        cases = self._load(self._make_cases(8, 3))
+        with track_queries() as stats:
+            progress = self.tracker.get_progress_snapshots(cases)
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(progress[cases[0].id], self.tracker.get_progress_for_cases(cases[:1])[cases[0].id] | {
+            'computed_at': progress[cases[0].id]['computed_at']})
+
+    def test_stale_snapshots_are_stored_again_on_read(self):
+        case_id = self._make_cases(1, 1)[0]
+        snapshot = db.session.get(CaseProgress, case_id)
+        snapshot.computed_at = datetime.utcnow() - timedelta(days=2)
+        snapshot.overall_progress = 0
+        db.session.commit()
+
+        progress = self.tracker.get_progress_snapshots(self._load([case_id]))[case_id]
+        self.assertGreater(progress['overall_progress'], 0)
+        db.session.expire_all()
+        snapshot = db.session.get(CaseProgress, case_id)
+        self.assertEqual(snapshot.overall_progress, progress['overall_progress'])
+        self.assertGreater(snapshot.computed_at, datetime.utcnow() - timedelta(minutes=1))
+
+        with track_queries() as stats:
+            self.tracker.get_progress_snapshots(self._load([case_id]))
+        self.assertEqual(stats.count, 2)
+
+    def test_refresh_locks_the_cases_before_aggregating(self):
+        case_id = self._make_cases(1, 1)[0]
+        statements = []
+
+        def capture(state):
+            statements.append(str(state.statement.compile(dialect=postgresql.dialect())))
+
+        event.listen(Session, 'do_orm_execute', capture)
+        try:
+            self.tracker.refresh_snapshots([case_id])
+        finally:
+            event.remove(Session, 'do_orm_execute', capture)
+        self.assertTrue(statements[0].startswith('SELECT cases.id'))
+        self.assertTrue(statements[0].endswith('FOR UPDATE'))
+
+    def test_failed_snapshot_refresh_does_not_fail_the_commit(self):
+        case_id = self._make_cases(1, 2)[0]
+        error = IntegrityError('INSERT INTO case_progress', {}, Exception('duplicate key'))
+        with mock.patch.object(CaseTracker, 'refresh_snapshots', side_effect=error):
+            db.session.add(Evidence(filename='late.pdf', original_filename='late.pdf', file_path='/tmp/x',
+                                    evidence_type='document', case_id=case_id, user_id=self.user.id))
+            db.session.commit()
+        self.assertEqual(Evidence.query.filter_by(case_id=case_id).count(), 3)
+        # The out-of-date snapshot was dropped with the commit, so the next read recomputes it
+        self.assertIsNone(db.session.get(CaseProgress, case_id))
+        self.assertEqual(self.tracker.get_progress_snapshots(self._load([case_id]))[case_id]['evidence_count'], 3)
+        self.assertEqual(db.session.get(CaseProgress, case_id).evidence_count, 3)
+
+    def test_commit_with_nothing_pending_does_not_flush(self):
+        self._make_cases(1, 1)
+        with mock.patch.object(Session, 'flush') as flush:
+            db.session.commit()
+        flush.assert_not_called()
+
+    def test_rebuild_restores_missing_snapshots(self):
+        case_ids = self._make_cases(3, 1)
+        CaseProgress.query.delete()
+        db.session.commit()
+        self.assertEqual(self.tracker.rebuild_snapshots(batch_size=2), 3)
+        self.assertEqual(CaseProgress.query.count(), 3)
+        self.assertEqual(sorted(p.case_id for p in CaseProgress.query), sorted(case_ids))
+
+
+    def test_timeline_caps_milestones_per_case(self):
+        cases = self._load(self._make_cases(3, 6))
+        timelines = self.tracker.get_timelines(cases, milestone_limit=2)
+        for case in cases:
+            titles = [event['title'] for event in timelines[case.id] if event['type'] == 'custom']
+            self.assertEqual(titles, ['M0', 'M1'])
+
+    def test_bulk_record_and_stream_milestones(self):
+        case_id = self._make_cases(1, 0)[0]
+        start = datetime(2024, 1, 1)
+        recorded = self.tracker.record_milestones([
+            {'case_id': case_id, 'milestone_type': MilestoneType.HEARING_SCHEDULED,
+             'occurred_at': start + timedelta(minutes=n % 7)} for n in range(25)
+        ])
+        self.assertEqual(recorded, 25)
+        # created + form + journey start and stage progress + 25 recorded
+        self.assertEqual(db.session.get(CaseProgress, case_id).milestone_count, 4 + 25)
+
+        streamed = list(self.tracker.iter_milestones(case_id, batch_size=4))
+        self.assertEqual(len(streamed), 25)
+        self.assertEqual(len({m.id for m in streamed}), 25)
+        keys = [(m.occurred_at, m.id) for m in streamed]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_record_milestone_appends_a_row(self):
+        case_id = self._make_cases(1, 0)[0]
+        self.assertTrue(self.tracker.record_milestone(case_id, MilestoneType.CUSTOM, title='Mediation booked'))
+        self.assertFalse(self.tracker.record_milestone(999, MilestoneType.CUSTOM))
+        self.assertEqual(CaseMilestone.query.filter_by(case_id=case_id).one().title, 'Mediation booked')
+
+
+if __name__ == '__main__':
+    unittest.main()
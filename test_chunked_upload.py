@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Tests for resumable chunked uploads: resuming, retried chunks and finalize races.
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask_login import LoginManager
+from testing import DatabaseTestCase
+from utils.db import db
+from utils.chunked_upload import ChunkedUploadManager, ChunkedUploadError
+from models.user import User
+from models.case import Case, CaseType
+
+CONTENT = b'%PDF-1.4 resumable upload body'
+CHUNK_SIZE = 8
+
+
+class TestChunkedUploads(DatabaseTestCase):
+    """Chunks can arrive in any order, more than once, and the upload finalizes exactly once."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = {'UPLOAD_FOLDER': self.directory, 'UPLOAD_CHUNK_SIZE': CHUNK_SIZE}
+        super().setUp()
+        self.manager = ChunkedUploadManager()
+        self.session = self.manager.init_session(1, 1, 'brief.pdf', len(CONTENT))
+        self.upload_id = self.session['upload_id']
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def put(self, index, data=None):
+        if data is None:
+            data = CONTENT[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        return self.manager.put_chunk(self.upload_id, 1, index, io.BytesIO(data))
+
+    def assemble(self):
+        reader, manifest = self.manager.open_assembled(self.upload_id, 1)
+        try:
+            return b''.join(iter(lambda: reader.read(1024), b'')), manifest
+        finally:
+            reader.close()
+
+    def test_resume_after_a_missing_chunk(self):
+        self.assertEqual(self.session['total_chunks'], 4)
+        for index in (0, 1, 3):
+            self.put(index)
+        status = self.manager.status(self.upload_id, 1)
+        self.assertEqual((status['missing_chunks'], status['complete']), ([2], False))
+        with self.assertRaisesRegex(ChunkedUploadError, '1 chunk'):
+            self.manager.open_assembled(self.upload_id, 1)
+
+        self.assertTrue(self.put(2)['complete'])
+        self.assertEqual(self.assemble()[0], CONTENT)
+
+    def test_out_of_order_and_duplicate_chunks(self):
+        with self.assertRaisesRegex(ChunkedUploadError, 'larger than'):
+            self.put(1, b'x' * (CHUNK_SIZE + 1))
+        with self.assertRaisesRegex(ChunkedUploadError, 'out of range'):
+            self.put(4, b'x')
+        for index in (3, 1, 1, 0, 2, 0):
+            status = self.put(index)
+        self.assertEqual(status['received_chunks'], 4)
+        # A stored chunk is not replaced by a retry
+        self.put(1, b'y' * CHUNK_SIZE)
+        self.assertEqual(self.assemble()[0], CONTENT)
+        self.assertFalse([name for name in os.listdir(self.manager._session_dir(self.upload_id)) if name.endswith('.part')])
+
+    def test_size_mismatch_at_finalize(self):
+        for index in range(4):
+            self.put(index)
+        # Damaged on disk after it was accepted
+        with open(self.manager._chunk_path(self.upload_id, 1), 'ab') as f:
+            f.write(b'extra')
+        with self.assertRaisesRegex(ChunkedUploadError, 'size mismatch'):
+            self.manager.open_assembled(self.upload_id, 1)
+        self.assertEqual(self.manager.status(self.upload_id, 1)['missing_chunks'], [1])
+
+        self.put(1)
+        self.assertEqual(self.assemble()[0], CONTENT)
+
+    def test_concurrent_finalize_is_claimed_once(self):
+        for index in range(4):
+            self.put(index)
+        barrier = threading.Barrier(4)
+        outcomes = []
+
+        def finalize():
+            barrier.wait()
+            try:
+                reader, _ = self.manager.open_assembled(self.upload_id, 1)
+                reader.close()
+                outcomes.append('claimed')
+            except ChunkedUploadError as e:
+                outcomes.append(str(e))
+
+        threads = [threading.Thread(target=finalize) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(outcomes.count('claimed'), 1)
+        self.assertEqual(outcomes.count('Upload is already being finalized'), 3)
+
+        # A failed finalize releases the claim for a retry
+        self.manager.release(self.upload_id)
+        self.assertEqual(self.assemble()[0], CONTENT)
+
+
+class TestChunkedUploadRoutes(DatabaseTestCase):
+    """Malformed session requests are rejected with a 400, not a server error."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = {'SECRET_KEY': 'test', 'UPLOAD_FOLDER': self.directory}
+        super().setUp()
+        from routes.evidence_routes import evidence_bp
+        login_manager = LoginManager()
+        login_manager.init_app(self.app)
+        login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+        self.app.register_blueprint(evidence_bp)
+
+        user = User(email='chunks@example.com')
+        db.session.add(user)
+        db.session.flush()
+        case = Case(title='Case', user_id=user.id, case_type=CaseType.CIVIL, province='ON')
+        db.session.add(case)
+        db.session.commit()
+        self.url = f'/evidence/upload/{case.id}/sessions'
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_invalid_total_size(self):
+        for total_size in (None, 'lots', '1.5', [], True, -1, 0):
+            response = self.client.post(self.url, json={'filename': 'a.pdf', 'total_size': total_size})
+            self.assertEqual(response.status_code, 400, total_size)
+            self.assertFalse(response.get_json()['success'])
+        response = self.client.post(self.url, json={'filename': 'a.pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_valid_total_size(self):
+        for total_size in (1024, '1024'):
+            response = self.client.post(self.url, json={'filename': 'a.pdf', 'total_size': total_size})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.get_json()['total_size'], 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached per-user dashboard aggregate and its invalidation hooks.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from testing import DatabaseTestCase
+from utils.db import db, track_queries
+from utils.dashboard import DashboardManager, dashboard_manager
+from models.user import User
+from models.case import Case, CaseType
+from models.evidence import Evidence
+from models.court_form import CourtForm, FormSubmission
+from models.notification import Notification, NotificationType
+
+
+class TestDashboardCache(DatabaseTestCase):
+    """One query per rebuild, none per hit, and commits invalidate only their owner."""
+
+    def setUp(self):
+        super().setUp()
+        self.manager = dashboard_manager
+        self.manager.cache.clear()
+
+        form = CourtForm(name='Form 7A', province='ON', form_type='claim', version='1')
+        users = [User(email='one@example.com'), User(email='two@example.com')]
+        db.session.add_all([form] + users)
+        db.session.commit()
+        self.user_ids = [user.id for user in users]
+        for user_id in self.user_ids:
+            for i in range(7):
+                case = Case(title=f'Case {i}', user_id=user_id, case_type=CaseType.CIVIL, province='ON')
+                db.session.add(case)
+                db.session.flush()
+                db.session.add(Evidence(filename='e', original_filename=f'{i}.pdf', file_path='/tmp/x',
+                                        evidence_type='document', case_id=case.id, user_id=user_id))
+                db.session.add(FormSubmission(template_id=form.id, submitted_by=user_id, case_id=case.id,
+                                              submission_data={}))
+                db.session.add(Notification(user_id=user_id, title=f'Update {i}', message='m',
+                                            notification_type=NotificationType.CASE_UPDATE))
+        db.session.commit()
+
+    def test_rebuild_is_one_query_and_hits_are_free(self):
+        user_id = self.user_ids[0]
+        with track_queries() as stats:
+            dashboard = self.manager.get_user_dashboard(user_id)
+        self.assertEqual(stats.count, 1)
+        self.assertEqual([len(dashboard[name]) for name in ('cases', 'recent_evidence', 'recent_forms',
+                                                             'notifications')], [5, 5, 5, 7])
+        self.assertEqual(dashboard['cases'][0]['title'], 'Case 6')
+        self.assertEqual(dashboard['cases'][0]['status'], 'draft')
+
+        with track_queries() as stats:
+            self.assertEqual(self.manager.get_user_dashboard(user_id), dashboard)
+        self.assertEqual(stats.count, 0)
+
+    def test_commit_invalidates_only_the_owner(self):
+        first, second = self.user_ids
+        self.manager.get_user_dashboard(first)
+        self.manager.get_user_dashboard(second)
+
+        notification = Notification.query.filter_by(user_id=first).first()
+        notification.is_read = True
+        db.session.commit()
+
+        with track_queries() as stats:
+            self.assertEqual(len(self.manager.get_user_dashboard(first)['notifications']), 6)
+        self.assertEqual(stats.count, 1)
+        with track_queries() as stats:
+            self.assertEqual(len(self.manager.get_user_dashboard(second)['notifications']), 7)
+        self.assertEqual(stats.count, 0)
+
+    def test_stats_report_hit_ratio_and_latency(self):
+        manager = DashboardManager()
+        manager.cache.clear()
+        for _ in range(4):
+            manager.get_user_dashboard(self.user_ids[0])
+        stats = manager.stats()
+        self.assertEqual(stats['lookups'], 4)
+        self.assertEqual(stats['rebuilds'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.75)
+        self.assertGreater(stats['rebuild_ms']['max'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for error log deduplication and rate limiting in ErrorHandler.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from utils.error_handling import ErrorHandler
+
+
+def raise_lookup(key):
+    return {}[key]
+
+
+def raise_from_elsewhere(key):
+    raise KeyError(key)
+
+
+def caught(function, *args):
+    try:
+        function(*args)
+    except Exception as e:
+        return e
+
+
+class TestErrorLogDeduplication(unittest.TestCase):
+    """Repeats of one error are rate limited and summarized; security errors always get through."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.handler = ErrorHandler(window=60, burst=2, rate=0.0)
+        self.handler._ensure_flusher = lambda: None
+        self.handler.logger = mock.Mock()
+
+    def log(self, error):
+        with self.app.test_request_context('/cases'):
+            self.handler.log_error(error)
+
+    def test_fingerprint_ignores_message_but_not_origin(self):
+        first = self.handler.fingerprint(caught(raise_lookup, 'a'))
+        self.assertEqual(first, self.handler.fingerprint(caught(raise_lookup, 'b')))
+        self.assertNotEqual(first, self.handler.fingerprint(caught(raise_from_elsewhere, 'a')))
+        self.assertNotEqual(first, self.handler.fingerprint(ValueError('a')))
+
+    def test_repeats_beyond_the_burst_are_suppressed(self):
+        for key in range(10):
+            self.log(caught(raise_lookup, key))
+        self.assertEqual(self.handler.logger.error.call_count, 2)
+        stats = self.handler.stats()
+        self.assertEqual((stats['logged'], stats['suppressed'], stats['fingerprints']), (2, 8, 1))
+        self.assertEqual(stats['busiest'][0]['window_count'], 10)
+
+    def test_refilled_token_reports_suppressed_repeats(self):
+        error = caught(raise_lookup, 'x')
+        for _ in range(3):
+            self.log(error)
+        # Refill as if time had passed
+        self.handler._fingerprints[self.handler.fingerprint(error)]['tokens'] = 1.0
+        self.log(error)
+        self.assertEqual(self.handler.logger.error.call_count, 3)
+        self.assertIn("'suppressed_repeats': 1", self.handler.logger.error.call_args[0][0])
+
+    def test_security_errors_are_always_logged(self):
+        for _ in range(5):
+            self.log(PermissionError('Unauthorized access to case 7'))
+        self.assertEqual(self.handler.logger.error.call_count, 5)
+        self.assertEqual(self.handler.stats()['suppressed'], 0)
+
+    def test_summary_reports_suppressed_counts_per_window(self):
+        for key in range(5):
+            self.log(caught(raise_lookup, key))
+        for entry in self.handler._fingerprints.values():
+            entry['window_start'] -= 60
+        self.handler.flush_summaries()
+        message = self.handler.logger.warning.call_args[0][0]
+        self.assertIn('Suppressed 3 of 5 occurrences of KeyError', message)
+        self.handler.flush_summaries()
+        self.assertEqual(self.handler.logger.warning.call_count, 1)
+        self.assertEqual(self.handler.stats()['busiest'][0]['window_count'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass streaming ingest in FileUploadHandler.
+"""
+
+import io
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.file_upload import FileUploadHandler, FileUploadError
+
+
+class TestIngestStream(unittest.TestCase):
+    """Content is sniffed, size-limited while streaming and hashed exactly as stored."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.handler = FileUploadHandler(self.directory)
+        self.handler.INGEST_BLOCK_SIZE = 1024
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stored_files(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.directory)
+                      for root, _, names in os.walk(self.directory) for name in names)
+
+    def test_hash_and_size_match_the_stored_bytes(self):
+        content = b'%PDF-1.7\n' + os.urandom(5000)
+        path, info = self.handler.ingest_stream(io.BytesIO(content), 'brief.pdf')
+        with open(path, 'rb') as f:
+            stored = f.read()
+        self.assertEqual(stored, content)
+        self.assertEqual(info['file_hash'], hashlib.sha256(stored).hexdigest())
+        self.assertEqual((info['file_size'], info['mime_type']), (len(content), 'application/pdf'))
+        self.assertEqual(self.stored_files(), [info['relative_path']])
+
+    def test_content_that_does_not_match_the_extension_is_rejected(self):
+        png = b'\x89PNG\r\n\x1a\n' + os.urandom(100)
+        for content, filename in ((png, 'brief.pdf'), (b'MZ\x90\x00 not a pdf at all', 'brief.pdf'),
+                                  (b'%PDF', 'short.pdf'), (b'', 'empty.pdf')):
+            with self.assertRaises(FileUploadError, msg=filename):
+                self.handler.ingest_stream(io.BytesIO(content), filename)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_size_limit_hit_mid_stream_leaves_no_partial_file(self):
+        self.handler.MAX_FILE_SIZES = dict(self.handler.MAX_FILE_SIZES, pdf=4096)
+        stream = io.BytesIO(b'%PDF-1.7\n' + os.urandom(10000))
+        with self.assertRaisesRegex(FileUploadError, 'too large'):
+            self.handler.ingest_stream(stream, 'brief.pdf')
+        # Stopped at the first block over the limit rather than reading everything
+        self.assertLess(stream.tell(), 10000)
+        self.assertEqual(self.stored_files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
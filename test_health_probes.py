@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent, cached readiness checks behind /readyz.
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+from unittest import mock
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from utils.health import HealthMonitor
+from utils.error_handling import HealthCheck
+
+
+class FakeMonitor(HealthMonitor):
+    def __init__(self, checks, **kwargs):
+        super().__init__(**kwargs)
+        self.fake_checks = checks
+
+    def checks(self):
+        return self.fake_checks
+
+
+class TestHealthMonitor(unittest.TestCase):
+    """Checks run in parallel, time out individually and are served from a snapshot."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.calls = 0
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def slow(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return True, 'slow but fine'
+
+    def hung(self):
+        self.release.wait(5)
+        return True, 'late'
+
+    def test_checks_run_concurrently(self):
+        monitor = FakeMonitor({'a': self.slow, 'b': self.slow, 'c': self.slow}, interval=0, timeout=2)
+        monitor.init_app(self.app)
+        start = time.monotonic()
+        snapshot = monitor.refresh()
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertTrue(all(check['ok'] for check in snapshot['checks'].values()))
+
+    def test_hung_check_times_out_and_is_not_restarted(self):
+        monitor = FakeMonitor({'database': self.hung, 'disk': lambda: (True, 'ok')}, interval=0, timeout=0.1,
+                              critical=['database'])
+        monitor.init_app(self.app)
+        first = monitor.refresh()['checks']
+        self.assertFalse(first['database']['ok'])
+        self.assertIn('Timed out', first['database']['message'])
+        self.assertTrue(first['disk']['ok'])
+        second = monitor.refresh()['checks']
+        self.assertEqual(second['database']['message'], 'Previous check still running')
+        ready, status = monitor.readiness()
+        self.assertFalse(ready)
+        self.assertEqual(status['failing'], ['database'])
+
+    def test_snapshot_is_cached_until_ttl(self):
+        monitor = FakeMonitor({'database': self.slow}, interval=0, ttl=60, timeout=2)
+        monitor.init_app(self.app)
+        monitor.snapshot()
+        start = time.monotonic()
+        ready, status = monitor.readiness()
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertTrue(ready)
+        self.assertEqual(self.calls, 1)
+
+    def test_non_critical_failures_keep_the_instance_ready(self):
+        monitor = FakeMonitor({'database': lambda: (True, 'ok'), 'network': lambda: (False, 'DNS failed')},
+                              interval=0, critical=['database'])
+        monitor.init_app(self.app)
+        ready, status = monitor.readiness()
+        self.assertTrue(ready)
+        self.assertEqual(list(status['checks']), ['database'])
+
+    def test_external_checks_only_run_for_full_health(self):
+        external_calls = []
+
+        def smtp():
+            external_calls.append(1)
+            return False, 'login refused'
+
+        monitor = FakeMonitor({'database': lambda: (True, 'ok'), 'email': smtp}, interval=0, critical=['database'],
+                              external=['email'], external_ttl=60)
+        monitor.init_app(self.app)
+        ready, _ = monitor.readiness()
+        self.assertTrue(ready)
+        self.assertNotIn('email', monitor.snapshot()['checks'])
+        self.assertEqual(external_calls, [])
+
+        for _ in range(3):
+            checks = monitor.snapshot(include_external=True)['checks']
+        self.assertEqual(checks['email']['message'], 'login refused')
+        self.assertEqual(len(external_calls), 1)
+
+
+class TestCacheCheck(unittest.TestCase):
+    """The cache check only probes Redis when Redis is the configured backend."""
+
+    def test_local_backend_needs_no_service(self):
+        environ = {'CACHE_BACKEND': 'sqlite', 'REDIS_URL': 'redis://127.0.0.1:1/0'}
+        with mock.patch.dict(os.environ, environ):
+            ok, message = HealthCheck.check_cache_service()
+        self.assertTrue(ok, message)
+
+    def test_unreachable_redis_fails(self):
+        with mock.patch.dict(os.environ, {'CACHE_BACKEND': '', 'REDIS_URL': 'redis://127.0.0.1:1/0'}):
+            ok, message = HealthCheck.check_cache_service()
+        self.assertFalse(ok)
+        self.assertIn('connection failed', message)
+
+
+if __name__ == '__main__':
+    unittest.main()
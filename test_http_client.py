@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for deadlines, fork safety and connection reuse in the outbound HTTP client.
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.http_client import HTTPClient
+from utils.retry import DeadlineExceeded, deadline
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTPClient(unittest.TestCase):
+    """Timeouts respect the request deadline and keep-alive connections are reused."""
+
+    def setUp(self):
+        self.client = HTTPClient(connect_timeout=3, read_timeout=10, retries=0)
+
+    def test_timeout_is_clamped_to_the_deadline(self):
+        with mock.patch.object(self.client.session, 'request') as request:
+            request.return_value.status_code = 200
+            self.client.get('http://example.invalid/')
+            self.assertEqual(request.call_args.kwargs['timeout'], (3, 10))
+
+            with deadline(0.5):
+                self.client.get('http://example.invalid/')
+            connect, read = request.call_args.kwargs['timeout']
+            self.assertLessEqual(connect, 0.5)
+            self.assertLessEqual(read, 0.5)
+
+            with deadline(60):
+                self.client.get('http://example.invalid/', timeout=2)
+            self.assertEqual(request.call_args.kwargs['timeout'], (2, 2))
+
+    def test_passed_deadline_raises_without_sending(self):
+        with mock.patch.object(self.client.session, 'request') as request:
+            with mock.patch('utils.http_client.remaining_time', return_value=0.0):
+                with self.assertRaises(DeadlineExceeded):
+                    self.client.get('http://example.invalid/')
+        request.assert_not_called()
+
+    def test_session_is_rebuilt_after_fork(self):
+        parent = self.client.session
+        self.assertIs(self.client.session, parent)
+        with mock.patch('utils.http_client.os.getpid', return_value=os.getpid() + 1):
+            child = self.client.session
+        self.assertIsNot(child, parent)
+
+    def test_stats_count_connection_reuse(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/'
+            for _ in range(3):
+                self.assertEqual(self.client.get(url).text, 'ok')
+            stats = self.client.stats()['hosts'][f'127.0.0.1:{server.server_port}']
+        finally:
+            server.shutdown()
+            server.server_close()
+            self.client.session.close()
+        self.assertEqual((stats['requests'], stats['errors']), (3, 0))
+        self.assertEqual((stats['connections_opened'], stats['requests_sent'], stats['reused']), (1, 3, 2))
+        self.assertAlmostEqual(stats['reuse_ratio'], 2 / 3, places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests for claiming, leasing, retrying and dead-lettering jobs in the background queue.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from testing import DatabaseTestCase
+from utils.db import db
+from utils.job_queue import JobWorker, enqueue, job_handler
+from models.job import Job, JobStatus
+
+calls = []
+
+
+@job_handler('test_flaky', exceptions=(ConnectionError,), max_retries=2, initial_delay=10.0, jitter=0)
+def flaky_job(fail=True):
+    calls.append(fail)
+    if fail:
+        raise ConnectionError('upstream unavailable')
+
+
+@job_handler('test_slow')
+def slow_job(seconds):
+    time.sleep(seconds)
+
+
+class TestJobQueue(DatabaseTestCase):
+    """Jobs are claimed once, kept leased while running, retried with backoff and then failed."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # A file database, so the heartbeat thread gets its own connection
+        self.config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory, 'test.db')}"}
+        super().setUp()
+        self.worker = JobWorker(self.app, visibility_timeout=60)
+        del calls[:]
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def enqueue(self, name, **payload):
+        job = enqueue(name, payload)
+        db.session.commit()
+        return job.id
+
+    def test_claim_is_exclusive(self):
+        job_id = self.enqueue('test_flaky', fail=False)
+        job = self.worker.claim()
+        self.assertEqual((job.id, job.status, job.attempts), (job_id, JobStatus.RUNNING, 1))
+        self.assertEqual(job.locked_by, f"{self.worker.process_id}:{threading.get_ident()}")
+        self.assertIsNone(self.worker.claim())
+        self.assertIsNone(JobWorker(self.app).claim())
+
+    def test_expired_lock_is_reclaimed_and_the_old_owner_cannot_finish(self):
+        job_id = self.enqueue('test_flaky', fail=False)
+        job = self.worker.claim()
+        owner = job.locked_by
+        db.session.query(Job).filter(Job.id == job_id).update(
+            {Job.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+        reclaimed = []
+
+        def reclaim():
+            with self.app.app_context():
+                again = JobWorker(self.app).claim()
+                reclaimed.append((again.id, again.attempts, again.locked_by))
+                db.session.remove()
+
+        thread = threading.Thread(target=reclaim)
+        thread.start()
+        thread.join()
+        self.assertEqual(reclaimed[0][:2], (job_id, 2))
+        self.assertNotEqual(reclaimed[0][2], owner)
+
+        self.worker._finish(job, JobStatus.SUCCEEDED)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Job, job_id).status, JobStatus.RUNNING)
+
+    def test_failures_retry_with_backoff_then_dead_letter(self):
+        job_id = self.enqueue('test_flaky')
+        for attempt in (1, 2):
+            before = datetime.utcnow()
+            self.worker.run_job(self.worker.claim())
+            job = db.session.get(Job, job_id)
+            db.session.refresh(job)
+            self.assertEqual((job.status, job.attempts, job.locked_by), (JobStatus.QUEUED, attempt, None))
+            self.assertIn('upstream unavailable', job.last_error)
+            delay = (job.run_at - before).total_seconds()
+            self.assertAlmostEqual(delay, 10.0 * 2 ** (attempt - 1), delta=1.0)
+            # Not due yet
+            self.assertIsNone(self.worker.claim())
+            db.session.query(Job).filter(Job.id == job_id).update({Job.run_at: datetime.utcnow()})
+            db.session.commit()
+
+        self.worker.run_job(self.worker.claim())
+        job = db.session.get(Job, job_id)
+        db.session.refresh(job)
+        self.assertEqual((job.status, job.attempts), (JobStatus.FAILED, 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(len(calls), 3)
+        self.assertIsNone(self.worker.claim())
+
+    def test_job_whose_worker_keeps_dying_is_dead_lettered(self):
+        job_id = self.enqueue('test_flaky', fail=False)
+        db.session.query(Job).filter(Job.id == job_id).update({
+            Job.status: JobStatus.RUNNING, Job.attempts: 3, Job.locked_by: 'gone:1:1',
+            Job.locked_until: datetime.utcnow() - timedelta(seconds=1)
+        })
+        db.session.commit()
+        self.assertIsNone(self.worker.claim())
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Job, job_id).status, JobStatus.FAILED)
+        self.assertEqual(calls, [])
+
+    def test_heartbeat_keeps_a_long_job_leased(self):
+        worker = JobWorker(self.app, visibility_timeout=0.3)
+        job_id = self.enqueue('test_slow', seconds=0.8)
+        job = worker.claim()
+        first_lease = job.locked_until
+        stolen = []
+
+        def steal():
+            time.sleep(0.5)
+            with self.app.app_context():
+                stolen.append(JobWorker(self.app).claim())
+                db.session.remove()
+
+        thief = threading.Thread(target=steal)
+        thief.start()
+        worker.run_job(job)
+        thief.join()
+        self.assertEqual(stolen, [None])
+        job = db.session.get(Job, job_id)
+        db.session.refresh(job)
+        self.assertEqual((job.status, job.attempts), (JobStatus.SUCCEEDED, 1))
+        self.assertGreater(job.finished_at, first_lease)
+
+
+class TestEvidenceProcessingJob(DatabaseTestCase):
+    """AI failures propagate so the queue's retry path runs."""
+
+    def test_ai_failure_is_raised(self):
+        from utils.evidence_processor import process_evidence_job
+        from models.user import User
+        from models.case import Case, CaseType
+        from models.evidence import Evidence, EvidenceStatus
+
+        user = User(email='jobs@example.com')
+        db.session.add(user)
+        db.session.flush()
+        case = Case(title='Case', user_id=user.id, case_type=CaseType.CIVIL, province='ON')
+        db.session.add(case)
+        db.session.flush()
+        evidence = Evidence(filename='a.pdf', original_filename='a.pdf', file_path='/tmp/a.pdf',
+                            evidence_type='document', case_id=case.id, user_id=user.id)
+        db.session.add(evidence)
+        db.session.commit()
+
+        with mock.patch('utils.evidence_processor.canadian_law_ai.analyze_evidence_relevance',
+                        side_effect=ConnectionError('AI service down')):
+            with self.assertRaises(ConnectionError):
+                process_evidence_job(evidence.id)
+        db.session.rollback()
+        self.assertNotEqual(db.session.get(Evidence, evidence.id).status, EvidenceStatus.REVIEWED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the queued, non-blocking logging pipeline.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.log_pipeline import LogPipeline, SharedRotatingFileHandler
+
+
+class TestLogPipeline(unittest.TestCase):
+    """Records are written by the writer thread as JSON and dropped, not blocked on, when the queue is full."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.logger = logging.getLogger(f"test_log_pipeline.{self.id()}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        self.logger.handlers.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def read_lines(self, filename):
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_records_are_routed_as_json(self):
+        pipeline = LogPipeline(directory=self.directory, console=False)
+        self.logger.addHandler(pipeline.handler('security'))
+        try:
+            raise ValueError('bad token')
+        except ValueError:
+            self.logger.exception('Login failed for %s', 'alice', extra={'user_id': 7})
+        pipeline.stop()
+
+        [entry] = self.read_lines('security.log')
+        self.assertEqual(entry['message'], 'Login failed for alice')
+        self.assertEqual(entry['level'], 'ERROR')
+        self.assertEqual(entry['user_id'], 7)
+        self.assertIn('ValueError: bad token', entry['exception'])
+        self.assertEqual(self.read_lines('app.log'), [])
+
+    def test_full_queue_drops_without_blocking(self):
+        pipeline = LogPipeline(directory=self.directory, queue_size=2, error_wait=0.05, console=False)
+        self.logger.addHandler(pipeline.handler('app'))
+        pipeline.start()
+        # Stop the writer so nothing drains the queue
+        pipeline.stop()
+
+        start = time.monotonic()
+        for i in range(5):
+            self.logger.info('filler %d', i)
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.logger.error('lost error')
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        stats = pipeline.stats()
+        self.assertEqual(stats['queued'], 2)
+        self.assertEqual(stats['dropped'], {'INFO': 3, 'ERROR': 1})
+
+
+class TestSharedRotatingFileHandler(unittest.TestCase):
+    """Rotation by size and by day, tolerating another process rotating first."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'app.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def emit(self, handler, message):
+        handler.handle(logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+    def test_rotates_by_size(self):
+        handler = SharedRotatingFileHandler(self.path, max_bytes=100, backup_count=2, daily=False)
+        for i in range(10):
+            self.emit(handler, 'x' * 40)
+        handler.close()
+        self.assertTrue(os.path.exists(f"{self.path}.1"))
+        self.assertTrue(os.path.exists(f"{self.path}.2"))
+        self.assertFalse(os.path.exists(f"{self.path}.3"))
+        self.assertLessEqual(os.path.getsize(self.path), 100)
+
+    def test_rotates_daily(self):
+        handler = SharedRotatingFileHandler(self.path, max_bytes=0, backup_count=1)
+        self.emit(handler, 'yesterday')
+        yesterday = time.time() - 86400
+        os.utime(self.path, (yesterday, yesterday))
+        self.emit(handler, 'today')
+        handler.close()
+        with open(f"{self.path}.1") as f:
+            self.assertEqual(f.read(), 'yesterday\n')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'today\n')
+
+    def test_follows_rotation_by_another_process(self):
+        handler = SharedRotatingFileHandler(self.path, max_bytes=0, backup_count=1, daily=False)
+        self.emit(handler, 'before')
+        os.rename(self.path, f"{self.path}.1")
+        self.emit(handler, 'after')
+        handler.close()
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'after\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
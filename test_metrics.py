@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for the multiprocess /metrics collector.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from utils.db import db
+from utils.metrics import MetricsRegistry, MmapedValues, read_values, init_metrics, registry
+
+
+def exited_pid():
+    """The pid of a process that has already exited"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Values written by several processes are merged into one exposition."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = MetricsRegistry(directory=self.directory)
+        self.requests = self.registry.counter('requests_total', 'Requests', ('endpoint',))
+        self.in_flight = self.registry.gauge('in_flight', 'In flight')
+        self.latency = self.registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_worker(self, kind, pid, metric, sample, labels, value):
+        values = MmapedValues(os.path.join(self.directory, f"{kind}_{pid}.db"))
+        values.set(metric._key(sample, labels), value)
+        values.close()
+
+    def test_values_file_grows_and_reopens(self):
+        path = os.path.join(self.directory, 'counter_1.db')
+        values = MmapedValues(path)
+        for i in range(3000):
+            values.add(f"key-{i}", i)
+        values.add('key-7', 1)
+        values.close()
+        self.assertGreater(os.path.getsize(path), MmapedValues.INITIAL_SIZE)
+        reopened = MmapedValues(path)
+        self.assertEqual(reopened.get('key-7'), 8)
+        self.assertEqual(len(read_values(path)), 3000)
+        reopened.close()
+
+    def test_counters_sum_across_processes_including_exited_ones(self):
+        self.requests.inc(endpoint='index')
+        self.requests.inc(2, endpoint='index')
+        self.write_worker('counter', exited_pid(), self.requests, 'requests_total', {'endpoint': 'index'}, 4)
+        output = self.registry.render()
+        self.assertIn('# TYPE requests_total counter', output)
+        self.assertIn('requests_total{endpoint="index"} 7', output)
+
+    def test_gauges_from_dead_processes_are_dropped(self):
+        self.in_flight.inc()
+        self.in_flight.inc()
+        self.write_worker('gauge_livesum', os.getppid(), self.in_flight, 'in_flight', {}, 3)
+        self.write_worker('gauge_livesum', exited_pid(), self.in_flight, 'in_flight', {}, 100)
+        self.assertIn('\nin_flight 5\n', self.registry.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.05, 0.5, 0.5, 5):
+            self.latency.observe(value)
+        output = self.registry.render()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', output)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 3', output)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', output)
+        self.assertIn('latency_seconds_count 4', output)
+        self.assertIn('latency_seconds_sum 6.05', output)
+
+    def test_label_values_are_escaped(self):
+        self.requests.inc(endpoint='a"b\\c')
+        self.assertIn('requests_total{endpoint="a\\"b\\\\c"} 1', self.registry.render())
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Requests are recorded per endpoint and served as Prometheus text."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.previous_directory = registry._directory
+        registry._directory = self.directory
+        # Value files opened by earlier tests point at the previous directory
+        self.previous_files = registry._files
+        registry._files = {}
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['TESTING'] = True
+        db.init_app(self.app)
+        init_metrics(self.app)
+
+        @self.app.route('/ping')
+        def ping():
+            return 'pong'
+
+        self.client = self.app.test_client()
+        self.auth = {'Authorization': 'Bearer secret'}
+        os.environ['METRICS_TOKEN'] = 'secret'
+
+    def tearDown(self):
+        os.environ.pop('METRICS_TOKEN', None)
+        registry._directory = self.previous_directory
+        registry._files = self.previous_files
+        registry.app = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_requests_are_recorded(self):
+        self.client.get('/ping')
+        self.client.get('/missing')
+        response = self.client.get('/metrics', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        body = response.get_data(as_text=True)
+        self.assertIn('http_requests_total{endpoint="ping",method="GET",status="200"} 1', body)
+        self.assertIn('http_requests_total{endpoint="unmatched",method="GET",status="404"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{endpoint="ping",method="GET"} 1', body)
+        self.assertIn('http_requests_in_flight{blueprint="app"} 1', body)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer \u00e9'}).status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers=self.auth).status_code, 200)
+
+    def test_denied_when_no_token_is_configured(self):
+        del os.environ['METRICS_TOKEN']
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for recorded schema migrations and index creation.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql
+from testing import DatabaseTestCase
+from utils.db import db
+from utils.migrations import MIGRATIONS, ensure_indexes, pending_migrations, run_migrations
+from models.user import User  # noqa: F401
+from models.case import Case  # noqa: F401
+from models.notification import Notification  # noqa: F401
+from models.evidence import Evidence  # noqa: F401
+from models.payment import Payment  # noqa: F401
+
+
+class TestMigrations(DatabaseTestCase):
+    """Migrations apply once, and index builds on PostgreSQL do not lock the table."""
+
+    def test_run_migrations_applies_each_once(self):
+        db.session.remove()
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP INDEX ix_cases_user_id_created_at')
+        self.assertEqual(run_migrations(), [version for version, _ in MIGRATIONS])
+        self.assertIn('ix_cases_user_id_created_at', [index['name'] for index in inspect(db.engine).get_indexes('cases')])
+        self.assertEqual(pending_migrations(), [])
+        self.assertEqual(run_migrations(), [])
+
+    def test_postgresql_indexes_are_built_concurrently(self):
+        statements = []
+        connection = mock.Mock()
+        connection.dialect = postgresql.dialect()
+
+        def execute(statement, *args):
+            statements.append(str(statement.compile(dialect=connection.dialect)))
+            result = mock.Mock()
+            # Missing, then left invalid by an interrupted build
+            result.scalar.return_value = [None, False][len(statements) > 2]
+            return result
+
+        connection.execute.side_effect = execute
+        ensure_indexes(connection, 'ix_cases_user_id_created_at', 'ix_payments_user_id_created_at')
+        self.assertTrue(statements[1].startswith('CREATE INDEX CONCURRENTLY ix_cases_user_id_created_at'))
+        self.assertEqual(statements[3], 'DROP INDEX CONCURRENTLY IF EXISTS "ix_payments_user_id_created_at"')
+        self.assertTrue(statements[4].startswith('CREATE INDEX CONCURRENTLY ix_payments_user_id_created_at'))
+        self.assertEqual(len(statements), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
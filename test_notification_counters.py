@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-user notification counters behind the unread badge.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from testing import DatabaseTestCase
+from utils.db import db, track_queries
+from utils.dashboard import dashboard_manager
+from utils.notification_system import NotificationManager
+from models.user import User
+from models.notification import Notification, NotificationCounter, NotificationPriority, NotificationType
+
+
+class TestNotificationCounters(DatabaseTestCase):
+    """Counters must match a fresh count after every manager operation."""
+
+    def setUp(self):
+        super().setUp()
+        users = [User(email='one@example.com'), User(email='two@example.com')]
+        db.session.add_all(users)
+        db.session.commit()
+        self.user_id, self.other_id = [user.id for user in users]
+        self.manager = NotificationManager()
+        self.ids = [
+            self.manager.create_notification(self.user_id, f'N{i}', 'm', notif_type, priority).id
+            for i, (notif_type, priority) in enumerate([
+                (NotificationType.CASE_UPDATE, NotificationPriority.URGENT),
+                (NotificationType.HEARING_REMINDER, NotificationPriority.HIGH),
+                (NotificationType.SYSTEM_ALERT, NotificationPriority.LOW),
+            ])
+        ]
+
+    def assertCountersMatch(self, user_id):
+        self.assertEqual(self.manager.get_notification_summary(user_id), self.manager._count(user_id))
+
+    def test_summary_is_one_primary_key_read(self):
+        with track_queries() as stats:
+            summary = self.manager.get_notification_summary(self.user_id)
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(summary, {'total_count': 3, 'unread_count': 3, 'urgent_count': 1,
+                                   'high_count': 1, 'deadline_count': 1})
+
+    def test_mark_read_counts_once(self):
+        self.assertTrue(self.manager.mark_notification_read(self.ids[0], self.user_id))
+        self.assertTrue(self.manager.mark_notification_read(self.ids[0], self.user_id))
+        self.assertFalse(self.manager.mark_notification_read(self.ids[1], self.other_id))
+        summary = self.manager.get_notification_summary(self.user_id)
+        self.assertEqual((summary['unread_count'], summary['urgent_count']), (2, 0))
+        self.assertCountersMatch(self.user_id)
+
+    def test_mark_all_read_and_delete(self):
+        self.assertTrue(self.manager.mark_all_read(self.user_id))
+        self.assertEqual(self.manager.get_unread_count(self.user_id), 0)
+        self.assertTrue(self.manager.delete_notification(self.ids[2], self.user_id))
+        self.assertFalse(self.manager.delete_notification(self.ids[1], self.other_id))
+        self.assertEqual(self.manager.get_notification_summary(self.user_id)['total_count'], 2)
+        self.assertCountersMatch(self.user_id)
+
+    def test_mark_all_read_invalidates_dashboard(self):
+        dashboard_manager.cache.clear()
+        self.assertEqual(len(dashboard_manager.get_user_dashboard(self.user_id)['notifications']), 3)
+        self.manager.mark_all_read(self.user_id)
+        self.assertEqual(dashboard_manager.get_user_dashboard(self.user_id)['notifications'], [])
+
+    def test_missing_rows_are_seeded_and_recounted(self):
+        db.session.add(Notification(user_id=self.other_id, title='Direct', message='m',
+                                    notification_type=NotificationType.CASE_UPDATE))
+        db.session.commit()
+        self.assertIsNone(db.session.get(NotificationCounter, self.other_id))
+        self.assertEqual(self.manager.get_unread_count(self.other_id), 1)
+        self.assertIsNotNone(db.session.get(NotificationCounter, self.other_id))
+
+        db.session.execute(NotificationCounter.__table__.update().values(unread_count=40))
+        db.session.commit()
+        self.assertEqual(self.manager.recount(), 2)
+        self.assertCountersMatch(self.user_id)
+        self.assertCountersMatch(self.other_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the notification event broker behind the SSE endpoint.
+"""
+
+import os
+import sys
+import socket
+import unittest
+from unittest import mock
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask_login import LoginManager
+from testing import DatabaseTestCase
+from utils.db import db
+from utils.notification_stream import NotificationBroker, client_disconnected, notification_broker
+from utils.notification_system import NotificationManager
+from models.user import User
+from models.notification import NotificationType
+
+
+class TestNotificationBroker(DatabaseTestCase):
+    """Events follow commits, streams resume and connections are capped."""
+
+    def setUp(self):
+        super().setUp()
+        user = User(email='stream@example.com')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.manager = NotificationManager()
+
+    def _create(self, title):
+        return self.manager.create_notification(self.user_id, title, 'm', NotificationType.CASE_UPDATE).id
+
+    def _drain(self, subscription):
+        messages = []
+        while not subscription.queue.empty():
+            messages.append(subscription.queue.get_nowait())
+        return messages
+
+    def test_events_are_delivered_on_commit_only(self):
+        subscription = notification_broker.subscribe(self.user_id)
+        try:
+            notification_id = self._create('Hearing moved')
+            messages = self._drain(subscription)
+            self.assertEqual([m['event'] for m in messages], ['notification', 'unread'])
+            self.assertEqual(messages[0]['id'], notification_id)
+            self.assertEqual(messages[1]['data']['unread_count'], 1)
+
+            notification_broker.publish(self.user_id, 'unread', {'unread_count': 99})
+            db.session.rollback()
+            self.assertEqual(self._drain(subscription), [])
+
+            self.manager.mark_all_read(self.user_id)
+            self.assertEqual(self._drain(subscription)[0]['data']['unread_count'], 0)
+        finally:
+            notification_broker.unsubscribe(subscription)
+
+    def test_connection_cap(self):
+        broker = NotificationBroker(max_connections=1)
+        first = broker.subscribe(self.user_id)
+        self.assertIsNone(broker.subscribe(self.user_id))
+        broker.unsubscribe(first)
+        broker.unsubscribe(first)
+        self.assertIsNotNone(broker.subscribe(self.user_id))
+        self.assertEqual(broker.stats()['rejected'], 1)
+        self.assertEqual(broker.stats()['connections'], 1)
+
+    def test_stream_resumes_after_last_event_id_and_heartbeats(self):
+        first = self._create('First')
+        second = self._create('Second')
+        broker = NotificationBroker(heartbeat=0.01, max_duration=0.05, resync_interval=60)
+        subscription = broker.subscribe(self.user_id)
+        frames = list(broker.stream(subscription, first,
+                                    lambda: self.manager.get_notification_summary(self.user_id),
+                                    lambda last_id: self.manager.get_notifications_since(self.user_id, last_id)))
+        self.assertTrue(frames[0].startswith('retry: '))
+        self.assertTrue(frames[1].startswith(f'id: {second}\nevent: notification\n'))
+        self.assertIn('event: unread', frames[2])
+        self.assertIn(': heartbeat\n\n', frames[3:])
+        self.assertEqual(broker.stats()['connections'], 0)
+
+    def test_full_queue_resyncs_from_the_database(self):
+        broker = NotificationBroker(queue_size=1, heartbeat=0.01, max_duration=0.05)
+        subscription = broker.subscribe(self.user_id)
+        for count in range(3):
+            broker.deliver({'user_id': self.user_id, 'event': 'unread', 'data': {'unread_count': count}, 'id': None})
+        self.assertTrue(subscription.lagged)
+        self.assertEqual(broker.stats()['dropped'], 2)
+        frames = list(broker.stream(subscription, None,
+                                    lambda: self.manager.get_notification_summary(self.user_id),
+                                    lambda last_id: []))
+        unread = [frame for frame in frames if 'event: unread' in frame]
+        self.assertIn('"unread_count": 0', unread[-1])
+
+    def test_stream_ends_when_the_client_disconnects(self):
+        server, client = socket.socketpair()
+        try:
+            disconnected = client_disconnected({'gunicorn.socket': server})
+            self.assertFalse(disconnected())
+            client.close()
+            self.assertTrue(disconnected())
+
+            broker = NotificationBroker(heartbeat=0.01, max_duration=60)
+            subscription = broker.subscribe(self.user_id)
+            frames = list(broker.stream(subscription, None,
+                                        lambda: self.manager.get_notification_summary(self.user_id),
+                                        lambda last_id: [], disconnected))
+            self.assertEqual(len(frames), 2)
+            self.assertEqual(broker.stats()['connections'], 0)
+        finally:
+            server.close()
+        self.assertFalse(client_disconnected({})())
+
+
+class TestNotificationStreamRoute(DatabaseTestCase):
+    """The endpoint turns clients away at the cap and replays what they missed once back in."""
+
+    config = {'SECRET_KEY': 'test'}
+
+    def setUp(self):
+        super().setUp()
+        from routes.notification_routes import notification_bp
+        login_manager = LoginManager()
+        login_manager.init_app(self.app)
+        login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+        self.app.register_blueprint(notification_bp)
+
+        user = User(email='route@example.com')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.manager = NotificationManager()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+
+        patcher = mock.patch.multiple(notification_broker, max_connections=1, heartbeat=0.01, max_duration=0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create(self, title):
+        return self.manager.create_notification(self.user_id, title, 'm', NotificationType.CASE_UPDATE).id
+
+    def _connect(self, last_event_id):
+        response = self.client.get('/notifications/stream', headers={'Last-Event-ID': str(last_event_id)})
+        body = response.get_data(as_text=True)
+        response.close()
+        return response, body
+
+    def test_full_worker_returns_503(self):
+        held = notification_broker.subscribe(self.user_id)
+        try:
+            response, _ = self._connect(0)
+        finally:
+            notification_broker.unsubscribe(held)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '60')
+        self.assertEqual(notification_broker.stats()['connections'], 0)
+
+    def test_last_event_id_replays_notifications_missed_while_rejected(self):
+        seen = self._create('Seen')
+        held = notification_broker.subscribe(self.user_id)
+        try:
+            missed = [self._create('Missed 1')]
+            response, _ = self._connect(seen)
+            self.assertEqual(response.status_code, 503)
+            missed.append(self._create('Missed 2'))
+        finally:
+            notification_broker.unsubscribe(held)
+
+        response, body = self._connect(seen)
+        self.assertEqual(response.status_code, 200)
+        replayed = [int(line[4:]) for line in body.splitlines() if line.startswith('id: ')]
+        self.assertEqual(replayed, missed)
+        self.assertEqual(notification_broker.stats()['connections'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
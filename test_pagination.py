@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for keyset pagination cursors and the Newest/Older pager.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import render_template_string
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from testing import DatabaseTestCase
+from utils.db import db
+from utils.pagination import CursorError, _after, decode_cursor, encode_cursor, paginate_keyset
+from models.user import User
+from models.case import Case, CaseType
+
+
+class TestKeysetPagination(DatabaseTestCase):
+    """Walking every page returns each row once, in order, including rows with equal timestamps."""
+
+    def setUp(self):
+        super().setUp()
+        self.app.template_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+        user = User(email='pages@example.com')
+        db.session.add(user)
+        db.session.flush()
+        # Seven cases share one timestamp, so only the id breaks the ties
+        shared = datetime(2024, 5, 1, 12, 0, 0)
+        times = [datetime(2024, 5, 2, 9, 0, 0)] + [shared] * 7 + [datetime(2024, 4, 30, 8, 0, 0)] * 2
+        db.session.add_all(Case(title=f'Case {i}', user_id=user.id, case_type=CaseType.CIVIL, province='ON',
+                                created_at=created_at) for i, created_at in enumerate(times))
+        db.session.commit()
+        self.expected = [case.id for case in Case.query.order_by(Case.created_at.desc(), Case.id.desc())]
+        self.columns = (Case.created_at, Case.id)
+
+    def walk(self, limit):
+        ids, cursor, pages = [], None, []
+        while True:
+            page = paginate_keyset(Case.query, self.columns, cursor, limit)
+            pages.append(page)
+            ids.extend(case.id for case in page)
+            if not page.has_next:
+                return ids, pages
+            cursor = page.next_cursor
+
+    def test_cursor_round_trip(self):
+        values = [datetime(2024, 5, 1, 12, 0, 0, 123456), 42]
+        cursor = encode_cursor(values)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor, self.columns), values)
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ('not base64!', encode_cursor([1]), encode_cursor(['yesterday', 1])):
+            with self.assertRaises(CursorError):
+                decode_cursor(cursor, self.columns)
+
+    def test_ties_on_created_at_are_neither_skipped_nor_repeated(self):
+        for limit in (1, 3, 4):
+            ids, _ = self.walk(limit)
+            self.assertEqual(ids, self.expected, f"limit={limit}")
+
+    def test_last_page(self):
+        ids, pages = self.walk(5)
+        self.assertEqual([len(page) for page in pages], [5, 5])
+        self.assertFalse(pages[-1].has_next)
+        self.assertIsNone(pages[-1].next_cursor)
+        self.assertEqual(pages[-1].to_dict(lambda case: case.id)['items'], self.expected[5:])
+
+        past_end = paginate_keyset(Case.query, self.columns, encode_cursor([datetime(2000, 1, 1), 0]), 5)
+        self.assertEqual((len(past_end), past_end.has_next), (0, False))
+
+    def test_seek_starts_an_index_range_scan(self):
+        values = [datetime(2024, 5, 1, 12, 0, 0), 5]
+        seek = str(_after(self.columns, values, True, 'sqlite').compile(db.engine))
+        self.assertTrue(seek.startswith('cases.created_at <= ? AND (cases.created_at < ? OR '), seek)
+        query = Case.query.filter(Case.user_id == 1, _after(self.columns, values, True, 'sqlite'))
+        query = query.order_by(Case.created_at.desc(), Case.id.desc()).limit(5)
+        compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = ' '.join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+        self.assertIn('USING INDEX ix_cases_user_id_created_at (user_id=? AND created_at<?)', plan)
+
+        seek = str(_after(self.columns, values, False, 'postgresql').compile(dialect=postgresql.dialect()))
+        self.assertEqual(seek, '(cases.created_at, cases.id) > (%(param_1)s, %(param_2)s)')
+
+    def test_pager_links_follow_the_cursor(self):
+        self.app.add_url_rule('/cases', 'cases', lambda: '')
+        template = ('{% from "macros/pagination.html" import cursor_pager with context %}'
+                    '{{ cursor_pager(page, "cases") }}')
+        first = paginate_keyset(Case.query, self.columns, None, 4)
+        with self.app.test_request_context('/cases'):
+            html = render_template_string(template, page=first)
+        self.assertIn(f'href="/cases?cursor={first.next_cursor}"', html)
+        self.assertNotIn('Newest', html)
+
+        last = paginate_keyset(Case.query, self.columns, first.next_cursor, 10)
+        with self.app.test_request_context(f'/cases?cursor={first.next_cursor}&limit=10'):
+            html = render_template_string(template, page=last)
+        self.assertIn('href="/cases?limit=10">Newest', html)
+        self.assertNotIn('Older', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for per-scope query counting and timing in utils.db.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from testing import DatabaseTestCase
+from utils import db as db_module
+from utils.db import db, track_queries
+
+
+class TestQueryTracking(DatabaseTestCase):
+    """Each statement is timed on its own, including statements that fail."""
+
+    def test_failed_query_does_not_skew_the_next_one(self):
+        clock = mock.Mock()
+        # failing query: starts at 0, errors at 1; good query: 10 to 12
+        clock.perf_counter.side_effect = [0.0, 1.0, 10.0, 12.0]
+        with mock.patch.object(db_module, 'time', clock), track_queries() as stats:
+            with self.assertRaises(OperationalError):
+                db.session.execute(text('SELECT * FROM no_such_table'))
+            db.session.rollback()
+            self.assertEqual(db.session.execute(text('SELECT 1')).scalar(), 1)
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.seconds, 3.0)
+        self.assertNotIn('query_start', db.session.connection().info)
+
+    def test_budget(self):
+        with track_queries(budget=1, reject=True) as stats:
+            db.session.execute(text('SELECT 1'))
+            with self.assertRaises(db_module.QueryBudgetExceeded):
+                db.session.execute(text('SELECT 2'))
+        self.assertTrue(stats.over_budget)
+
+
+if __name__ == '__main__':
+    unittest.main()
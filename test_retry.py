@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Tests for circuit breakers, retry budgets, deadlines and the retry decorators.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.retry import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryBudget, async_retry, deadline, remaining_time, retry
+)
+from utils import retry as retry_module
+
+
+class Flaky:
+    """Fails ``failures`` times with ``error``, then returns 'ok'"""
+
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.__name__ = 'flaky'
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error(f'failure {self.calls}')
+        return 'ok'
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Closed -> open -> half-open -> closed, with a single probe while half-open."""
+
+    def open_breaker(self, **kwargs):
+        breaker = CircuitBreaker('test', failure_threshold=2, recovery_timeout=0.05, **kwargs)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                breaker.call(Flaky(1))
+        return breaker
+
+    def test_full_cycle(self):
+        breaker = self.open_breaker()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(Flaky(0))
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.call(Flaky(0)), 'ok')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        snapshot = breaker.snapshot()
+        self.assertEqual(snapshot['transitions'], {'closed->open': 1, 'open->half_open': 1, 'half_open->closed': 1})
+        self.assertEqual(snapshot['rejected'], 1)
+
+    def test_failed_probe_reopens(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        with self.assertRaises(ConnectionError):
+            breaker.call(Flaky(1))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(Flaky(0))
+
+    def test_half_open_admits_one_probe_at_a_time(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # A second caller while the probe is in flight is turned away
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_unrelated_exception_frees_the_probe(self):
+        breaker = self.open_breaker(exceptions=(ConnectionError,))
+        time.sleep(0.06)
+        with self.assertRaises(KeyError):
+            breaker.call(Flaky(1, KeyError))
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker.call(Flaky(0)), 'ok')
+
+
+class TestRetry(unittest.TestCase):
+    """The decorators stop at the retry limit, the budget, an open circuit and the deadline."""
+
+    def test_retries_until_success(self):
+        flaky = Flaky(2)
+        self.assertEqual(retry(max_retries=3, initial_delay=0)(flaky)(), 'ok')
+        self.assertEqual(flaky.calls, 3)
+
+    def test_gives_up_after_max_retries(self):
+        flaky = Flaky(10)
+        with self.assertRaises(ConnectionError):
+            retry(max_retries=2, initial_delay=0)(flaky)()
+        self.assertEqual(flaky.calls, 3)
+
+    def test_budget_exhaustion_stops_retries(self):
+        budget = RetryBudget('test', ratio=0.0, min_retries=1)
+        first, second = Flaky(10), Flaky(10)
+        with self.assertRaises(ConnectionError):
+            retry(max_retries=5, initial_delay=0, budget=budget)(first)()
+        with self.assertRaises(ConnectionError):
+            retry(max_retries=5, initial_delay=0, budget=budget)(second)()
+        self.assertEqual((first.calls, second.calls), (2, 1))
+        self.assertEqual(budget.snapshot(), {'requests': 2, 'retries': 1, 'exhausted': 2})
+
+    def test_open_circuit_stops_retries(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, recovery_timeout=60)
+        flaky = Flaky(10)
+        with self.assertRaises(ConnectionError):
+            retry(max_retries=5, initial_delay=0, breaker=breaker)(flaky)()
+        self.assertEqual(flaky.calls, 2)
+        with self.assertRaises(CircuitOpenError):
+            retry(max_retries=5, initial_delay=0, breaker=breaker)(flaky)()
+        self.assertEqual(flaky.calls, 2)
+
+    def test_nested_deadlines_never_extend_the_outer_one(self):
+        self.assertIsNone(remaining_time())
+        with deadline(0.5):
+            with deadline(60):
+                self.assertLessEqual(remaining_time(), 0.5)
+            with deadline(0.1):
+                self.assertLessEqual(remaining_time(), 0.1)
+        self.assertIsNone(remaining_time())
+
+    def test_no_retry_that_would_outlive_the_deadline(self):
+        flaky = Flaky(10)
+        with deadline(0.5):
+            with self.assertRaises(ConnectionError):
+                retry(max_retries=5, initial_delay=1.0, jitter=0)(flaky)()
+        self.assertEqual(flaky.calls, 1)
+
+    def test_passed_deadline_raises_before_calling(self):
+        flaky = Flaky(0)
+        with mock.patch('utils.retry.remaining_time', return_value=0.0):
+            with self.assertRaises(DeadlineExceeded):
+                retry()(flaky)()
+        self.assertEqual(flaky.calls, 0)
+
+    def test_async_retry(self):
+        flaky = Flaky(2)
+        breaker = CircuitBreaker('test', failure_threshold=5)
+
+        @async_retry(max_retries=3, initial_delay=0, breaker=breaker)
+        async def call():
+            await asyncio.sleep(0)
+            return flaky()
+
+        self.assertEqual(asyncio.run(call()), 'ok')
+        self.assertEqual(flaky.calls, 3)
+        snapshot = breaker.snapshot()
+        self.assertEqual((snapshot['failures'], snapshot['successes']), (2, 1))
+
+    def test_async_retry_fails_fast_on_an_open_circuit(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=60)
+        breaker.record_failure()
+        flaky = Flaky(0)
+
+        @async_retry(initial_delay=0, breaker=breaker)
+        async def call():
+            return flaky()
+
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(call())
+        self.assertEqual(flaky.calls, 0)
+
+
+
+class UnavailableHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestUpstreamAttempts(unittest.TestCase):
+    """A budgeted call is retried by the decorator only, not again by the HTTP client."""
+
+    def setUp(self):
+        UnavailableHandler.hits = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), UnavailableHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        # Fresh breakers and budgets, and no backoff sleeps
+        patches = [mock.patch.dict(retry_module._breakers, clear=True),
+                   mock.patch.dict(retry_module._budgets, clear=True),
+                   mock.patch.object(retry_module.time, 'sleep')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_every_response_503(self):
+        from requests import HTTPError
+        from utils.cloudflare import _get as cloudflare_get
+        from utils.canadian_law_ai import canadian_law_ai
+
+        with self.assertRaises(HTTPError):
+            cloudflare_get(self.url, {})
+        self.assertEqual(UnavailableHandler.hits, 3)
+        self.assertEqual(retry_module.get_retry_budget('cloudflare').snapshot()['retries'], 2)
+
+        UnavailableHandler.hits = 0
+        with self.assertRaises(HTTPError):
+            canadian_law_ai._get(self.url, {})
+        self.assertEqual(UnavailableHandler.hits, 3)
+
+        # The override applied to those calls only; unbudgeted callers keep the client's retries
+        from utils.http_client import http_client
+        UnavailableHandler.hits = 0
+        self.assertEqual(http_client.get(self.url).status_code, 503)
+        self.assertEqual(UnavailableHandler.hits, 1 + http_client.retries)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for Range, If-Range and conditional downloads of encrypted evidence.
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask_login import LoginManager
+from cryptography.fernet import Fernet
+from testing import DatabaseTestCase
+from utils.db import db
+from utils.secure_storage import SecureFileManager
+from models.user import User
+from models.case import Case, CaseType
+from models.evidence import Evidence
+
+
+class TestSecureFileDownloads(DatabaseTestCase):
+    """Ranged downloads decrypt only what was asked for and honour the validators."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = {'SECRET_KEY': 'test', 'ENCRYPTION_KEY': Fernet.generate_key().decode(),
+                       'ENCRYPTED_FOLDER': self.directory, 'ENCRYPTION_FRAME_SIZE': 1024}
+        super().setUp()
+        from routes.secure_file_routes import secure_file_bp
+        login_manager = LoginManager()
+        login_manager.init_app(self.app)
+        login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+        self.app.register_blueprint(secure_file_bp)
+
+        # Spans three frames, the last one partial
+        self.data = os.urandom(3000)
+        plain_path = os.path.join(self.directory, 'evidence.pdf')
+        with open(plain_path, 'wb') as f:
+            f.write(self.data)
+        encrypted_path = SecureFileManager().encrypt_file(plain_path)
+
+        user = User(email='ranges@example.com')
+        db.session.add(user)
+        db.session.flush()
+        case = Case(title='Case', user_id=user.id, case_type=CaseType.CIVIL, province='ON')
+        db.session.add(case)
+        db.session.flush()
+        self.etag = hashlib.sha256(self.data).hexdigest()
+        evidence = Evidence(filename='evidence.pdf', original_filename='evidence.pdf', file_path=encrypted_path,
+                            file_hash=self.etag, mime_type='application/pdf', evidence_type='document',
+                            case_id=case.id, user_id=user.id)
+        db.session.add(evidence)
+        db.session.commit()
+        self.url = f'/secure-files/download/{evidence.id}'
+        self.evidence_id = evidence.id
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_full_download(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.data)
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.headers['ETag'], f'"{self.etag}"')
+
+    def test_single_range_across_a_frame_boundary(self):
+        response = self.get(Range='bytes=1000-2100')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 1000-2100/3000')
+        self.assertEqual(response.content_length, 1101)
+        self.assertEqual(response.data, self.data[1000:2101])
+
+    def test_suffix_range(self):
+        response = self.get(Range='bytes=-100')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 2900-2999/3000')
+        self.assertEqual(response.data, self.data[-100:])
+
+    def test_multiple_ranges_are_multipart(self):
+        response = self.get(Range='bytes=0-9,2048-2057')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.mimetype, 'multipart/byteranges')
+        boundary = response.mimetype_params['boundary']
+        self.assertEqual(response.content_length, len(response.data))
+
+        parts = response.data.split(f'--{boundary}'.encode())
+        self.assertEqual(parts[-1], b'--\r\n')
+        bodies = [part.split(b'\r\n\r\n', 1) for part in parts[1:-1]]
+        self.assertIn(b'Content-Range: bytes 0-9/3000', bodies[0][0])
+        self.assertIn(b'Content-Range: bytes 2048-2057/3000', bodies[1][0])
+        self.assertEqual([body[:-2] for _, body in bodies], [self.data[0:10], self.data[2048:2058]])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range='bytes=5000-6000')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */3000')
+
+    def test_if_range_with_a_stale_etag_sends_the_whole_file(self):
+        response = self.get(Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.data)
+
+        response = self.get(Range='bytes=0-9', **{'If-Range': f'"{self.etag}"'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, self.data[:10])
+
+    def test_if_none_match(self):
+        response = self.get(**{'If-None-Match': f'"{self.etag}"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def test_anonymous_requests_are_refused(self):
+        anonymous = self.app.test_client()
+        self.assertEqual(anonymous.get(f'/secure-files/view/{self.evidence_id}').status_code, 401)
+        self.assertEqual(anonymous.post(f'/secure-files/delete/{self.evidence_id}').status_code, 401)
+        self.assertIsNotNone(db.session.get(Evidence, self.evidence_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the background system metrics sampler.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.system_metrics import SystemMetrics, percentiles
+from utils.error_handling import HealthCheck
+
+
+class TestSystemMetrics(unittest.TestCase):
+    """Samples land in a bounded buffer and reads never block on psutil."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.metrics = SystemMetrics(interval=0.05, size=5, directory=self.directory)
+
+    def tearDown(self):
+        if self.metrics._gc in gc.callbacks:
+            gc.callbacks.remove(self.metrics._gc)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_ring_buffer_is_bounded(self):
+        for _ in range(8):
+            self.metrics.sample()
+        samples = self.metrics.samples()
+        self.assertEqual(len(samples), 5)
+        self.assertEqual(samples[-1], self.metrics.latest())
+        for field in ('cpu_percent', 'rss_bytes', 'open_fds', 'threads', 'disk_percent'):
+            self.assertIn(field, samples[-1])
+
+    def test_summary_percentiles(self):
+        self.assertEqual(percentiles([5, 1, 3, 2, 4]), {'p50': 3, 'p95': 5, 'p99': 5, 'max': 5})
+        self.metrics.sample()
+        summary = self.metrics.summary()
+        self.assertEqual(summary['samples'], 1)
+        self.assertGreater(summary['percentiles']['rss_bytes']['max'], 0)
+
+    def test_gc_pauses_are_recorded(self):
+        gc.callbacks.append(self.metrics._gc)
+        gc.collect()
+        sample = self.metrics.sample()
+        self.assertGreaterEqual(sample['gc_collections'], 1)
+        self.assertGreater(sample['gc_pause_ms'], 0)
+        self.assertEqual(self.metrics.sample()['gc_collections'], 0)
+
+    def test_workers_reads_published_summaries_and_drops_stale_ones(self):
+        self.metrics.sample()
+        stale = os.path.join(self.directory, 'system-999999.json')
+        with open(stale, 'w') as f:
+            json.dump({'pid': 999999}, f)
+        os.utime(stale, (time.time() - 60, time.time() - 60))
+        workers = self.metrics.workers()
+        self.assertEqual([worker['pid'] for worker in workers], [os.getpid()])
+        self.assertFalse(os.path.exists(stale))
+
+    def test_health_checks_read_the_buffer(self):
+        start = time.monotonic()
+        for check in (HealthCheck.check_cpu_usage, HealthCheck.check_memory_usage, HealthCheck.check_disk_usage):
+            ok, message = check()
+            self.assertNotIn('failed', message)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
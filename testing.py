@@ -0,0 +1,31 @@
+"""
+Test Support
+Shared base test case for tests that need an application context and an empty database
+"""
+
+import unittest
+from flask import Flask
+from utils.db import db
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Fresh in-memory SQLite database per test, with an app context pushed
+
+    Subclasses extend ``setUp`` (calling ``super().setUp()`` first) to add
+    their fixtures, and may set ``config`` for extra app settings.
+    """
+
+    config = {}
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config.update(self.config)
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
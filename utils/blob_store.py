@@ -0,0 +1,222 @@
+"""
+Content-Addressed Evidence Store
+Stores each distinct evidence file once, keyed by its SHA-256 hash
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Any, Optional
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from utils.db import db
+from models.evidence import Evidence, EvidenceBlob
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    """
+    Content-addressed blob store sharded by hash prefix
+
+    Blobs live at ``<root>/<hash[0:2]>/<hash[2:4]>/<hash>[.enc]``. Each blob has
+    an ``EvidenceBlob`` row whose ``ref_count`` tracks the Evidence rows that
+    point at it, so duplicate uploads only add metadata and a blob is removed
+    once its last reference is gone.
+
+    Releasing the last reference leaves the row at ``ref_count`` 0; the file
+    and row are then removed together by ``unlink`` under the row's write
+    lock, the same lock an upload of that content takes to increment it. So
+    a concurrent re-upload either re-references the blob before it is
+    removed, or waits and stores a fresh copy after.
+    """
+
+    # Files younger than this may belong to an upload that hasn't committed yet
+    GC_MIN_AGE = 3600
+
+    def __init__(self, root: str = None):
+        self.root = root or os.path.join(current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'blobs')
+        os.makedirs(self.root, exist_ok=True)
+
+    def blob_path(self, file_hash: str, encrypted: bool = False) -> str:
+        """Get the sharded storage path for a hash"""
+        name = file_hash + ('.enc' if encrypted else '')
+        return os.path.join(self.root, file_hash[0:2], file_hash[2:4], name)
+
+    def add_reference(self, staged_path: str, file_info: Dict[str, Any]) -> EvidenceBlob:
+        """
+        Take a reference on the blob for a freshly ingested file
+
+        If the content is already stored, the staged file is discarded and the
+        existing blob's reference count is incremented. Otherwise the staged
+        file is moved into its shard. The change is flushed but not committed,
+        so it lands in the same transaction as the caller's Evidence row.
+        """
+        file_hash = file_info['file_hash']
+
+        if self._increment(file_hash):
+            blob = db.session.get(EvidenceBlob, file_hash)
+            if os.path.exists(blob.file_path):
+                self._discard(staged_path)
+            else:
+                # Released and removed, but its row survived a failed unlink commit
+                os.replace(staged_path, blob.file_path)
+            return blob
+
+        blob_path = self.blob_path(file_hash, file_info.get('encrypted', False))
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(staged_path, blob_path)
+        # Garbage collection goes by age; the staged file may have been written a while ago
+        os.utime(blob_path)
+
+        blob = EvidenceBlob(
+            file_hash=file_hash,
+            file_path=blob_path,
+            file_size=file_info.get('file_size'),
+            mime_type=file_info.get('mime_type'),
+            encrypted=file_info.get('encrypted', False),
+            ref_count=1
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(blob)
+        except IntegrityError:
+            # Another request stored the same content first; share its blob
+            if not self._increment(file_hash):
+                raise
+            blob = db.session.get(EvidenceBlob, file_hash)
+            if blob.file_path != blob_path:
+                self._discard(blob_path)
+        return blob
+
+    def release(self, evidence: Evidence) -> Optional[str]:
+        """
+        Drop an Evidence row's reference to its blob
+
+        Returns the path to pass to ``unlink`` once the transaction commits,
+        or None while other rows still reference the content. Files stored
+        before the blob store existed have no blob row and are returned as-is.
+        """
+        if not evidence.file_hash:
+            return evidence.file_path
+
+        blob = db.session.get(EvidenceBlob, evidence.file_hash)
+        if blob is None or blob.file_path != evidence.file_path:
+            return evidence.file_path
+
+        db.session.query(EvidenceBlob).filter_by(file_hash=evidence.file_hash).update(
+            {EvidenceBlob.ref_count: EvidenceBlob.ref_count - 1}, synchronize_session=False
+        )
+        db.session.refresh(blob)
+        return blob.file_path if blob.ref_count <= 0 else None
+
+    def unlink(self, path: Optional[str]) -> bool:
+        """
+        Remove a released blob after the releasing transaction has committed
+
+        Runs in its own transaction: the row is deleted only if it is still
+        unreferenced, which takes its write lock, and the file is removed
+        before that commits so no upload can re-reference it in between.
+        """
+        if not path:
+            return False
+        if not path.startswith(self.root):
+            # Stored before the blob store existed; nothing else points at it
+            return self._discard(path)
+
+        file_hash = os.path.basename(path).split('.', 1)[0]
+        deleted = db.session.query(EvidenceBlob).filter(
+            EvidenceBlob.file_hash == file_hash,
+            EvidenceBlob.ref_count <= 0
+        ).delete(synchronize_session=False)
+        if not deleted:
+            # Re-referenced by a concurrent upload after it was released
+            db.session.rollback()
+            return False
+        try:
+            removed = self._discard(path)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return removed
+
+    def collect_garbage(self, min_age: float = None) -> int:
+        """
+        Remove unreferenced blobs: released ones whose ``unlink`` never ran,
+        and files with no row at all (e.g. after a failed commit)
+
+        Files modified within ``min_age`` seconds are skipped, since an
+        upload moves its file into place before its row commits.
+        """
+        min_age = self.GC_MIN_AGE if min_age is None else min_age
+        cutoff = time.time() - min_age
+        removed = 0
+
+        released = [path for (path,) in db.session.query(EvidenceBlob.file_path).filter(EvidenceBlob.ref_count <= 0)]
+        for path in released:
+            if self._modified_before(path, cutoff) and self.unlink(path):
+                removed += 1
+
+        known = {path for (path,) in db.session.query(EvidenceBlob.file_path)}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if path not in known and self._modified_before(path, cutoff) and self._discard(path):
+                    removed += 1
+        return removed
+
+    def _increment(self, file_hash: str) -> bool:
+        """Atomically bump the reference count of an existing blob"""
+        updated = db.session.query(EvidenceBlob).filter_by(file_hash=file_hash).update(
+            {EvidenceBlob.ref_count: EvidenceBlob.ref_count + 1}, synchronize_session=False
+        )
+        if updated:
+            blob = db.session.get(EvidenceBlob, file_hash)
+            if blob is not None:
+                db.session.refresh(blob)
+        return bool(updated)
+
+    @staticmethod
+    def _discard(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _modified_before(path: str, cutoff: float) -> bool:
+        try:
+            return os.path.getmtime(path) < cutoff
+        except FileNotFoundError:
+            return True
+
+
+def create_evidence(case, user_id: int, staged_path: str, file_info: Dict[str, Any], **fields) -> Evidence:
+    """Attach an ingested file to a case as a new Evidence row (not committed)"""
+    blob = BlobStore().add_reference(staged_path, file_info)
+    evidence = Evidence(
+        case_id=case.id,
+        user_id=user_id,
+        filename=os.path.basename(blob.file_path),
+        original_filename=file_info['original_filename'],
+        file_path=blob.file_path,
+        file_size=file_info.get('file_size'),
+        mime_type=file_info.get('mime_type'),
+        file_hash=file_info['file_hash'],
+        title=fields.get('title') or file_info['original_filename'],
+        description=fields.get('description', ''),
+        evidence_type=fields.get('evidence_type') or 'document'
+    )
+    db.session.add(evidence)
+    return evidence
+
+
+def delete_evidence(evidence: Evidence):
+    """Delete an Evidence row, unlinking its blob if this was the last reference"""
+    store = BlobStore()
+    orphan = store.release(evidence)
+    db.session.delete(evidence)
+    db.session.commit()
+    store.unlink(orphan)
@@ -0,0 +1,655 @@
+"""
+Caching
+Pluggable TTL caches with LRU eviction, stale-while-revalidate and hit/miss metrics
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import fnmatch
+import logging
+import sqlite3
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+CACHE_BACKENDS = ('memory', 'sqlite', 'redis', 'local')
+
+# Every cache created in this process, for metrics
+_caches = weakref.WeakSet()
+
+def all_caches():
+    """Live cache instances in this process"""
+    return list(_caches)
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory footprint of a cached value in bytes"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+def default_cache_dir() -> str:
+    """Directory for on-disk caches shared by the workers on this host"""
+    return os.environ.get('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'smartdispute-cache')
+
+class _Flight:
+    """A load in progress that concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class CacheBackend:
+    """
+    Base class for caches
+
+    Subclasses provide storage through ``_lookup``, ``_store``, ``_delete``
+    and ``_clear``; this class adds the read-through ``get_or_load`` with
+    stale-while-revalidate, and hit/miss counters. Storage errors are logged
+    and treated as misses so a broken cache never fails a request.
+
+    Misses are single-flight: concurrent callers for a key in one process
+    share one loader call. Shared backends also implement the ``_fill_lock``
+    hooks so that only one process loads a key while the others wait for its
+    result to land in the cache.
+    """
+
+    backend = 'base'
+    FILL_POLL_INTERVAL = 0.05
+
+    def __init__(self, name: str = 'cache', ttl: float = 3600, stale_ttl: float = 0,
+                 fill_timeout: float = 30):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fill_timeout = fill_timeout
+        self._stats_lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight = {}  # key -> _Flight
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale_hits': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'coalesced': 0,
+            'remote_waits': 0,
+            'errors': 0
+        }
+        _caches.add(self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a fresh value, or ``default`` if missing or expired"""
+        value, _ = self._safe_lookup(key, allow_stale=False)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value for ``ttl`` seconds (the cache default if None)"""
+        try:
+            self._store(key, value, self.ttl if ttl is None else ttl)
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Failed to write {self.name} cache entry: {str(e)}")
+
+    def delete(self, key: str):
+        try:
+            self._delete(key)
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Failed to delete {self.name} cache entry: {str(e)}")
+
+    def clear(self):
+        self._clear()
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value for ``key``, calling ``loader`` on a miss
+
+        An entry that expired less than ``stale_ttl`` seconds ago is returned
+        as-is while it is reloaded in the background. Loader exceptions on a
+        miss propagate to the caller and nothing is cached.
+
+        Concurrent misses for the same key wait for a single loader call and
+        share its result or exception.
+        """
+        value, stale = self._safe_lookup(key, allow_stale=self.stale_ttl > 0)
+        if value is not _MISSING:
+            if stale:
+                self._refresh_async(key, loader, ttl)
+            return value
+
+        with self._stats_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            return flight.wait()
+
+        try:
+            flight.value = self._load_once(key, loader, ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._stats_lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _load_once(self, key, loader, ttl):
+        """Run the loader, unless another process is already loading this key"""
+        token = self._try_fill_lock(key)
+        if token is None:
+            self._count('remote_waits')
+            value = self._wait_for_fill(key)
+            if value is not _MISSING:
+                return value
+            # The other loader failed or timed out; load it ourselves
+        try:
+            value = loader()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            if token is not None:
+                self._safe_release_fill_lock(key, token)
+
+    def _wait_for_fill(self, key):
+        """Poll until another process stores ``key`` or gives up its fill lock"""
+        deadline = time.monotonic() + self.fill_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.FILL_POLL_INTERVAL)
+            try:
+                value = self._peek(key)
+                if value is not _MISSING:
+                    return value
+                if not self._fill_locked(key):
+                    return self._peek(key)
+            except Exception as e:
+                logger.warning(f"Failed to poll {self.name} cache fill: {str(e)}")
+                break
+        return _MISSING
+
+    def _try_fill_lock(self, key) -> Optional[str]:
+        """Take the cross-process fill lock; returns a token, or None if held elsewhere"""
+        try:
+            return self._acquire_fill_lock(key, uuid.uuid4().hex)
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Failed to lock {self.name} cache fill: {str(e)}")
+            return ''
+
+    def _safe_release_fill_lock(self, key, token):
+        try:
+            if token:
+                self._release_fill_lock(key, token)
+        except Exception as e:
+            logger.warning(f"Failed to unlock {self.name} cache fill: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current size, for health checks and metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['backend'] = self.backend
+        try:
+            stats.update(self._size_stats())
+        except Exception as e:
+            logger.warning(f"Failed to read {self.name} cache size: {str(e)}")
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    def _classify(self, expires_at: float, now: float, allow_stale: bool) -> Optional[bool]:
+        """Count a lookup of an existing entry; returns is_stale, or None if unusable"""
+        if now < expires_at:
+            self._count('hits')
+            return False
+        if allow_stale and now < expires_at + self.stale_ttl:
+            self._count('stale_hits')
+            return True
+        self._count('expirations')
+        self._count('misses')
+        return None
+
+    def _safe_lookup(self, key, allow_stale):
+        try:
+            return self._lookup(key, allow_stale)
+        except Exception as e:
+            self._count('errors')
+            self._count('misses')
+            logger.warning(f"Failed to read {self.name} cache entry: {str(e)}")
+            return _MISSING, False
+
+    def _refresh_async(self, key, loader, ttl):
+        """Reload a stale entry in the background, at most once per key at a time"""
+        with self._stats_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            token = self._try_fill_lock(key)
+            try:
+                if token is not None:  # Otherwise another process is refreshing it
+                    self.set(key, loader(), ttl)
+                    self._count('refreshes')
+            except Exception as e:
+                self._count('refresh_errors')
+                logger.warning(f"Background refresh failed for {self.name} cache: {str(e)}")
+            finally:
+                self._safe_release_fill_lock(key, token)
+                with self._stats_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"{self.name}-refresh", daemon=True).start()
+
+    def _lookup(self, key, allow_stale) -> Tuple[Any, bool]:
+        """Return (value, is_stale), or (_MISSING, False) on a miss"""
+        raise NotImplementedError
+
+    def _store(self, key, value, ttl):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _size_stats(self) -> Dict[str, Any]:
+        return {}
+
+    # Cross-process fill locks; in-process caches need none
+    def _acquire_fill_lock(self, key, token) -> Optional[str]:
+        return token
+
+    def _release_fill_lock(self, key, token):
+        pass
+
+    def _fill_locked(self, key) -> bool:
+        return False
+
+    def _peek(self, key):
+        """Fresh value without touching counters or recency, or _MISSING"""
+        return _MISSING
+
+class TTLCache(CacheBackend):
+    """
+    Bounded in-process LRU cache with per-entry TTL
+
+    The cache is capped both by entry count and by the approximate size of the
+    stored values; the least recently used entries are evicted first. Expired
+    entries are dropped on access and whenever room is needed.
+    """
+
+    backend = 'memory'
+
+    def __init__(self, name: str = 'cache', max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttl: float = 3600, stale_ttl: float = 0):
+        super().__init__(name, ttl, stale_ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key, allow_stale):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count('misses')
+                return _MISSING, False
+
+            value, expires_at, _ = entry
+            stale = self._classify(expires_at, time.monotonic(), allow_stale)
+            if stale is None:
+                self._remove(key)
+                return _MISSING, False
+            self._entries.move_to_end(key)
+            return value, stale
+
+    def _store(self, key, value, ttl):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+
+    def _delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _size_stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _evict(self):
+        """Drop expired entries, then LRU entries, until within both caps"""
+        if len(self._entries) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        horizon = time.monotonic() - self.stale_ttl
+        for key in [k for k, (_, expires_at, _) in self._entries.items() if expires_at < horizon]:
+            self._remove(key)
+            self._count('expirations')
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self._count('evictions')
+
+class SQLiteCache(CacheBackend):
+    """
+    On-disk LRU cache shared by every worker process on the host
+
+    Entries are JSON in a WAL-mode SQLite file that readers access through
+    mmap, so a lookup costs a page-cache read rather than an upstream call.
+    Each thread keeps its own connection. Hit counters are per process;
+    entry and byte counts reflect the shared file.
+    """
+
+    backend = 'sqlite'
+    MMAP_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, name: str = 'cache', path: str = None, max_entries: int = 1024,
+                 max_bytes: int = 16 * 1024 * 1024, ttl: float = 3600, stale_ttl: float = 0):
+        super().__init__(name, ttl, stale_ttl)
+        self.path = path or os.path.join(default_cache_dir(), f"{name}.sqlite3")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS fill_locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not be shared across fork, so key them by pid too
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _lookup(self, key, allow_stale):
+        conn = self._connection()
+        row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return _MISSING, False
+
+        now = time.time()
+        stale = self._classify(row[1], now, allow_stale)
+        if stale is None:
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires_at = ?", (key, row[1]))
+            return _MISSING, False
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), stale
+
+    def _store(self, key, value, ttl):
+        data = json.dumps(value, default=str)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, data, now + ttl, len(data), now)
+        )
+        self._evict(conn, now)
+
+    def _delete(self, key):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _clear(self):
+        self._connection().execute("DELETE FROM entries")
+
+    def _size_stats(self):
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {'entries': entries, 'bytes': size}
+
+    def _acquire_fill_lock(self, key, token):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("DELETE FROM fill_locks WHERE key = ? AND expires_at < ?", (key, now))
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO fill_locks (key, token, expires_at) VALUES (?, ?, ?)",
+            (key, token, now + self.fill_timeout)
+        ).rowcount
+        return token if inserted else None
+
+    def _release_fill_lock(self, key, token):
+        self._connection().execute("DELETE FROM fill_locks WHERE key = ? AND token = ?", (key, token))
+
+    def _fill_locked(self, key):
+        row = self._connection().execute(
+            "SELECT 1 FROM fill_locks WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def _peek(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return _MISSING if row is None else json.loads(row[0])
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then LRU entries, until within both caps"""
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        expired = conn.execute("DELETE FROM entries WHERE expires_at < ?", (now - self.stale_ttl,)).rowcount
+        if expired > 0:
+            self._count('expirations', expired)
+        while True:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            excess = max(entries - self.max_entries, 1 if size > self.max_bytes else 0)
+            if not entries or excess <= 0:
+                return
+            evicted = conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            ).rowcount
+            self._count('evictions', evicted)
+
+class RedisCache(CacheBackend):
+    """
+    Cache stored in Redis, shared by every worker that uses the same server
+
+    Keys expire in Redis after ``ttl + stale_ttl``; eviction beyond that is
+    left to the server's ``maxmemory-policy``.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, name: str = 'cache', url: str = None, client=None,
+                 ttl: float = 3600, stale_ttl: float = 0):
+        super().__init__(name, ttl, stale_ttl)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or os.environ['REDIS_URL'], socket_timeout=2)
+        self.client = client
+        self.prefix = f"smartdispute:cache:{name}:"
+        self.lock_prefix = f"smartdispute:fill:{name}:"
+
+    def _lookup(self, key, allow_stale):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self._count('misses')
+            return _MISSING, False
+
+        record = json.loads(raw)
+        stale = self._classify(record['expires_at'], time.time(), allow_stale)
+        if stale is None:
+            return _MISSING, False
+        return record['value'], stale
+
+    def _store(self, key, value, ttl):
+        record = json.dumps({'value': value, 'expires_at': time.time() + ttl}, default=str)
+        self.client.set(self.prefix + key, record, ex=max(1, math.ceil(ttl + self.stale_ttl)))
+
+    def _delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def _clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def _acquire_fill_lock(self, key, token):
+        acquired = self.client.set(self.lock_prefix + key, token, nx=True,
+                                   px=int(self.fill_timeout * 1000))
+        return token if acquired else None
+
+    def _release_fill_lock(self, key, token):
+        # Not atomic; at worst a lock that already expired and was re-taken is
+        # dropped early, which costs one duplicate upstream call
+        current = self.client.get(self.lock_prefix + key)
+        if current is not None and current.decode() == token:
+            self.client.delete(self.lock_prefix + key)
+
+    def _fill_locked(self, key):
+        return self.client.get(self.lock_prefix + key) is not None
+
+    def _peek(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return _MISSING
+        record = json.loads(raw)
+        return record['value'] if time.time() < record['expires_at'] else _MISSING
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the redis client used here
+
+    Lets ``RedisCache`` run in tests and local development without a server
+    (``CACHE_BACKEND=local``).
+    """
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def ping(self):
+        return True
+
+    def get(self, name):
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[name]
+                return None
+            return entry[0]
+
+    def set(self, name, value, ex=None, px=None, nx=False):
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = None
+        if ex is not None:
+            expires_at = time.monotonic() + ex
+        elif px is not None:
+            expires_at = time.monotonic() + px / 1000.0
+        with self._lock:
+            if nx:
+                entry = self._data.get(name)
+                if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                    return None
+            self._data[name] = (value, expires_at)
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            keys = [key for key in self._data if fnmatch.fnmatchcase(key, match)]
+        return iter(keys)
+
+def configured_backend() -> str:
+    """``CACHE_BACKEND``, else Redis when ``REDIS_URL`` is set, else the shared SQLite file"""
+    return os.environ.get('CACHE_BACKEND') or ('redis' if os.environ.get('REDIS_URL') else 'sqlite')
+
+def create_cache(name: str, backend: str = None, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttl: float = 3600, stale_ttl: float = 0) -> CacheBackend:
+    """
+    Create a cache using the configured backend
+
+    The backend is ``backend`` if given, else ``CACHE_BACKEND``, else Redis
+    when ``REDIS_URL`` is set and the shared SQLite file otherwise. If the
+    backend cannot be set up the cache falls back to in-process memory.
+    """
+    if backend is None:
+        backend = configured_backend()
+
+    try:
+        if backend == 'redis':
+            return RedisCache(name, ttl=ttl, stale_ttl=stale_ttl)
+        if backend == 'local':
+            return RedisCache(name, client=LocalRedis(), ttl=ttl, stale_ttl=stale_ttl)
+        if backend == 'sqlite':
+            return SQLiteCache(name, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl, stale_ttl=stale_ttl)
+        if backend != 'memory':
+            logger.error(f"Unknown cache backend '{backend}', expected one of {', '.join(CACHE_BACKENDS)}; "
+                         f"using per-process memory for {name}")
+    except Exception as e:
+        # Each worker now caches on its own; visible at error level because it defeats sharing
+        logger.error(f"Cache backend '{backend}' unavailable for {name}, using per-process memory: {str(e)}")
+
+    return TTLCache(name, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl, stale_ttl=stale_ttl)
@@ -3,10 +3,14 @@ Canadian Law AI Service
 Provides free-tier AI functionality for Canadian legal analysis
 """
 
-import requests
+import os
 import json
+import requests
 from typing import List, Dict, Optional
 from datetime import datetime
+from utils.cache import create_cache
+from utils.http_client import http_client
+from utils.retry import retry
 
 class CanadianLawAIService:
     """AI service for Canadian law using free resources"""
@@ -16,10 +20,25 @@ class CanadianLawAIService:
         self.canlii_api_base = "https://api.canlii.org/v1"
         self.canlii_api_key = "YOUR_FREE_API_KEY"  # Free tier key
         
-        # Simple in-memory cache for case law results
-        self.case_law_cache = {}
-        self.case_details_cache = {}
+        # Case law caches, shared across workers unless CACHE_BACKEND=memory;
+        # stale entries are served for up to cache_stale_ttl while a background
+        # refresh runs
         self.cache_expiry = 3600  # 1 hour in seconds
+        self.cache_stale_ttl = 600
+        self.case_law_cache = create_cache(
+            'case_law',
+            max_entries=int(os.environ.get('CASE_LAW_CACHE_MAX_ENTRIES', 512)),
+            max_bytes=int(os.environ.get('CASE_LAW_CACHE_MAX_BYTES', 8 * 1024 * 1024)),
+            ttl=self.cache_expiry,
+            stale_ttl=self.cache_stale_ttl
+        )
+        self.case_details_cache = create_cache(
+            'case_details',
+            max_entries=int(os.environ.get('CASE_DETAILS_CACHE_MAX_ENTRIES', 1024)),
+            max_bytes=int(os.environ.get('CASE_DETAILS_CACHE_MAX_BYTES', 8 * 1024 * 1024)),
+            ttl=self.cache_expiry,
+            stale_ttl=self.cache_stale_ttl
+        )
         
         # Canadian law keywords for relevance scoring
         self.canadian_law_keywords = {
@@ -55,94 +74,84 @@ class CanadianLawAIService:
         """
         Get Canadian case law using free CanLII API
         Note: This requires a free API key from CanLII
+        Concurrent misses for the same query share a single upstream call
         """
         try:
             # Create cache key
             cache_key = f"{jurisdiction}:{query}:{limit}"
-            
-            # Check if result is in cache and not expired
-            if cache_key in self.case_law_cache:
-                cached_result, timestamp = self.case_law_cache[cache_key]
-                if (datetime.utcnow() - timestamp).total_seconds() < self.cache_expiry:
-                    print("Returning cached case law results")
-                    return cached_result
-            
-            # Check if API key is configured
-            if not self.canlii_api_key or self.canlii_api_key == "YOUR_FREE_API_KEY":
-                print("CanLII API key not configured, returning mock data")
-                # Return mock data if no API key
-                mock_cases = [
-                    {
-                        "databaseId": "bcca",
-                        "caseId": {"en": "2020bcca123"},
-                        "title": "Sample v. Example",
-                        "citation": "2020 BCCA 123",
-                        "date": "2020-05-15"
-                    },
-                    {
-                        "databaseId": "scc",
-                        "caseId": {"en": "2019scc456"},
-                        "title": "Test v. Demo",
-                        "citation": "2019 SCC 456",
-                        "date": "2019-11-30"
-                    }
-                ]
-                
-                # Cache the result
-                self.case_law_cache[cache_key] = (mock_cases, datetime.utcnow())
-                return mock_cases
-            
-            # Make request to CanLII search API
-            search_url = f"{self.canlii_api_base}/search/{jurisdiction}"
-            params = {
-                "apiKey": self.canlii_api_key,
-                "q": query,
-                "resultCount": limit
-            }
-            
-            response = requests.get(search_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            cases = data.get("results", [])
-            
-            # Format cases for consistent return structure
-            formatted_cases = []
-            for case in cases:
-                formatted_case = {
-                    "databaseId": case.get("databaseId"),
-                    "caseId": case.get("caseId"),
-                    "title": case.get("title", ""),
-                    "citation": case.get("citation", ""),
-                    "date": case.get("decisionDate", "")
-                }
-                formatted_cases.append(formatted_case)
-            
-            # Cache the result
-            self.case_law_cache[cache_key] = (formatted_cases, datetime.utcnow())
-            
-            return formatted_cases
+            return self.case_law_cache.get_or_load(
+                cache_key, lambda: self._fetch_case_law(query, jurisdiction, limit)
+            )
             
         except Exception as e:
             print(f"Error fetching case law from CanLII: {str(e)}")
             # Return mock data as fallback
-            mock_cases = [
-                {
-                    "databaseId": "bcca",
-                    "caseId": {"en": "2020bcca123"},
-                    "title": "Sample v. Example",
-                    "citation": "2020 BCCA 123",
-                    "date": "2020-05-15"
-                },
-                {
-                    "databaseId": "scc",
-                    "caseId": {"en": "2019scc456"},
-                    "title": "Test v. Demo",
-                    "citation": "2019 SCC 456",
-                    "date": "2019-11-30"
-                }
-            ]
-            return mock_cases
+            return self._mock_case_law()
+    
+    def _fetch_case_law(self, query: str, jurisdiction: str, limit: int) -> List[Dict]:
+        """Fetch case law from CanLII, bypassing the cache"""
+        # Check if API key is configured
+        if not self.canlii_api_key or self.canlii_api_key == "YOUR_FREE_API_KEY":
+            print("CanLII API key not configured, returning mock data")
+            # Return mock data if no API key
+            return self._mock_case_law()
+        
+        # Make request to CanLII search API
+        search_url = f"{self.canlii_api_base}/search/{jurisdiction}"
+        params = {
+            "apiKey": self.canlii_api_key,
+            "q": query,
+            "resultCount": limit
+        }
+        
+        response = self._get(search_url, params)
+        response.raise_for_status()
+        
+        data = response.json()
+        cases = data.get("results", [])
+        
+        # Format cases for consistent return structure
+        formatted_cases = []
+        for case in cases:
+            formatted_case = {
+                "databaseId": case.get("databaseId"),
+                "caseId": case.get("caseId"),
+                "title": case.get("title", ""),
+                "citation": case.get("citation", ""),
+                "date": case.get("decisionDate", "")
+            }
+            formatted_cases.append(formatted_case)
+        
+        return formatted_cases
+    
+    @retry(exceptions=(requests.RequestException,), max_retries=2, initial_delay=0.5, max_delay=4.0,
+           breaker='canlii', budget='canlii')
+    def _get(self, url: str, params: Dict):
+        """GET from CanLII; connection errors and 5xx responses are retried and count against the circuit breaker"""
+        # Retried here, within the budget, rather than again by the client
+        response = http_client.get(url, params=params, retries=0)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
+    
+    def _mock_case_law(self) -> List[Dict]:
+        """Sample results used when CanLII is not configured or unavailable"""
+        return [
+            {
+                "databaseId": "bcca",
+                "caseId": {"en": "2020bcca123"},
+                "title": "Sample v. Example",
+                "citation": "2020 BCCA 123",
+                "date": "2020-05-15"
+            },
+            {
+                "databaseId": "scc",
+                "caseId": {"en": "2019scc456"},
+                "title": "Test v. Demo",
+                "citation": "2019 SCC 456",
+                "date": "2019-11-30"
+            }
+        ]
     
     def get_case_details(self, database_id: str, case_id: str) -> Dict:
         """
@@ -151,65 +160,59 @@ class CanadianLawAIService:
         try:
             # Create cache key
             cache_key = f"{database_id}:{case_id}"
-            
-            # Check if result is in cache and not expired
-            if cache_key in self.case_details_cache:
-                cached_result, timestamp = self.case_details_cache[cache_key]
-                if (datetime.utcnow() - timestamp).total_seconds() < self.cache_expiry:
-                    print("Returning cached case details")
-                    return cached_result
-            
-            # Check if API key is configured
-            if not self.canlii_api_key or self.canlii_api_key == "YOUR_FREE_API_KEY":
-                print("CanLII API key not configured, returning mock data")
-                mock_details = {
-                    "title": "Sample Case Title",
-                    "citation": "2020 BCCA 123",
-                    "decisionDate": "2020-05-15",
-                    "jurisdiction": "British Columbia",
-                    "summary": "This is a sample case summary for demonstration purposes."
-                }
-                
-                # Cache the result
-                self.case_details_cache[cache_key] = (mock_details, datetime.utcnow())
-                return mock_details
-            
-            # Make request to CanLII case detail API
-            detail_url = f"{self.canlii_api_base}/caseBrowse/{database_id}/{case_id}"
-            params = {
-                "apiKey": self.canlii_api_key
-            }
-            
-            response = requests.get(detail_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Extract key information
-            case_details = {
-                "title": data.get("title", ""),
-                "citation": data.get("citation", ""),
-                "decisionDate": data.get("decisionDate", ""),
-                "jurisdiction": data.get("jurisdiction", ""),
-                "summary": data.get("summary", ""),
-                "url": data.get("url", "")
-            }
-            
-            # Cache the result
-            self.case_details_cache[cache_key] = (case_details, datetime.utcnow())
-            
-            return case_details
+            return self.case_details_cache.get_or_load(
+                cache_key, lambda: self._fetch_case_details(database_id, case_id)
+            )
             
         except Exception as e:
             print(f"Error fetching case details from CanLII: {str(e)}")
             # Return mock data as fallback
-            return {
-                "title": "Sample Case Title",
-                "citation": "2020 BCCA 123",
-                "decisionDate": "2020-05-15",
-                "jurisdiction": "British Columbia",
-                "summary": "This is a sample case summary for demonstration purposes."
-            }
+            return self._mock_case_details()
+    
+    def _fetch_case_details(self, database_id: str, case_id: str) -> Dict:
+        """Fetch case details from CanLII, bypassing the cache"""
+        # Check if API key is configured
+        if not self.canlii_api_key or self.canlii_api_key == "YOUR_FREE_API_KEY":
+            print("CanLII API key not configured, returning mock data")
+            return self._mock_case_details()
+        
+        # Make request to CanLII case detail API
+        detail_url = f"{self.canlii_api_base}/caseBrowse/{database_id}/{case_id}"
+        params = {
+            "apiKey": self.canlii_api_key
+        }
+        
+        response = self._get(detail_url, params)
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        # Extract key information
+        return {
+            "title": data.get("title", ""),
+            "citation": data.get("citation", ""),
+            "decisionDate": data.get("decisionDate", ""),
+            "jurisdiction": data.get("jurisdiction", ""),
+            "summary": data.get("summary", ""),
+            "url": data.get("url", "")
+        }
+    
+    def _mock_case_details(self) -> Dict:
+        """Sample details used when CanLII is not configured or unavailable"""
+        return {
+            "title": "Sample Case Title",
+            "citation": "2020 BCCA 123",
+            "decisionDate": "2020-05-15",
+            "jurisdiction": "British Columbia",
+            "summary": "This is a sample case summary for demonstration purposes."
+        }
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss/eviction counters for the case law caches"""
+        return {
+            'case_law': self.case_law_cache.stats(),
+            'case_details': self.case_details_cache.stats()
+        }
     
     def analyze_evidence_relevance(self, evidence_text: str, case_type: str) -> Dict:
         """
@@ -1,10 +1,26 @@
-from utils.db import db  # Corrected import
-from models.case import Case
+"""
+Case Tracking
+Case progress, timelines and statistics, loaded in batches across many cases
+"""
+
+import os
+import logging
+from utils.db import db, has_table  # Corrected import
+from models.case import Case, CaseStatus
+from models.case_milestone import CaseMilestone
+from models.case_progress import CaseProgress
 from models.evidence import Evidence
-from models.court_form import FormSubmission
-from models.legal_journey import LegalJourney
+from models.court_form import CourtForm, FormSubmission, FormStatus
+from models.legal_journey import LegalJourney, JourneyStage, JourneyStep
 from datetime import datetime, timedelta
 from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Union
+from sqlalchemy import and_, or_, event, func, insert, inspect, select, case as sql_case
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+# Initialize logger
+logger = logging.getLogger(__name__)
 
 class MilestoneType(Enum):
     """Types of case milestones"""
@@ -13,44 +29,646 @@ class MilestoneType(Enum):
     HEARING_SCHEDULED = "hearing_scheduled"
     DECISION_RENDERED = "decision_rendered"
     PAYMENT_MADE = "payment_made"
+    CUSTOM = "custom"
+
+STAGES = ['preparation', 'evidence_gathering', 'form_completion',
+          'review_submission', 'court_process', 'resolution']
+
+# Evidence items after which evidence gathering counts as complete
+EVIDENCE_TARGET = 3
+RECENT_ACTIVITY_DAYS = 14
+
+FILED_STATUSES = {CaseStatus.FILED, CaseStatus.IN_PROGRESS, CaseStatus.APPEALED,
+                  CaseStatus.CLOSED, CaseStatus.SETTLED}
+RESOLVED_STATUSES = {CaseStatus.CLOSED, CaseStatus.SETTLED}
+SUBMITTED_FORM_STATUSES = {FormStatus.SUBMITTED, FormStatus.PROCESSING, FormStatus.COMPLETED}
+
+# Snapshots older than this are recomputed and stored again on read, since
+# trends and deadline actions depend on the current date
+SNAPSHOT_MAX_AGE = int(os.environ.get('PROGRESS_SNAPSHOT_MAX_AGE', 86400))
+
+# Most recent recorded milestones merged into each case's timeline
+TIMELINE_MILESTONE_LIMIT = int(os.environ.get('TIMELINE_MILESTONE_LIMIT', 50))
 
 class CaseTracker:
-    """Tracks case progress and milestones - simplified without AI"""
-    
-    def record_milestone(self, case_id, milestone_type, description=""):
-        """Record a new milestone for a case"""
-        milestone = {
-            "type": milestone_type.value,
-            "date": datetime.utcnow(),
-            "description": description
-        }
-        
-        case = Case.query.get(case_id)
-        if not case:
+    """
+    Tracks case progress and milestones - simplified without AI
+
+    Everything that covers more than one case is loaded with one query per
+    entity type (evidence, form submissions, legal journeys, milestones) for all of the
+    cases at once and merged per case in Python, so the query count does not
+    grow with the number of cases or items.
+
+    Reads go through ``get_progress_snapshots``, which serves the persisted
+    ``CaseProgress`` rows that the session hooks at the bottom of this
+    module refresh whenever a case's evidence, forms, journey or milestones change.
+    """
+
+    def __init__(self, session=None):
+        self.session = session or db.session
+
+    # Milestones
+
+    def record_milestone(self, case_id, milestone_type, title=None, description="",
+                         occurred_at=None, custom_data=None, user_id=None, commit=True):
+        """Record a new milestone for a case as one appended row"""
+        if self.session.get(Case, case_id) is None:
             return False
-        
-        if not case.milestones:
-            case.milestones = []
-        
-        case.milestones.append(milestone)
-        db.session.commit()
+
+        self.session.add(CaseMilestone(
+            case_id=case_id,
+            milestone_type=milestone_type.value,
+            title=title or milestone_type.value.replace('_', ' ').title(),
+            description=description,
+            data=custom_data or None,
+            created_by=user_id,
+            occurred_at=occurred_at or datetime.utcnow()
+        ))
+        if commit:
+            self.session.commit()
         return True
-    
-    def get_case_progress(self, case_id):
-        """Get progress overview for a case"""
-        case = Case.query.get(case_id)
-        if not case:
+
+    def record_milestones(self, milestones: List[Dict[str, Any]], commit=True) -> int:
+        """
+        Append many milestones with a single executemany INSERT
+
+        Each dict takes ``case_id``, ``milestone_type`` (a MilestoneType),
+        and optionally ``title``, ``description``, ``occurred_at``, ``data``
+        and ``created_by``.
+        """
+        if not milestones:
+            return 0
+        now = datetime.utcnow()
+        rows = []
+        for milestone in milestones:
+            milestone_type = milestone['milestone_type']
+            rows.append({
+                'case_id': milestone['case_id'],
+                'milestone_type': milestone_type.value,
+                'title': milestone.get('title') or milestone_type.value.replace('_', ' ').title(),
+                'description': milestone.get('description', ''),
+                'data': milestone.get('data'),
+                'created_by': milestone.get('created_by'),
+                'occurred_at': milestone.get('occurred_at') or now,
+                'created_at': now
+            })
+        self.session.execute(insert(CaseMilestone), rows)
+        # Bulk inserts bypass the unit of work, so tell the snapshot hooks directly
+        mark_progress_stale(self.session, {row['case_id'] for row in rows})
+        if commit:
+            self.session.commit()
+        return len(rows)
+
+    def iter_milestones(self, case_id, since: Optional[datetime] = None,
+                        batch_size: int = 500) -> Iterator[CaseMilestone]:
+        """
+        Stream a case's milestones oldest first
+
+        Reads in keyset batches on (occurred_at, id), so memory stays at one
+        batch and no cursor is held open between batches however long the
+        history is.
+        """
+        query = self.session.query(CaseMilestone).filter(CaseMilestone.case_id == case_id)
+        if since is not None:
+            query = query.filter(CaseMilestone.occurred_at >= since)
+        query = query.order_by(CaseMilestone.occurred_at, CaseMilestone.id)
+        last = None
+        while True:
+            batch_query = query
+            if last is not None:
+                batch_query = batch_query.filter(or_(
+                    CaseMilestone.occurred_at > last.occurred_at,
+                    and_(CaseMilestone.occurred_at == last.occurred_at, CaseMilestone.id > last.id)
+                ))
+            batch = batch_query.limit(batch_size).all()
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            last = batch[-1]
+
+    def milestones_query(self, case_id):
+        """Milestones of one case for keyset pagination on (occurred_at, id)"""
+        return self.session.query(CaseMilestone).filter(CaseMilestone.case_id == case_id)
+
+    # Progress
+
+    def get_case_progress(self, case: Union[Case, int]):
+        """Get progress overview for a case, including its timeline as milestones"""
+        if not isinstance(case, Case):
+            case = self.session.get(Case, case)
+            if not case:
+                return None
+
+        progress = self.get_progress_snapshots([case])[case.id]
+        progress['milestones'] = [dict(event, completed=True) for event in self.get_case_timeline(case)]
+        return progress
+
+    def get_progress_for_cases(self, cases: Iterable[Case]) -> Dict[int, dict]:
+        """Progress for each of ``cases`` keyed by case id, in four queries"""
+        cases = list(cases)
+        case_ids = [case.id for case in cases]
+        if not case_ids:
+            return {}
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=RECENT_ACTIVITY_DAYS)
+
+        evidence = {row.case_id: row for row in self.session.query(
+            Evidence.case_id,
+            func.count(Evidence.id).label('total'),
+            func.count(Evidence.analyzed_at).label('analyzed'),
+            func.sum(sql_case((Evidence.uploaded_at >= cutoff, 1), else_=0)).label('recent'),
+            func.max(Evidence.uploaded_at).label('latest')
+        ).filter(Evidence.case_id.in_(case_ids)).group_by(Evidence.case_id)}
+
+        forms = {}
+        for row in self.session.query(
+            FormSubmission.case_id,
+            FormSubmission.status,
+            func.count(FormSubmission.id).label('total'),
+            func.count(FormSubmission.processed_at).label('processed'),
+            func.sum(sql_case((FormSubmission.submitted_at >= cutoff, 1), else_=0)).label('recent')
+        ).filter(FormSubmission.case_id.in_(case_ids)).group_by(FormSubmission.case_id, FormSubmission.status):
+            counts = forms.setdefault(row.case_id, {'total': 0, 'processed': 0, 'submitted': 0,
+                                                    'rejected': 0, 'recent': 0})
+            counts['total'] += row.total
+            counts['processed'] += row.processed
+            counts['recent'] += row.recent or 0
+            if row.status in SUBMITTED_FORM_STATUSES:
+                counts['submitted'] += row.total
+            elif row.status == FormStatus.REJECTED:
+                counts['rejected'] += row.total
+
+        journeys = {}
+        for journey in self.session.query(LegalJourney).filter(LegalJourney.case_id.in_(case_ids)).order_by(LegalJourney.id):
+            journeys.setdefault(journey.case_id, journey)
+
+        milestones = {}
+        if has_table(self.session, CaseMilestone.__tablename__):
+            milestones = {row.case_id: row for row in self.session.query(
+                CaseMilestone.case_id,
+                func.count(CaseMilestone.id).label('total'),
+                func.sum(sql_case((CaseMilestone.occurred_at >= cutoff, 1), else_=0)).label('recent'),
+                func.max(CaseMilestone.occurred_at).label('latest')
+            ).filter(CaseMilestone.case_id.in_(case_ids)).group_by(CaseMilestone.case_id)}
+
+        return {
+            case.id: self._merge_progress(case, evidence.get(case.id), forms.get(case.id), journeys.get(case.id),
+                                          milestones.get(case.id), now)
+            for case in cases
+        }
+
+    def _merge_progress(self, case, evidence, forms, journey, milestones, now):
+        """Combine the per-entity aggregates for one case into its progress dict"""
+        evidence_count = evidence.total if evidence else 0
+        forms = forms or {'total': 0, 'processed': 0, 'submitted': 0, 'rejected': 0, 'recent': 0}
+        filed = case.status in FILED_STATUSES
+        resolved = case.status in RESOLVED_STATUSES
+
+        stage_progress = {
+            'preparation': 100 if (journey or evidence_count or forms['total'] or filed) else 50,
+            'evidence_gathering': min(100, evidence_count * 100 // EVIDENCE_TARGET),
+            'form_completion': 100 if forms['submitted'] else (50 if forms['total'] else 0),
+            'review_submission': 100 if filed else 0,
+            'court_process': 100 if resolved else (50 if case.hearing_date or case.status == CaseStatus.IN_PROGRESS else 0),
+            'resolution': 100 if resolved else 0
+        }
+        overall_progress = sum(stage_progress.values()) // len(STAGES)
+        if journey and journey.overall_progress:
+            overall_progress = max(overall_progress, journey.overall_progress)
+        current_stage = next((stage for stage in STAGES if stage_progress[stage] < 100), 'resolution')
+
+        next_actions = []
+        blocking_issues = []
+        deadline = case.filing_deadline
+        if deadline and not filed:
+            days_left = (deadline - now.date()).days
+            if days_left < 0:
+                blocking_issues.append({
+                    'title': 'Filing deadline passed',
+                    'description': f'The filing deadline of {deadline.isoformat()} has passed',
+                    'action_url': None
+                })
+            elif days_left <= 7:
+                next_actions.append({'title': 'File your case', 'priority': 'urgent',
+                                     'description': f'Filing deadline in {days_left} day(s)', 'url': None})
+        if evidence_count < EVIDENCE_TARGET and not resolved:
+            next_actions.append({'title': 'Upload evidence', 'priority': 'high' if not evidence_count else 'medium',
+                                 'description': f'{evidence_count} of {EVIDENCE_TARGET} recommended items uploaded',
+                                 'url': None})
+        if not forms['submitted'] and not filed:
+            next_actions.append({'title': 'Complete court forms', 'priority': 'high' if evidence_count else 'medium',
+                                 'description': 'No court forms have been submitted yet', 'url': None})
+        if forms['rejected']:
+            blocking_issues.append({'title': 'Rejected forms',
+                                    'description': f"{forms['rejected']} form(s) need to be corrected",
+                                    'action_url': None})
+        if journey and journey.next_actions:
+            next_actions.extend(action for action in journey.next_actions if isinstance(action, dict))
+
+        recent_activity = (((evidence.recent or 0) if evidence else 0) + forms['recent'] +
+                           ((milestones.recent or 0) if milestones else 0))
+        if resolved or recent_activity >= 3:
+            trend = 'increasing'
+        elif recent_activity:
+            trend = 'steady'
+        else:
+            trend = 'stalled'
+
+        # Same events the full timeline shows, counted from the aggregates
+        milestone_count = (1 + evidence_count + (evidence.analyzed if evidence else 0) +
+                           forms['total'] + forms['processed'] +
+                           ((2 if journey.completed_stages else 1) if journey else 0) +
+                           (milestones.total if milestones else 0))
+
+        latest = max([stamp for stamp in (case.updated_at, evidence.latest if evidence else None,
+                                           milestones.latest if milestones else None) if stamp],
+                     default=None)
+        estimated = journey.estimated_completion_date if journey else None
+        return {
+            'case_id': case.id,
+            'overall_progress': overall_progress,
+            'current_stage': current_stage,
+            'stage_progress': stage_progress,
+            'next_actions': next_actions,
+            'blocking_issues': blocking_issues,
+            'progress_trend': {
+                'trend': trend,
+                'recent_activity': recent_activity,
+                'description': f'{recent_activity} update(s) in the last {RECENT_ACTIVITY_DAYS} days'
+            },
+            'milestone_count': milestone_count,
+            'evidence_count': evidence_count,
+            'form_count': forms['total'],
+            'last_activity': latest.isoformat() if latest else None,
+            'estimated_completion': estimated.isoformat() if estimated else None,
+            'milestones': []
+        }
+
+    def get_case_statistics(self, user_id, cases: List[Case] = None, progress: Dict[int, dict] = None):
+        """Overall statistics for a user's cases; pass already loaded cases/progress to skip the queries"""
+        if cases is None:
+            cases = self.session.query(Case).filter_by(user_id=user_id).all()
+        if progress is None:
+            progress = self.get_progress_snapshots(cases)
+
+        total = len(cases)
+        completed = sum(1 for case in cases if case.status in RESOLVED_STATUSES)
+        values = [progress[case.id]['overall_progress'] for case in cases if case.id in progress]
+        return {
+            'total_cases': total,
+            'active_cases': total - completed,
+            'completed_cases': completed,
+            'average_progress': sum(values) // len(values) if values else 0,
+            'recent_activity': sum(progress[case.id]['progress_trend']['recent_activity']
+                                   for case in cases if case.id in progress),
+            'completion_rate': completed * 100 // total if total else 0
+        }
+
+    # Snapshots
+
+    def get_progress_snapshots(self, cases: Iterable[Case]) -> Dict[int, dict]:
+        """
+        Progress for each of ``cases`` from the persisted snapshots
+
+        One primary-key lookup for all of the cases; cases without a
+        snapshot, or with one older than SNAPSHOT_MAX_AGE, are computed with
+        ``get_progress_for_cases`` and written back, so the next read is
+        served from the snapshot again.
+        """
+        cases = list(cases)
+        case_ids = [case.id for case in cases]
+        if not case_ids:
+            return {}
+        if not has_table(self.session, CaseProgress.__tablename__):
+            return self.get_progress_for_cases(cases)
+        cutoff = datetime.utcnow() - timedelta(seconds=SNAPSHOT_MAX_AGE)
+        progress = {
+            snapshot.case_id: snapshot.to_dict()
+            for snapshot in self.session.query(CaseProgress).filter(CaseProgress.case_id.in_(case_ids))
+            if snapshot.computed_at and snapshot.computed_at >= cutoff
+        }
+        missing = [case for case in cases if case.id not in progress]
+        if missing:
+            progress.update(self._store_on_read(missing))
+        return progress
+
+    def _store_on_read(self, cases: List[Case]) -> Dict[int, dict]:
+        """
+        Compute and persist snapshots for ``cases`` from a read path
+
+        The write goes through ``_refresh_committed``, so a read never commits
+        whatever else the caller's session has pending; if it fails the
+        values are computed without being stored.
+        """
+        progress = self._refresh_committed(case.id for case in cases)
+        if progress is None:
+            return self.get_progress_for_cases(cases)
+        return progress
+
+    def _refresh_committed(self, case_ids: Iterable[int]) -> Optional[Dict[int, dict]]:
+        """
+        Refresh the snapshots for ``case_ids`` from committed data, in a session of its own
+
+        Returns the stored snapshots, or None if the refresh failed; a
+        failure is logged and never raised, so snapshot upkeep cannot break
+        the caller.
+        """
+        case_ids = set(case_ids)
+        writer = Session(bind=self.session.get_bind())
+        try:
+            snapshots = CaseTracker(writer).refresh_snapshots(case_ids)
+            progress = {case_id: snapshot.to_dict() for case_id, snapshot in snapshots.items()}
+            writer.commit()
+            return progress
+        except SQLAlchemyError as e:
+            writer.rollback()
+            logger.warning(f"Could not store progress snapshots for {len(case_ids)} case(s): {str(e)}")
             return None
-        
-        # Simplified progress calculation
-        total_milestones = 5  # Predefined milestones
-        completed = len(case.milestones) if case.milestones else 0
-        progress = min(100, int((completed / total_milestones) * 100))
-        
+        finally:
+            writer.close()
+
+    def refresh_snapshots(self, case_ids: Iterable[int]) -> Dict[int, CaseProgress]:
+        """
+        Recompute and store the snapshots for ``case_ids``; the caller commits
+
+        The cases' rows are locked first (``FOR UPDATE``), so concurrent
+        refreshes of a case run one after the other and the later one
+        aggregates everything the earlier one saw: an older count never
+        overwrites a newer one, and two refreshes never insert the same
+        snapshot row.
+        """
+        case_ids = set(case_ids)
+        if not case_ids:
+            return {}
+        cases = self.session.query(Case).filter(Case.id.in_(case_ids)).order_by(Case.id).with_for_update().all()
+        progress = self.get_progress_for_cases(cases)
+        snapshots = self._store_snapshots(cases, progress)
+
+        # Cases deleted since the snapshot was taken
+        gone = case_ids - set(progress)
+        if gone:
+            for snapshot in self.session.query(CaseProgress).filter(CaseProgress.case_id.in_(gone)):
+                self.session.delete(snapshot)
+        return snapshots
+
+    def _store_snapshots(self, cases: List[Case], progress: Dict[int, dict]) -> Dict[int, CaseProgress]:
+        """Create or update the snapshot rows for ``cases`` from computed ``progress``"""
+        snapshots = {snapshot.case_id: snapshot for snapshot in
+                     self.session.query(CaseProgress).filter(CaseProgress.case_id.in_([case.id for case in cases]))}
+        for case in cases:
+            snapshot = snapshots.get(case.id)
+            if snapshot is None:
+                snapshot = snapshots[case.id] = CaseProgress(case_id=case.id)
+                self.session.add(snapshot)
+            snapshot.user_id = case.user_id
+            snapshot.update_from(progress[case.id])
+        return snapshots
+
+    def rebuild_snapshots(self, user_id=None, batch_size: int = 500) -> int:
+        """Recompute every snapshot (or one user's), committing per batch of cases"""
+        query = self.session.query(Case.id).order_by(Case.id)
+        if user_id is not None:
+            query = query.filter(Case.user_id == user_id)
+        rebuilt = 0
+        last_id = 0
+        while True:
+            batch = [row.id for row in query.filter(Case.id > last_id).limit(batch_size)]
+            if not batch:
+                break
+            rebuilt += len(self.refresh_snapshots(batch))
+            self.session.commit()
+            last_id = batch[-1]
+        return rebuilt
+
+    # Timeline
+
+    def get_case_timeline(self, case: Case) -> List[dict]:
+        return self.get_timelines([case])[case.id]
+
+    def get_timelines(self, cases: Iterable[Case],
+                      milestone_limit: int = TIMELINE_MILESTONE_LIMIT) -> Dict[int, List[dict]]:
+        """
+        Timeline events for each of ``cases``, newest first, in four queries
+
+        Recorded milestones are capped at the ``milestone_limit`` most recent
+        per case; older ones are paged through ``milestones_query``.
+        """
+        cases = list(cases)
+        case_ids = [case.id for case in cases]
+        timelines = {case.id: [self._case_created_event(case)] for case in cases}
+        if not case_ids:
+            return timelines
+
+        for evidence in self.session.query(Evidence).filter(Evidence.case_id.in_(case_ids)).order_by(Evidence.uploaded_at):
+            timelines[evidence.case_id].extend(self._evidence_events(evidence))
+
+        submissions = self.session.query(FormSubmission, CourtForm.name).outerjoin(
+            CourtForm, FormSubmission.template_id == CourtForm.id
+        ).filter(FormSubmission.case_id.in_(case_ids)).order_by(FormSubmission.submitted_at)
+        for submission, form_name in submissions:
+            timelines[submission.case_id].extend(self._form_events(submission, form_name or 'form'))
+
+        for journey in self.session.query(LegalJourney).filter(LegalJourney.case_id.in_(case_ids)):
+            timelines[journey.case_id].extend(self._journey_events(journey))
+
+        for milestone in self._recent_milestones(case_ids, milestone_limit):
+            timelines[milestone.case_id].append(self._milestone_event(milestone))
+
+        for events in timelines.values():
+            events.sort(key=lambda x: x['date'] or '9999-12-31', reverse=True)
+        return timelines
+
+    def _recent_milestones(self, case_ids, limit) -> List[CaseMilestone]:
+        """Up to ``limit`` newest milestones per case, in one windowed index scan"""
+        if limit <= 0 or not has_table(self.session, CaseMilestone.__tablename__):
+            return []
+        ranked = select(
+            CaseMilestone.id,
+            func.row_number().over(
+                partition_by=CaseMilestone.case_id,
+                order_by=(CaseMilestone.occurred_at.desc(), CaseMilestone.id.desc())
+            ).label('position')
+        ).where(CaseMilestone.case_id.in_(case_ids)).subquery()
+        return self.session.query(CaseMilestone).join(ranked, CaseMilestone.id == ranked.c.id).filter(
+            ranked.c.position <= limit
+        ).all()
+
+    @staticmethod
+    def _milestone_event(milestone):
+        event = milestone.to_dict()
+        event.update({
+            'icon': 'fas fa-flag' if milestone.milestone_type == MilestoneType.CUSTOM.value else 'fas fa-check-circle',
+            'color': 'dark',
+            'details': {'milestone_id': milestone.id, **(milestone.data or {})}
+        })
+        return event
+
+    @staticmethod
+    def _case_created_event(case):
         return {
-            "case_id": case_id,
-            "progress": progress,
-            "completed_milestones": completed,
-            "total_milestones": total_milestones,
-            "last_milestone": case.milestones[-1] if case.milestones else None
-        }
\ No newline at end of file
+            'type': 'case_created',
+            'title': 'Case Created',
+            'description': f'Case "{case.title}" was created',
+            'date': case.created_at.isoformat() if case.created_at else None,
+            'icon': 'fas fa-plus-circle',
+            'color': 'success'
+        }
+
+    @staticmethod
+    def _evidence_events(evidence):
+        name = evidence.title or evidence.original_filename
+        events = [{
+            'type': 'evidence_uploaded',
+            'title': 'Evidence Uploaded',
+            'description': f'Uploaded "{name}"',
+            'date': evidence.uploaded_at.isoformat() if evidence.uploaded_at else None,
+            'icon': 'fas fa-file-upload',
+            'color': 'info',
+            'details': {
+                'evidence_id': evidence.id,
+                'filename': evidence.original_filename,
+                'relevance_score': evidence.ai_relevance_score
+            }
+        }]
+        if evidence.analyzed_at:
+            events.append({
+                'type': 'evidence_analyzed',
+                'title': 'Evidence Analyzed',
+                'description': f'AI analysis completed for "{name}"',
+                'date': evidence.analyzed_at.isoformat(),
+                'icon': 'fas fa-brain',
+                'color': 'purple',
+                'details': {
+                    'evidence_id': evidence.id,
+                    'relevance_score': evidence.ai_relevance_score
+                }
+            })
+        return events
+
+    @staticmethod
+    def _form_events(submission, form_name):
+        events = [{
+            'type': 'form_submitted',
+            'title': 'Form Submitted',
+            'description': f'Submitted {form_name}',
+            'date': submission.submitted_at.isoformat() if submission.submitted_at else None,
+            'icon': 'fas fa-file-alt',
+            'color': 'primary',
+            'details': {
+                'submission_id': submission.id,
+                'form_name': form_name,
+                'status': submission.status.value if submission.status else 'submitted'
+            }
+        }]
+        if submission.processed_at:
+            events.append({
+                'type': 'form_processed',
+                'title': 'Form Processed',
+                'description': f'{form_name} was processed',
+                'date': submission.processed_at.isoformat(),
+                'icon': 'fas fa-edit',
+                'color': 'warning',
+                'details': {
+                    'submission_id': submission.id,
+                    'form_name': form_name,
+                    'status': submission.status.value if submission.status else 'submitted'
+                }
+            })
+        return events
+
+    @staticmethod
+    def _journey_events(journey):
+        events = [{
+            'type': 'journey_started',
+            'title': 'Legal Journey Started',
+            'description': 'Started guided legal process',
+            'date': journey.created_at.isoformat() if journey.created_at else None,
+            'icon': 'fas fa-route',
+            'color': 'secondary'
+        }]
+        if journey.completed_stages:
+            events.append({
+                'type': 'stage_progress',
+                'title': 'Stage Progress',
+                'description': f'Completed {journey.completed_stages} of {journey.total_stages or "?"} stages',
+                'date': journey.updated_at.isoformat() if journey.updated_at else None,
+                'icon': 'fas fa-step-forward',
+                'color': 'success'
+            })
+        return events
+
+# Incremental snapshot maintenance
+#
+# after_flush records which cases the flushed rows belong to. before_commit
+# deletes those cases' snapshots inside the same transaction, so a snapshot
+# is never committed out of step with the rows it summarizes; after_commit
+# then recomputes them from committed data in a separate session (see
+# CaseTracker.refresh_snapshots), where a failure is logged instead of
+# failing the commit and the next read recomputes the snapshot.
+
+_PENDING_CASES = 'case_progress_pending'
+_PENDING_STAGES = 'case_progress_pending_stages'
+_PENDING_JOURNEYS = 'case_progress_pending_journeys'
+_STALE_CASES = 'case_progress_stale'
+
+def _history_values(obj, attribute) -> Set[int]:
+    """Current and previous values of ``attribute``, so moved rows refresh both owners"""
+    history = inspect(obj).attrs[attribute].history
+    values = set(history.added) | set(history.unchanged) | set(history.deleted)
+    current = getattr(obj, attribute, None)
+    if current is not None:
+        values.add(current)
+    values.discard(None)
+    return values
+
+def mark_progress_stale(session, case_ids: Iterable[int]):
+    """Queue snapshot refreshes for changes made outside the unit of work (bulk INSERT/UPDATE)"""
+    session.info.setdefault(_PENDING_CASES, set()).update(case_ids)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_progress_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CaseProgress):
+            continue
+        if isinstance(obj, Case):
+            if obj.id is not None:
+                session.info.setdefault(_PENDING_CASES, set()).add(obj.id)
+        elif isinstance(obj, (Evidence, FormSubmission, LegalJourney, CaseMilestone)):
+            session.info.setdefault(_PENDING_CASES, set()).update(_history_values(obj, 'case_id'))
+        elif isinstance(obj, JourneyStage):
+            session.info.setdefault(_PENDING_JOURNEYS, set()).update(_history_values(obj, 'journey_id'))
+        elif isinstance(obj, JourneyStep):
+            session.info.setdefault(_PENDING_STAGES, set()).update(_history_values(obj, 'stage_id'))
+
+@event.listens_for(Session, 'before_commit')
+def _mark_progress_stale(session):
+    # Flush now so changes the commit would flush are collected too; a commit
+    # with nothing pending (most read-only requests) skips the flush entirely
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    case_ids = session.info.pop(_PENDING_CASES, set())
+    stage_ids = session.info.pop(_PENDING_STAGES, set())
+    journey_ids = session.info.pop(_PENDING_JOURNEYS, set())
+    if not (case_ids or stage_ids or journey_ids) or not has_table(session, CaseProgress.__tablename__):
+        return
+
+    if stage_ids:
+        journey_ids.update(row.journey_id for row in
+                           session.query(JourneyStage.journey_id).filter(JourneyStage.id.in_(stage_ids)))
+    if journey_ids:
+        case_ids.update(row.case_id for row in
+                        session.query(LegalJourney.case_id).filter(LegalJourney.id.in_(journey_ids)))
+    # A delete by primary key cannot conflict with a concurrent writer's row
+    session.query(CaseProgress).filter(CaseProgress.case_id.in_(case_ids)).delete(synchronize_session='fetch')
+    session.info[_STALE_CASES] = case_ids
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_progress_snapshots(session):
+    case_ids = session.info.pop(_STALE_CASES, None)
+    if case_ids:
+        CaseTracker(session)._refresh_committed(case_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_progress_changes(session):
+    for key in (_PENDING_CASES, _PENDING_STAGES, _PENDING_JOURNEYS, _STALE_CASES):
+        session.info.pop(key, None)
@@ -0,0 +1,264 @@
+"""
+Resumable Chunked Uploads
+Stages numbered chunks of large evidence files so interrupted uploads can resume
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+from typing import Dict, Any, List
+from flask import current_app
+from utils.file_upload import FileUploadHandler, FileUploadError
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class ChunkedUploadError(FileUploadError):
+    """Raised for invalid or unknown chunked upload sessions"""
+    pass
+
+class ChunkReader:
+    """Read-only stream over a session's chunk files in order"""
+
+    def __init__(self, paths: List[str]):
+        self._paths = list(paths)
+        self._current = None
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._current is None:
+                if not self._paths:
+                    return b''
+                self._current = open(self._paths.pop(0), 'rb')
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+class ChunkedUploadManager:
+    """
+    Manages resumable upload sessions staged under ``uploads/temp/chunked``
+
+    Each session is a directory holding a ``manifest.json`` and one file per
+    received chunk. Chunks are written to a temp name and renamed into place,
+    so re-sending a chunk is idempotent and a half-written chunk is never
+    mistaken for a complete one. Sessions live on disk rather than in memory
+    so any worker can serve any request of the same upload.
+    """
+
+    DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB
+    SESSION_TTL = 24 * 60 * 60  # Abandoned sessions are removed after a day
+    COPY_BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, upload_folder: str = None):
+        self.upload_handler = FileUploadHandler(upload_folder)
+        self.root = os.path.join(self.upload_handler.upload_folder, 'temp', 'chunked')
+        os.makedirs(self.root, exist_ok=True)
+        self.chunk_size = current_app.config.get('UPLOAD_CHUNK_SIZE', self.DEFAULT_CHUNK_SIZE)
+        self.session_ttl = current_app.config.get('UPLOAD_SESSION_TTL', self.SESSION_TTL)
+
+    def init_session(self, user_id: int, case_id: int, filename: str, total_size: int,
+                     metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Start a new upload session after validating name and declared size"""
+        if not filename or not self.upload_handler.is_allowed_file(filename):
+            allowed = ', '.join(self.upload_handler.ALLOWED_EXTENSIONS.keys())
+            raise ChunkedUploadError(f"File type not allowed. Allowed types: {allowed}")
+
+        max_size = self.upload_handler.get_max_file_size(filename)
+        if total_size <= 0:
+            raise ChunkedUploadError("File size must be greater than zero")
+        if total_size > max_size:
+            raise ChunkedUploadError(f"File too large. Maximum size: {max_size // (1024 * 1024)}MB")
+
+        upload_id = uuid.uuid4().hex
+        manifest = {
+            'upload_id': upload_id,
+            'user_id': user_id,
+            'case_id': case_id,
+            'filename': filename,
+            'total_size': total_size,
+            'chunk_size': self.chunk_size,
+            'total_chunks': -(-total_size // self.chunk_size),
+            'metadata': metadata or {},
+            'created_at': time.time()
+        }
+        session_dir = self._session_dir(upload_id)
+        os.makedirs(session_dir)
+        self._write_json(os.path.join(session_dir, 'manifest.json'), manifest)
+
+        self.collect_garbage()
+        return self._describe(manifest)
+
+    def load_session(self, upload_id: str, user_id: int) -> Dict[str, Any]:
+        """Load a session manifest, checking that it belongs to the user"""
+        try:
+            with open(os.path.join(self._session_dir(upload_id), 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            raise ChunkedUploadError("Upload session not found or expired")
+        if manifest['user_id'] != user_id:
+            raise ChunkedUploadError("Upload session not found or expired")
+        return manifest
+
+    def put_chunk(self, upload_id: str, user_id: int, index: int, stream,
+                  expected_sha256: str = None) -> Dict[str, Any]:
+        """
+        Store one chunk; re-sending a chunk that is already stored is a no-op
+
+        The chunk must have exactly the size implied by its index, and if the
+        client sends a SHA-256 it must match the received bytes.
+        """
+        manifest = self.load_session(upload_id, user_id)
+        if not 0 <= index < manifest['total_chunks']:
+            raise ChunkedUploadError(f"Chunk index out of range: {index}")
+
+        expected_size = self._chunk_length(manifest, index)
+        chunk_path = self._chunk_path(upload_id, index)
+        if os.path.exists(chunk_path) and os.path.getsize(chunk_path) == expected_size:
+            # Drain the body so the connection can be reused
+            for _ in iter(lambda: stream.read(self.COPY_BLOCK_SIZE), b''):
+                pass
+            self._touch(upload_id)
+            return self.status(upload_id, user_id)
+
+        temp_path = f"{chunk_path}.{uuid.uuid4().hex}.part"
+        received = 0
+        digest = hashlib.sha256()
+        try:
+            with open(temp_path, 'wb') as out:
+                for block in iter(lambda: stream.read(self.COPY_BLOCK_SIZE), b''):
+                    received += len(block)
+                    if received > expected_size:
+                        raise ChunkedUploadError(f"Chunk {index} is larger than {expected_size} bytes")
+                    digest.update(block)
+                    out.write(block)
+            if received != expected_size:
+                raise ChunkedUploadError(f"Chunk {index} has {received} bytes, expected {expected_size}")
+            if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+                raise ChunkedUploadError(f"Chunk {index} checksum mismatch")
+            os.replace(temp_path, chunk_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self._touch(upload_id)
+        return self.status(upload_id, user_id)
+
+    def status(self, upload_id: str, user_id: int) -> Dict[str, Any]:
+        """Describe a session, including which chunks are still missing"""
+        return self._describe(self.load_session(upload_id, user_id))
+
+    def open_assembled(self, upload_id: str, user_id: int):
+        """
+        Open the complete upload as a single stream, for server-side assembly
+
+        Returns ``(reader, manifest)``. Raises if any chunk is missing or if the
+        session is already being finalized by another request. A chunk whose
+        size on disk no longer matches the manifest is removed, so the client
+        sees it as missing and re-sends it.
+        """
+        manifest = self.load_session(upload_id, user_id)
+        missing = self._missing_chunks(manifest)
+        if missing:
+            raise ChunkedUploadError(f"Upload incomplete: {len(missing)} chunk(s) missing")
+
+        mismatched = [i for i in range(manifest['total_chunks'])
+                      if os.path.getsize(self._chunk_path(upload_id, i)) != self._chunk_length(manifest, i)]
+        if mismatched:
+            for i in mismatched:
+                os.remove(self._chunk_path(upload_id, i))
+            raise ChunkedUploadError(f"Upload size mismatch: {len(mismatched)} chunk(s) must be sent again")
+
+        try:
+            fd = os.open(os.path.join(self._session_dir(upload_id), 'finalizing'),
+                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+        except FileExistsError:
+            raise ChunkedUploadError("Upload is already being finalized")
+
+        paths = [self._chunk_path(upload_id, i) for i in range(manifest['total_chunks'])]
+        return ChunkReader(paths), manifest
+
+    def release(self, upload_id: str):
+        """Allow another finalize attempt after a failed one"""
+        try:
+            os.remove(os.path.join(self._session_dir(upload_id), 'finalizing'))
+        except FileNotFoundError:
+            pass
+
+    def discard(self, upload_id: str):
+        """Remove a session and all of its chunks"""
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+
+    def collect_garbage(self, max_age: float = None) -> int:
+        """Remove sessions that have not received a chunk within the TTL"""
+        max_age = self.session_ttl if max_age is None else max_age
+        cutoff = time.time() - max_age
+        removed = 0
+        for name in os.listdir(self.root):
+            session_dir = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(session_dir) < cutoff:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Removed {removed} abandoned upload session(s)")
+        return removed
+
+    def _describe(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        missing = self._missing_chunks(manifest)
+        return {
+            'upload_id': manifest['upload_id'],
+            'filename': manifest['filename'],
+            'total_size': manifest['total_size'],
+            'chunk_size': manifest['chunk_size'],
+            'total_chunks': manifest['total_chunks'],
+            'received_chunks': manifest['total_chunks'] - len(missing),
+            'missing_chunks': missing,
+            'complete': not missing,
+            'expires_at': os.path.getmtime(self._session_dir(manifest['upload_id'])) + self.session_ttl
+        }
+
+    def _missing_chunks(self, manifest: Dict[str, Any]) -> List[int]:
+        upload_id = manifest['upload_id']
+        return [
+            i for i in range(manifest['total_chunks'])
+            if not os.path.exists(self._chunk_path(upload_id, i))
+        ]
+
+    @staticmethod
+    def _chunk_length(manifest: Dict[str, Any], index: int) -> int:
+        if index == manifest['total_chunks'] - 1:
+            return manifest['total_size'] - index * manifest['chunk_size']
+        return manifest['chunk_size']
+
+    def _session_dir(self, upload_id: str) -> str:
+        # Upload ids are server-generated hex; reject anything else outright
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise ChunkedUploadError("Upload session not found or expired")
+        return os.path.join(self.root, upload_id)
+
+    def _chunk_path(self, upload_id: str, index: int) -> str:
+        return os.path.join(self._session_dir(upload_id), f"chunk_{index:06d}")
+
+    def _touch(self, upload_id: str):
+        os.utime(self._session_dir(upload_id))
+
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
@@ -1,5 +1,7 @@
 import os
 import requests
+from utils.http_client import http_client
+from utils.retry import retry
 import logging
 
 def get_ssl_certificate_packs():
@@ -17,10 +19,20 @@ def get_ssl_certificate_packs():
             "Content-Type": "application/json"
         }
         
-        response = requests.get(url, headers=headers)
+        response = _get(url, headers)
         response.raise_for_status()
         return response.json()
         
     except Exception as e:
         logging.error(f"Cloudflare API Error: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+@retry(exceptions=(requests.RequestException,), max_retries=2, initial_delay=1.0, max_delay=8.0,
+       breaker='cloudflare', budget='cloudflare')
+def _get(url, headers):
+    """GET from the Cloudflare API; connection errors and 5xx responses are retried and count against the circuit breaker"""
+    # Retried here, within the budget, rather than again by the client
+    response = http_client.get(url, headers=headers, retries=0)
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return response
@@ -1,16 +1,34 @@
+"""
+Dashboard Data
+Per-user dashboard aggregate, loaded in one round trip and cached until the user's data changes
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Set
 from flask import current_app
-from models.case import Case
-from models.evidence import Evidence
-from models.court_form import FormSubmission
-from models.notification import Notification
+from sqlalchemy import String, cast, event, false, func, inspect, literal, null, select, union_all
+from sqlalchemy.orm import Session
+from models.case import Case, CaseStatus, CaseType
+from models.evidence import Evidence, EvidenceStatus
+from models.court_form import CourtForm, FormSubmission, FormStatus
+from models.notification import Notification, NotificationPriority, NotificationType
+from utils.cache import create_cache
 from utils.db import db
 from datetime import datetime, timedelta
 
+# Initialize logger
+logger = logging.getLogger(__name__)
+
 def format_time_ago(dt):
     """Format datetime as time ago string"""
     now = datetime.utcnow()
     diff = now - dt
-    
+
     if diff < timedelta(minutes=1):
         return "just now"
     elif diff < timedelta(hours=1):
@@ -27,7 +45,7 @@ def get_urgency_class(dt):
     """Get urgency class based on datetime"""
     now = datetime.utcnow()
     diff = now - dt
-    
+
     if diff < timedelta(hours=24):
         return "urgent"
     elif diff < timedelta(days=3):
@@ -35,19 +53,196 @@ def get_urgency_class(dt):
     else:
         return "normal"
 
+# Rows per dashboard section
+SECTION_LIMITS = {'cases': 5, 'recent_evidence': 5, 'recent_forms': 5, 'notifications': 10}
+
+# Enums are stored by name; map them back to their values for the cached rows
+_ENUMS = {
+    'cases': (CaseStatus, CaseType),
+    'recent_evidence': (EvidenceStatus, None),
+    'recent_forms': (FormStatus, None),
+    'notifications': (NotificationPriority, NotificationType)
+}
+
 class DashboardManager:
-    """Manages dashboard data - simplified without journey management"""
-    
+    """
+    Manages dashboard data - simplified without journey management
+
+    The four dashboard sections are fetched with a single UNION ALL query
+    and cached per user as plain dicts (so any cache backend can share them
+    across workers). Commits that touch a user's cases, evidence, form
+    submissions or notifications invalidate that user's entry through the
+    session hooks below. Invalidation swaps the user's generation token
+    rather than deleting the entry, so a rebuild that raced the commit
+    writes under the old generation and is never served.
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl or float(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+        self.cache = create_cache(
+            'dashboard',
+            max_entries=int(os.environ.get('DASHBOARD_CACHE_MAX_ENTRIES', 4096)),
+            max_bytes=int(os.environ.get('DASHBOARD_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+            ttl=self.ttl
+        )
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._rebuilds = 0
+        self._invalidations = 0
+        self._rebuild_seconds = deque(maxlen=512)
+
     def get_user_dashboard(self, user_id):
         """Get dashboard data for user"""
-        cases = Case.query.filter_by(user_id=user_id).order_by(Case.created_at.desc()).limit(5).all()
-        recent_evidence = Evidence.query.filter_by(uploaded_by=user_id).order_by(Evidence.uploaded_at.desc()).limit(5).all()
-        recent_forms = FormSubmission.query.filter_by(submitted_by=user_id).order_by(FormSubmission.created_at.desc()).limit(5).all()
-        notifications = Notification.query.filter_by(user_id=user_id, is_read=False).order_by(Notification.created_at.desc()).limit(10).all()
-        
+        with self._lock:
+            self._lookups += 1
+        generation = self.cache.get(f"gen:{user_id}")
+        if generation is None:
+            generation = uuid.uuid4().hex
+            # Generation entries outlive the data they version
+            self.cache.set(f"gen:{user_id}", generation, ttl=self.ttl * 2)
+        return self.cache.get_or_load(f"user:{user_id}:{generation}", lambda: self._rebuild(user_id))
+
+    def invalidate(self, user_ids: Iterable[int]):
+        """Drop the cached dashboards of ``user_ids``; the next request rebuilds them"""
+        for user_id in set(user_ids):
+            self.cache.set(f"gen:{user_id}", uuid.uuid4().hex, ttl=self.ttl * 2)
+            with self._lock:
+                self._invalidations += 1
+
+    def _rebuild(self, user_id) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            return self.load_dashboard(user_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._rebuilds += 1
+                self._rebuild_seconds.append(elapsed)
+
+    def load_dashboard(self, user_id) -> Dict[str, Any]:
+        """All dashboard sections for ``user_id`` from one UNION ALL query"""
+        def section(name, statement):
+            return select(statement.limit(SECTION_LIMITS[name]).subquery())
+
+        cases = select(
+            literal('cases').label('section'), Case.id.label('id'), Case.id.label('case_id'),
+            Case.title.label('title'), cast(Case.status, String).label('status'),
+            cast(Case.case_type, String).label('kind'), Case.created_at.label('at')
+        ).where(Case.user_id == user_id).order_by(Case.created_at.desc())
+        evidence = select(
+            literal('recent_evidence'), Evidence.id, Evidence.case_id,
+            func.coalesce(Evidence.title, Evidence.original_filename), cast(Evidence.status, String),
+            Evidence.evidence_type, Evidence.uploaded_at
+        ).where(Evidence.user_id == user_id).order_by(Evidence.uploaded_at.desc())
+        forms = select(
+            literal('recent_forms'), FormSubmission.id, FormSubmission.case_id,
+            func.coalesce(CourtForm.name, 'Form'), cast(FormSubmission.status, String),
+            cast(null(), String), FormSubmission.submitted_at
+        ).outerjoin(CourtForm, FormSubmission.template_id == CourtForm.id).where(
+            FormSubmission.submitted_by == user_id
+        ).order_by(FormSubmission.submitted_at.desc())
+        notifications = select(
+            literal('notifications'), Notification.id, Notification.related_case_id,
+            Notification.title, cast(Notification.priority, String),
+            cast(Notification.notification_type, String), Notification.created_at
+        ).where(Notification.user_id == user_id, Notification.is_read == false()).order_by(
+            Notification.created_at.desc()
+        )
+
+        statement = union_all(section('cases', cases), section('recent_evidence', evidence),
+                              section('recent_forms', forms), section('notifications', notifications))
+        dashboard = {name: [] for name in SECTION_LIMITS}
+        for row in db.session.execute(statement):
+            status_enum, kind_enum = _ENUMS[row.section]
+            dashboard[row.section].append({
+                'id': row.id,
+                'case_id': row.case_id,
+                'title': row.title,
+                'status': _enum_value(status_enum, row.status),
+                'kind': _enum_value(kind_enum, row.kind),
+                'at': row.at.isoformat() if row.at else None
+            })
+        # Each branch is ordered inside its subquery, but UNION ALL output order isn't guaranteed
+        for rows in dashboard.values():
+            rows.sort(key=lambda row: row['at'] or '', reverse=True)
+        return dashboard
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache hit ratio and rebuild latency for this process"""
+        with self._lock:
+            samples = sorted(self._rebuild_seconds)
+            lookups = self._lookups
+            rebuilds = self._rebuilds
+            invalidations = self._invalidations
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2) if samples else 0.0
+
+        # The backend's own hit ratio also counts the generation lookups
         return {
-            "cases": cases,
-            "recent_evidence": recent_evidence,
-            "recent_forms": recent_forms,
-            "notifications": notifications
-        }
\ No newline at end of file
+            'cache': self.cache.stats(),
+            'lookups': lookups,
+            'hit_ratio': round(max(0, lookups - rebuilds) / lookups, 4) if lookups else 0.0,
+            'rebuilds': rebuilds,
+            'invalidations': invalidations,
+            'rebuild_ms': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(samples[-1] * 1000, 2) if samples else 0.0
+            }
+        }
+
+def _enum_value(enum_class, name):
+    if name is None or enum_class is None:
+        return name
+    try:
+        return enum_class[name].value
+    except KeyError:
+        return name
+
+# Global dashboard manager
+dashboard_manager = DashboardManager()
+
+# Cache invalidation
+#
+# after_flush collects the owners of flushed rows; after_commit invalidates
+# them, so the next read can only see committed data.
+
+_PENDING_USERS = 'dashboard_pending_users'
+
+_OWNER_COLUMNS = (
+    (Case, 'user_id'),
+    (Evidence, 'user_id'),
+    (FormSubmission, 'submitted_by'),
+    (Notification, 'user_id'),
+)
+
+def _owners(obj) -> Set[int]:
+    for model, column in _OWNER_COLUMNS:
+        if isinstance(obj, model):
+            history = inspect(obj).attrs[column].history
+            owners = set(history.added) | set(history.unchanged) | set(history.deleted)
+            owners.discard(None)
+            return owners
+    return set()
+
+def mark_dashboard_stale(session, user_ids: Iterable[int]):
+    """Invalidate after commit for changes made outside the unit of work (bulk UPDATE/DELETE)"""
+    session.info.setdefault(_PENDING_USERS, set()).update(user_ids)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_dashboard_owners(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        owners = _owners(obj)
+        if owners:
+            session.info.setdefault(_PENDING_USERS, set()).update(owners)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_dashboards(session):
+    user_ids = session.info.pop(_PENDING_USERS, None)
+    if user_ids:
+        dashboard_manager.invalidate(user_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dashboard_owners(session):
+    session.info.pop(_PENDING_USERS, None)
@@ -1,3 +1,195 @@
+"""
+Database Setup
+Engine pooling derived from the gunicorn layout, SQLite dev pragmas and per-request query budgets
+"""
+
+import os
+import time
+import logging
+import sqlite3
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from flask import g, request
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+
+# Initialize logger
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request issues more queries than its budget allows"""
+    pass
+
+class QueryStats:
+    """Queries issued and time spent in the database within one tracked scope"""
+
+    def __init__(self, budget: Optional[int] = None, time_budget: Optional[float] = None,
+                 reject: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.budget = budget
+        self.time_budget = time_budget
+        self.reject = reject
+
+    @property
+    def over_budget(self) -> bool:
+        return bool((self.budget and self.count > self.budget) or
+                    (self.time_budget and self.seconds > self.time_budget))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'ms': round(self.seconds * 1000, 2)}
+
+_query_stats = contextvars.ContextVar('query_stats', default=None)
+_known_tables = set()  # (engine URL, table) pairs known to exist
+
+@contextmanager
+def track_queries(budget: Optional[int] = None, time_budget: Optional[float] = None,
+                  reject: bool = False):
+    """
+    Count the queries run inside the block
+
+    Yields a ``QueryStats``. With ``reject`` set, the query that takes the
+    count over ``budget`` raises ``QueryBudgetExceeded`` instead of running.
+    """
+    stats = QueryStats(budget, time_budget, reject)
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _query_stats.get()
+    if stats is None:
+        return
+    stats.count += 1
+    if stats.reject and stats.budget and stats.count > stats.budget:
+        raise QueryBudgetExceeded(f"Query budget of {stats.budget} exceeded")
+    # Kept on the execution context, which is discarded with the statement whether or not it succeeds
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+def _stop_timer(context):
+    stats = _query_stats.get()
+    start = getattr(context, '_query_start', None)
+    if stats is not None and start is not None:
+        stats.seconds += time.perf_counter() - start
+        context._query_start = None
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _stop_timer(context)
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # Time spent on a failed statement still counts against the budget
+    _stop_timer(exception_context.execution_context)
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the single writer; busy_timeout waits out locks"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    busy_timeout = int(os.environ.get('DB_BUSY_TIMEOUT', 5000))
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+    if os.environ.get('DB_SQLITE_WAL', 'true').lower() == 'true':
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for a database URL
+
+    Each gunicorn worker has its own pool, sized so every thread can hold a
+    connection (plus one for background threads) with the same number again
+    as overflow for bursts. Override with DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    if database_url.startswith('sqlite'):
+        busy_timeout = int(os.environ.get('DB_BUSY_TIMEOUT', 5000))
+        return {'connect_args': {'timeout': busy_timeout / 1000.0}}
+
+    workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+    threads = int(os.environ.get('GUNICORN_THREADS', 2))
+    pool_size = int(os.environ.get('DB_POOL_SIZE', threads + 1))
+    max_overflow = int(os.environ.get('DB_MAX_OVERFLOW', threads))
+    logger.info(f"Database pool: {workers} worker(s) x ({pool_size} + {max_overflow} overflow) = "
+                f"up to {workers * (pool_size + max_overflow)} connections")
+
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+    if database_url.startswith('postgres'):
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+        options['connect_args'] = {'options': f"-c statement_timeout={statement_timeout}"}
+    return options
+
+def pool_stats(engine=None) -> Dict[str, Any]:
+    """Structured connection pool numbers for health checks and metrics"""
+    pool = (engine or db.engine).pool
+    stats = {'pool_class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    if hasattr(pool, '_max_overflow'):
+        stats['max_overflow'] = pool._max_overflow
+    if hasattr(pool, '_timeout'):
+        stats['timeout'] = pool._timeout
+    return stats
+
+def has_table(session, table_name: str) -> bool:
+    """False until the table exists (run ``manage.py migrate``); only positive answers are cached"""
+    connection = session.connection()
+    key = (str(connection.engine.url), table_name)
+    if key not in _known_tables:
+        if not inspect(connection).has_table(table_name):
+            return False
+        _known_tables.add(key)
+    return True
+
+def init_db(app):
+    """Configure the engine from the environment, bind ``db`` and install query budgets"""
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    options = engine_options(url)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    # Per-request budgets; 0 disables. DB_QUERY_BUDGET_MODE is 'log' or 'reject'
+    app.config.setdefault('DB_QUERY_BUDGET', int(os.environ.get('DB_QUERY_BUDGET', 100)))
+    app.config.setdefault('DB_QUERY_TIME_BUDGET', float(os.environ.get('DB_QUERY_TIME_BUDGET', 2.0)))
+    app.config.setdefault('DB_QUERY_BUDGET_MODE', os.environ.get('DB_QUERY_BUDGET_MODE', 'log'))
+
+    db.init_app(app)
+
+    @app.before_request
+    def start_query_budget():
+        stats = QueryStats(app.config['DB_QUERY_BUDGET'] or None,
+                           app.config['DB_QUERY_TIME_BUDGET'] or None,
+                           app.config['DB_QUERY_BUDGET_MODE'] == 'reject')
+        g.query_stats = stats
+        g.query_stats_token = _query_stats.set(stats)
+
+    @app.teardown_request
+    def finish_query_budget(exc):
+        stats = g.pop('query_stats', None)
+        token = g.pop('query_stats_token', None)
+        if token is not None:
+            _query_stats.reset(token)
+        if stats is not None and stats.over_budget:
+            logger.warning(f"Request {request.method} {request.path} ran {stats.count} queries in "
+                           f"{stats.seconds * 1000:.1f}ms (budget: {stats.budget} queries, "
+                           f"{stats.time_budget}s)")
@@ -5,34 +5,27 @@ Enhanced error handling for production deployment
 
 import logging
 import traceback
-import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from functools import wraps
 from flask import jsonify, render_template, request, current_app
 import os
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
+from utils.system_metrics import PSUTIL_AVAILABLE
 
 # Configure logging
 def setup_logging():
     """Set up comprehensive logging configuration"""
-    
-    # Create logs directory
-    log_dir = 'logs'
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Configure root logger
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(os.path.join(log_dir, 'app.log')),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    from utils.log_pipeline import log_pipeline, PipelineHandler
+
+    # Configure root logger; records are written to logs/app.log and stdout by
+    # the pipeline's writer thread (utils.log_pipeline), never by the caller
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    if not any(isinstance(handler, PipelineHandler) for handler in root_logger.handlers):
+        root_logger.addHandler(log_pipeline.handler('app', 'console'))
     
     # Configure specific loggers
     loggers = {
@@ -50,50 +43,58 @@ def setup_logging():
 
 def setup_component_loggers():
     """Set up component-specific loggers"""
-    
-    log_dir = 'logs'
-    
-    # Security logger
-    security_logger = logging.getLogger('security')
-    security_handler = logging.FileHandler(os.path.join(log_dir, 'security.log'))
-    security_handler.setFormatter(logging.Formatter(
-        '%(asctime)s - SECURITY - %(levelname)s - %(message)s'
-    ))
-    security_logger.addHandler(security_handler)
-    security_logger.setLevel(logging.INFO)
-    
-    # Payment logger
-    payment_logger = logging.getLogger('payments')
-    payment_handler = logging.FileHandler(os.path.join(log_dir, 'payments.log'))
-    payment_handler.setFormatter(logging.Formatter(
-        '%(asctime)s - PAYMENT - %(levelname)s - %(message)s'
-    ))
-    payment_logger.addHandler(payment_handler)
-    payment_logger.setLevel(logging.INFO)
-    
-    # AI processing logger
-    ai_logger = logging.getLogger('ai_processing')
-    ai_handler = logging.FileHandler(os.path.join(log_dir, 'ai_processing.log'))
-    ai_handler.setFormatter(logging.Formatter(
-        '%(asctime)s - AI - %(levelname)s - %(message)s'
-    ))
-    ai_logger.addHandler(ai_handler)
-    ai_logger.setLevel(logging.INFO)
+    from utils.log_pipeline import log_pipeline, PipelineHandler
+
+    # Security, payment and AI processing records also get their own file;
+    # they still propagate to the root logger and app.log
+    for logger_name in ('security', 'payments', 'ai_processing'):
+        component_logger = logging.getLogger(logger_name)
+        if not any(isinstance(handler, PipelineHandler) for handler in component_logger.handlers):
+            component_logger.addHandler(log_pipeline.handler(logger_name))
+        component_logger.setLevel(logging.INFO)
 
 class ErrorHandler:
-    """Centralized error handling class"""
-    
-    def __init__(self):
+    """
+    Centralized error handling class
+
+    Errors are grouped by fingerprint (exception type plus the innermost
+    ``fingerprint_frames`` frames), and each fingerprint has a token bucket
+    of ``burst`` logs refilled at ``rate`` per second. Repeats beyond that
+    are only counted, and every ``window`` seconds a summary line reports
+    how many were suppressed, so an incident that raises the same error
+    thousands of times logs a handful of tracebacks. Security-related
+    errors are always logged in full.
+    """
+    
+    def __init__(self, window: float = None, burst: float = None, rate: float = None,
+                 fingerprint_frames: int = None, max_fingerprints: int = None):
         self.logger = logging.getLogger(__name__)
+        self.window = window or float(os.environ.get('ERROR_LOG_WINDOW', 60))
+        self.burst = burst or float(os.environ.get('ERROR_LOG_BURST', 5))
+        self.rate = rate if rate is not None else float(os.environ.get('ERROR_LOG_RATE', 0.1))
+        self.fingerprint_frames = fingerprint_frames or int(os.environ.get('ERROR_FINGERPRINT_FRAMES', 3))
+        self.max_fingerprints = max_fingerprints or int(os.environ.get('ERROR_LOG_MAX_FINGERPRINTS', 1000))
+        self._lock = threading.Lock()
+        self._fingerprints = OrderedDict()  # fingerprint -> occurrence and rate limit state
+        self._stats = {'logged': 0, 'suppressed': 0, 'summaries': 0}
+        self._flusher = None
     
     def log_error(self, error, context=None, user_id=None):
-        """Log error with context information"""
+        """Log error with context information, unless it is a rate-limited repeat"""
         try:
+            security_error = self._is_security_error(error)
+            fingerprint = self.fingerprint(error)
+            allowed, repeats = self._admit(fingerprint, error, always=security_error)
+            if not allowed:
+                return
+
             error_info = {
                 'timestamp': datetime.utcnow().isoformat(),
                 'error_type': type(error).__name__,
                 'error_message': str(error),
-                'traceback': traceback.format_exc(),
+                'fingerprint': fingerprint,
+                'suppressed_repeats': repeats,
+                'traceback': ''.join(traceback.format_exception(type(error), error, error.__traceback__)),
                 'context': context or {},
                 'user_id': user_id,
                 'request_path': getattr(request, 'path', 'N/A'),
@@ -104,7 +105,7 @@ class ErrorHandler:
             self.logger.error(f"Application Error: {error_info}")
             
             # Log to security logger if security-related
-            if self._is_security_error(error):
+            if security_error:
                 security_logger = logging.getLogger('security')
                 security_logger.warning(f"Security incident: {error_info}")
                 
@@ -113,6 +114,97 @@ class ErrorHandler:
             print(f"Failed to log error: {log_error}")
             print(f"Original error: {error}")
     
+    def fingerprint(self, error) -> str:
+        """Stable id for where an error was raised; ignores the message, which often varies"""
+        frames = [(frame.f_code.co_filename, frame.f_code.co_name, lineno)
+                  for frame, lineno in traceback.walk_tb(error.__traceback__)]
+        parts = [f"{type(error).__module__}.{type(error).__qualname__}"]
+        parts.extend(f"{os.path.basename(filename)}:{name}:{lineno}"
+                     for filename, name, lineno in frames[-self.fingerprint_frames:])
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:12]
+    
+    def flush_summaries(self):
+        """Log how often each fingerprint was suppressed in its finished window, and start new windows"""
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for fingerprint, entry in self._fingerprints.items():
+                if now - entry['window_start'] < self.window:
+                    continue
+                if entry['suppressed']:
+                    summaries.append((fingerprint, dict(entry), now - entry['window_start']))
+                    self._stats['summaries'] += 1
+                entry['window_start'] = now
+                entry['window_count'] = 0
+                entry['suppressed'] = 0
+        for fingerprint, entry, elapsed in summaries:
+            self.logger.warning(
+                f"Suppressed {entry['suppressed']} of {entry['window_count']} occurrences of "
+                f"{entry['example']} (fingerprint {fingerprint}) in the last {elapsed:.0f}s"
+            )
+    
+    def stats(self):
+        """Logged and suppressed counts, and the busiest fingerprints in their current window"""
+        with self._lock:
+            busiest = sorted(self._fingerprints.items(), key=lambda item: item[1]['window_count'], reverse=True)[:10]
+            return {
+                **self._stats,
+                'fingerprints': len(self._fingerprints),
+                'busiest': [
+                    {'fingerprint': fingerprint, 'error': entry['example'], 'window_count': entry['window_count'],
+                     'suppressed': entry['suppressed'], 'total': entry['total']}
+                    for fingerprint, entry in busiest
+                ]
+            }
+    
+    def _admit(self, fingerprint, error, always=False):
+        """(whether to log this occurrence, repeats suppressed since the last one logged)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._fingerprints.get(fingerprint)
+            if entry is None:
+                entry = self._fingerprints[fingerprint] = {
+                    'example': f"{type(error).__name__}: {str(error)[:200]}",
+                    'tokens': self.burst, 'updated': now, 'window_start': now,
+                    'window_count': 0, 'suppressed': 0, 'pending': 0, 'total': 0
+                }
+                while len(self._fingerprints) > self.max_fingerprints:
+                    self._fingerprints.popitem(last=False)
+            else:
+                self._fingerprints.move_to_end(fingerprint)
+            entry['total'] += 1
+            entry['window_count'] += 1
+            entry['tokens'] = min(self.burst, entry['tokens'] + (now - entry['updated']) * self.rate)
+            entry['updated'] = now
+            if entry['tokens'] >= 1 or always:
+                entry['tokens'] = max(0.0, entry['tokens'] - 1)
+                repeats, entry['pending'] = entry['pending'], 0
+                self._stats['logged'] += 1
+                return True, repeats
+            entry['suppressed'] += 1
+            entry['pending'] += 1
+            self._stats['suppressed'] += 1
+        self._ensure_flusher()
+        return False, 0
+    
+    def _ensure_flusher(self):
+        # Started on the first suppression; a thread inherited through fork reports not alive
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='error-log-summaries', daemon=True)
+            self._flusher.start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.window)
+            try:
+                self.flush_summaries()
+            except Exception as e:
+                self.logger.error(f"Error summary flush failed: {str(e)}")
+    
     def _is_security_error(self, error):
         """Check if error is security-related"""
         security_indicators = [
@@ -256,10 +348,11 @@ class HealthCheck:
                         table_info = "Tables: Count unavailable"
                     
                     # Check connection pool status
-                    pool = db.engine.pool
-                    pool_status = f"Connections: {pool.status()}, Size: {pool.size()}"
+                    from utils.db import pool_stats
+                    stats = pool_stats(db.engine)
+                    pool_status = ', '.join(f"{name}: {value}" for name, value in stats.items())
                     
-                    return True, f"Database OK (Connection test: {user_count}, {table_info}, {pool_status})"
+                    return True, f"Database OK (Connection test: {user_count}, {table_info}, Pool: {pool_status})"
                 except (OperationalError, TimeoutError) as e:
                     return False, f"Database timeout: {str(e)}"
         except Exception as e:
@@ -292,7 +385,7 @@ class HealthCheck:
         """Comprehensive network diagnostics with fail-safes"""
         try:
             import socket
-            import requests
+            from utils.http_client import http_client
             
             # Check DNS resolution
             try:
@@ -308,7 +401,7 @@ class HealthCheck:
                 
             # Check HTTP connectivity
             try:
-                response = requests.head("http://example.com", timeout=5)
+                response = http_client.head("http://example.com", timeout=5)
                 if response.status_code != 200:
                     return False, f"HTTP test failed: Status {response.status_code}"
             except Exception as e:
@@ -316,7 +409,7 @@ class HealthCheck:
                 
             # Check HTTPS connectivity
             try:
-                response = requests.head("https://example.com", timeout=5)
+                response = http_client.head("https://example.com", timeout=5)
                 if response.status_code != 200:
                     return False, f"HTTPS test failed: Status {response.status_code}"
             except Exception as e:
@@ -333,18 +426,17 @@ class HealthCheck:
             return False, "psutil not available"
         
         try:
-            # Get memory information
-            memory = psutil.virtual_memory()
-            
-            # Calculate percentages
-            memory_percent = memory.percent
-            swap_percent = psutil.swap_memory().percent if hasattr(psutil, 'swap_memory') else 0
+            # Latest background sample (utils.system_metrics); never calls psutil here
+            from utils.system_metrics import system_metrics
+            sample = system_metrics.latest()
+            memory_percent = sample['memory_percent']
             
             # Format memory information
             memory_info = (
                 f"Memory: {memory_percent:.1f}% used "
-                f"({memory.used // (1024*1024)}MB/{memory.total // (1024*1024)}MB), "
-                f"Available: {memory.available // (1024*1024)}MB"
+                f"({sample['memory_used_bytes'] // (1024*1024)}MB/{sample['memory_total_bytes'] // (1024*1024)}MB), "
+                f"Available: {sample['memory_available_bytes'] // (1024*1024)}MB, "
+                f"Process RSS: {sample['rss_bytes'] // (1024*1024)}MB"
             )
             
             # Check if memory usage is within acceptable limits (less than 90%)
@@ -364,11 +456,13 @@ class HealthCheck:
             return False, "psutil not available"
         
         try:
-            # Get CPU information
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # System CPU since the previous background sample, instead of sleeping for a second
+            from utils.system_metrics import system_metrics
+            sample = system_metrics.latest()
+            cpu_percent = sample['system_cpu_percent']
             
             # Format CPU information
-            cpu_info = f"CPU: {cpu_percent:.1f}%"
+            cpu_info = f"CPU: {cpu_percent:.1f}% (process: {sample['cpu_percent']:.1f}%)"
             
             # Check if CPU usage is within acceptable limits (less than 90%)
             if cpu_percent > 90:
@@ -387,17 +481,16 @@ class HealthCheck:
             return False, "psutil not available"
         
         try:
-            # Get disk information for the root partition
-            disk = psutil.disk_usage('/')
-            
-            # Calculate percentages
-            disk_percent = (disk.used / disk.total) * 100
+            # Disk usage for the sampled partition, from the latest background sample
+            from utils.system_metrics import system_metrics
+            sample = system_metrics.latest()
+            disk_percent = sample['disk_percent']
             
             # Format disk information
             disk_info = (
                 f"Disk: {disk_percent:.1f}% used "
-                f"({disk.used // (1024*1024*1024)}GB/{disk.total // (1024*1024*1024)}GB), "
-                f"Free: {disk.free // (1024*1024*1024)}GB"
+                f"({sample['disk_used_bytes'] // (1024*1024*1024)}GB/{sample['disk_total_bytes'] // (1024*1024*1024)}GB), "
+                f"Free: {sample['disk_free_bytes'] // (1024*1024*1024)}GB"
             )
             
             # Check if disk usage is within acceptable limits (less than 90%)
@@ -466,12 +559,16 @@ class HealthCheck:
     
     @staticmethod
     def check_cache_service():
-        """Check cache service connectivity (Redis/Memcached)"""
-        # Check if cache service is configured
-        cache_url = os.environ.get('REDIS_URL') or os.environ.get('MEMCACHED_URL')
+        """Check the shared cache backend; only Redis is an external service"""
+        from utils.cache import configured_backend
+        backend = configured_backend()
+        
+        if backend != 'redis':
+            return True, f"Cache backend '{backend}' needs no external service"
         
+        cache_url = os.environ.get('REDIS_URL')
         if not cache_url:
-            return True, "No cache service configured"
+            return False, "CACHE_BACKEND is redis but REDIS_URL is not set"
         
         try:
             # Try to import redis client
@@ -501,44 +598,81 @@ class HealthCheck:
         try:
             # Try to import smtplib
             import smtplib
+            from utils.retry import get_breaker, CircuitOpenError
             
-            # Try to connect to the email server
-            server = smtplib.SMTP(mail_server, int(mail_port))
-            server.starttls()
-            server.login(mail_username, mail_password)
-            server.quit()
+            def login():
+                server = smtplib.SMTP(mail_server, int(mail_port), timeout=5)
+                try:
+                    server.starttls()
+                    server.login(mail_username, mail_password)
+                except Exception:
+                    server.close()
+                    raise
+                server.quit()
+            
+            # Once the server keeps failing, stop logging in to it until the breaker's recovery timeout
+            get_breaker('smtp', failure_threshold=3, recovery_timeout=900).call(login)
             return True, "Email service connected successfully"
         except ImportError:
             return False, "smtplib not available"
+        except CircuitOpenError:
+            return False, "Email service failing; circuit open"
         except Exception as e:
             return False, f"Email service connection failed: {str(e)}"
     
     @classmethod
-    def get_health_status(cls):
-        """Get comprehensive health status"""
-        checks = {
-            'database': cls.check_database(),
-            'file_system': cls.check_file_system(),
-            'ai_services': cls.check_ai_services(),
-            'network': cls.check_network(),
-            'memory': cls.check_memory_usage(),
-            'cpu': cls.check_cpu_usage(),
-            'disk': cls.check_disk_usage(),
-            'environment': cls.check_environment_variables(),
-            'ssl': cls.check_ssl_certificates(),
-            'cache': cls.check_cache_service(),
-            'email': cls.check_email_service()
+    def all_checks(cls):
+        """Every check by name; utils.health runs them concurrently"""
+        return {
+            'database': cls.check_database,
+            'file_system': cls.check_file_system,
+            'ai_services': cls.check_ai_services,
+            'network': cls.check_network,
+            'memory': cls.check_memory_usage,
+            'cpu': cls.check_cpu_usage,
+            'disk': cls.check_disk_usage,
+            'environment': cls.check_environment_variables,
+            'ssl': cls.check_ssl_certificates,
+            'cache': cls.check_cache_service,
+            'email': cls.check_email_service
         }
+    
+    @classmethod
+    def get_health_status(cls):
+        """Get comprehensive health status from the last background sample"""
+        from utils.health import health_monitor
+        snapshot = health_monitor.snapshot(include_external=True)
+        checks = snapshot['checks']
         
-        all_healthy = all(status for status, _ in checks.values())
+        all_healthy = all(check['ok'] for check in checks.values())
+        
+        from utils.http_client import http_client
+        from utils.dashboard import dashboard_manager
+        from utils.notification_stream import notification_broker
+        from utils.system_metrics import system_metrics
+        from utils.log_pipeline import log_pipeline
+        from utils.db import db, pool_stats
+        try:
+            database_pool = pool_stats(db.engine)
+        except Exception as e:
+            database_pool = {'error': str(e)}
         
         return {
             'status': 'healthy' if all_healthy else 'unhealthy',
             'timestamp': datetime.utcnow().isoformat(),
+            'checked_at': snapshot['checked_at'],
             'checks': {
-                name: {'status': 'ok' if status else 'error', 'message': message}
-                for name, (status, message) in checks.items()
-            }
+                name: {'status': 'ok' if check['ok'] else 'error', 'message': check['message'],
+                       'duration_ms': check['duration_ms']}
+                for name, check in checks.items()
+            },
+            'database_pool': database_pool,
+            'outbound_http': http_client.stats(),
+            'dashboard_cache': dashboard_manager.stats(),
+            'notification_streams': notification_broker.stats(),
+            'system': system_metrics.summary(window=300),
+            'logging': log_pipeline.stats(),
+            'errors': error_handler.stats()
         }
 
 # Initialize logging when module is imported
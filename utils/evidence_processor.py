@@ -1,52 +1,68 @@
-from models.evidence import Evidence
-from models.notification import Notification
+from models.evidence import Evidence, EvidenceStatus
+from models.notification import NotificationType, NotificationPriority
 import logging
 from datetime import datetime
+from utils.db import db
 from utils.canadian_law_ai import canadian_law_ai
+from utils.job_queue import job_handler, enqueue
+from utils.notification_system import notification_manager
 
 class EvidenceProcessor:
     """Processes evidence items with Canadian law AI analysis"""
-    
+
     def process_evidence(self, evidence_id: int):
         """Process evidence with AI analysis"""
         evidence = Evidence.query.get(evidence_id)
         if not evidence:
             logging.error(f"Evidence {evidence_id} not found")
             return
-        
+
         # Analyze evidence relevance using Canadian law AI
         try:
             case = evidence.case
             if case:
                 # Get case type for context
-                case_type = case.case_type if hasattr(case, 'case_type') else 'unknown'
-                
+                case_type = case.case_type.value if case.case_type else 'unknown'
+
                 # Analyze evidence text (description or title)
                 evidence_text = evidence.description or evidence.title or ""
-                
+
                 # Perform AI analysis
                 analysis = canadian_law_ai.analyze_evidence_relevance(evidence_text, case_type)
-                
+
                 # Update evidence with AI analysis results
                 evidence.ai_relevance_score = analysis.get("ai_relevance_score")
                 evidence.analyzed_at = datetime.utcnow() if analysis.get("analyzed_at") else None
-                
+
                 logging.info(f"AI analysis completed for evidence {evidence_id}: {analysis.get('ai_relevance_score')}")
             else:
                 logging.warning(f"No case found for evidence {evidence_id}")
         except Exception as e:
             logging.error(f"AI analysis failed for evidence {evidence_id}: {str(e)}")
-            # Continue processing even if AI analysis fails
-        
+            # Let the job queue retry with backoff; the evidence stays unreviewed until then
+            raise
+
         # Simple processing: mark as reviewed
-        evidence.status = "Reviewed"
-        evidence.save()
-        
+        evidence.status = EvidenceStatus.REVIEWED
+        db.session.commit()
+
         # Create notification
-        notification = Notification(
-            user_id=evidence.uploaded_by,
-            message=f"Evidence {evidence_id} has been processed",
-            notification_type="evidence_processed"
+        notification_manager.create_notification(
+            user_id=evidence.user_id,
+            title="Evidence processed",
+            message=f"Evidence \"{evidence.title or evidence.original_filename}\" has been processed",
+            notif_type=NotificationType.DOCUMENT_UPLOAD,
+            priority=NotificationPriority.LOW,
+            case_id=evidence.case_id
         )
-        notification.save()
-        return evidence
\ No newline at end of file
+        return evidence
+
+@job_handler('process_evidence', max_retries=3, initial_delay=5.0, max_delay=300.0)
+def process_evidence_job(evidence_id: int):
+    """Queue entry point for post-upload evidence processing"""
+    EvidenceProcessor().process_evidence(evidence_id)
+
+def schedule_evidence_processing(evidence: Evidence):
+    """Queue AI analysis for new evidence; runs once the caller commits"""
+    db.session.flush()
+    return enqueue('process_evidence', {'evidence_id': evidence.id})
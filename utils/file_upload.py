@@ -1,6 +1,7 @@
 import os
 import uuid
 import hashlib
+import tempfile
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 from flask import current_app
@@ -34,6 +35,25 @@ class FileUploadHandler:
         'default': 10 * 1024 * 1024  # 10MB default
     }
     
+    IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'webp']
+    
+    # Magic byte signatures used to sniff the real content type: (offset, bytes, MIME type)
+    MAGIC_SIGNATURES = [
+        (0, b'%PDF-', 'application/pdf'),
+        (0, b'\xff\xd8\xff', 'image/jpeg'),
+        (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+        (0, b'GIF87a', 'image/gif'),
+        (0, b'GIF89a', 'image/gif'),
+        (0, b'BM', 'image/bmp'),
+        (0, b'II*\x00', 'image/tiff'),
+        (0, b'MM\x00*', 'image/tiff'),
+        (8, b'WEBP', 'image/webp'),
+    ]
+    SNIFF_BYTES = 16
+    
+    # Block size for the single-pass ingest; large blocks keep syscalls low
+    INGEST_BLOCK_SIZE = 1024 * 1024
+    
     def __init__(self, upload_folder: str = None):
         """Initialize file upload handler"""
         self.upload_folder = upload_folder or current_app.config.get('UPLOAD_FOLDER', 'uploads')
@@ -72,17 +92,29 @@ class FileUploadHandler:
         
         return file_mime_type in allowed_mime_types
     
-    def validate_file_size(self, file: FileStorage, filename: str) -> bool:
-        """Validate file size is within limits"""
+    def sniff_mime_type(self, head: bytes) -> Optional[str]:
+        """Detect MIME type from the leading bytes of a file"""
+        for offset, signature, mime_type in self.MAGIC_SIGNATURES:
+            if head[offset:offset + len(signature)] == signature:
+                if mime_type == 'image/webp' and not head.startswith(b'RIFF'):
+                    continue
+                return mime_type
+        return None
+    
+    def get_max_file_size(self, filename: str) -> int:
+        """Get the size limit for a file based on its extension"""
         extension = self.get_file_extension(filename)
         
         # Determine file category for size limits
         if extension == 'pdf':
-            max_size = self.MAX_FILE_SIZES['pdf']
-        elif extension in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'webp']:
-            max_size = self.MAX_FILE_SIZES['image']
-        else:
-            max_size = self.MAX_FILE_SIZES['default']
+            return self.MAX_FILE_SIZES['pdf']
+        elif extension in self.IMAGE_EXTENSIONS:
+            return self.MAX_FILE_SIZES['image']
+        return self.MAX_FILE_SIZES['default']
+    
+    def validate_file_size(self, file: FileStorage, filename: str) -> bool:
+        """Validate file size is within limits"""
+        max_size = self.get_max_file_size(filename)
         
         # Get file size
         file.seek(0, os.SEEK_END)
@@ -108,7 +140,7 @@ class FileUploadHandler:
         
         with open(file_path, "rb") as f:
             # Read file in chunks to handle large files
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(self.INGEST_BLOCK_SIZE), b""):
                 hash_sha256.update(chunk)
         
         return hash_sha256.hexdigest()
@@ -118,7 +150,8 @@ class FileUploadHandler:
         file_size = os.path.getsize(file_path)
         file_hash = self.calculate_file_hash(file_path)
         extension = self.get_file_extension(original_filename)
-        mime_type = mimetypes.guess_type(file_path)[0]
+        with open(file_path, 'rb') as f:
+            mime_type = self.sniff_mime_type(f.read(self.SNIFF_BYTES)) or mimetypes.guess_type(file_path)[0]
         
         return {
             'file_size': file_size,
@@ -126,16 +159,120 @@ class FileUploadHandler:
             'extension': extension,
             'mime_type': mime_type,
             'is_pdf': extension == 'pdf',
-            'is_image': extension in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'webp']
+            'is_image': extension in self.IMAGE_EXTENSIONS
         }
     
-    def save_file(self, file: FileStorage, subfolder: str = 'evidence') -> Tuple[str, Dict[str, Any]]:
+    def ingest_stream(self, stream, original_filename: str, subfolder: str = 'evidence',
+                      encrypt: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """
+        Store an upload in a single streaming pass
+        
+        The stream is read once in large blocks. Each block updates the SHA-256
+        hash and the running size (checked against the per-type limit), the
+        first bytes are sniffed for the real content type, and the data is
+        written (optionally encrypted) to a temp file that is atomically
+        renamed into place once everything has been validated.
+        
+        Args:
+            stream: Readable binary stream with the upload contents
+            original_filename: Client-supplied filename, used for the extension
+            subfolder: Subfolder within upload directory
+            encrypt: Encrypt the stored file with SecureFileManager
+            
+        Returns:
+            Tuple of (file_path, file_info)
+            
+        Raises:
+            FileUploadError: If validation fails or save operation fails
+        """
+        extension = self.get_file_extension(original_filename)
+        max_size = self.get_max_file_size(original_filename)
+        allowed_mime_types = self.ALLOWED_EXTENSIONS.get(extension, [])
+        
+        subfolder_path = os.path.join(self.upload_folder, subfolder)
+        temp_folder = os.path.join(self.upload_folder, 'temp')
+        os.makedirs(subfolder_path, exist_ok=True)
+        os.makedirs(temp_folder, exist_ok=True)
+        
+        secure_name = self.generate_secure_filename(original_filename)
+        if encrypt:
+            secure_name += '.enc'
+        file_path = os.path.join(subfolder_path, secure_name)
+        
+        hash_sha256 = hashlib.sha256()
+        file_size = 0
+        head = b''
+        mime_type = None
+        
+        fd, temp_path = tempfile.mkstemp(dir=temp_folder, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                writer = out
+                if encrypt:
+                    from utils.secure_storage import SecureFileManager
+                    writer = SecureFileManager().open_encryptor(out)
+                
+                for block in iter(lambda: stream.read(self.INGEST_BLOCK_SIZE), b''):
+                    file_size += len(block)
+                    if file_size > max_size:
+                        raise FileUploadError(f"File too large. Maximum size: {max_size // (1024 * 1024)}MB")
+                    
+                    if mime_type is None:
+                        head += block[:self.SNIFF_BYTES - len(head)]
+                        if len(head) >= self.SNIFF_BYTES:
+                            mime_type = self._check_sniffed_type(head, allowed_mime_types)
+                    
+                    hash_sha256.update(block)
+                    writer.write(block)
+                
+                if mime_type is None:
+                    mime_type = self._check_sniffed_type(head, allowed_mime_types)
+                if encrypt:
+                    writer.close()
+                out.flush()
+                os.fsync(out.fileno())
+            
+            os.replace(temp_path, file_path)
+        except FileUploadError:
+            os.remove(temp_path)
+            raise
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise FileUploadError(f"Failed to save file: {str(e)}")
+        
+        file_info = {
+            'file_size': file_size,
+            'file_hash': hash_sha256.hexdigest(),
+            'extension': extension,
+            'mime_type': mime_type,
+            'is_pdf': extension == 'pdf',
+            'is_image': extension in self.IMAGE_EXTENSIONS,
+            'encrypted': encrypt,
+            'original_filename': original_filename,
+            'secure_filename': secure_name,
+            'relative_path': os.path.join(subfolder, secure_name)
+        }
+        return file_path, file_info
+    
+    def _check_sniffed_type(self, head: bytes, allowed_mime_types) -> str:
+        """Sniff the content type and make sure it matches the extension"""
+        if not head:
+            raise FileUploadError("Uploaded file is empty")
+        mime_type = self.sniff_mime_type(head)
+        if mime_type not in allowed_mime_types:
+            raise FileUploadError("File content doesn't match file extension")
+        return mime_type
+    
+    def save_file(self, file: FileStorage, subfolder: str = 'evidence',
+                  encrypt: Optional[bool] = None) -> Tuple[str, Dict[str, Any]]:
         """
         Save uploaded file securely
         
         Args:
             file: The uploaded file object
             subfolder: Subfolder within upload directory
+            encrypt: Encrypt at rest; defaults to the ENCRYPT_UPLOADS setting
             
         Returns:
             Tuple of (file_path, file_info)
@@ -152,43 +289,11 @@ class FileUploadHandler:
         if not self.is_allowed_file(original_filename):
             raise FileUploadError(f"File type not allowed. Allowed types: {', '.join(self.ALLOWED_EXTENSIONS.keys())}")
         
-        # Validate MIME type
-        if not self.validate_mime_type(file, original_filename):
-            raise FileUploadError("File content doesn't match file extension")
-        
-        # Validate file size
-        if not self.validate_file_size(file, original_filename):
-            extension = self.get_file_extension(original_filename)
-            max_size_mb = self.MAX_FILE_SIZES.get(extension, self.MAX_FILE_SIZES['default']) // (1024 * 1024)
-            raise FileUploadError(f"File too large. Maximum size: {max_size_mb}MB")
+        if encrypt is None:
+            encrypt = current_app.config.get('ENCRYPT_UPLOADS', False)
         
-        # Generate secure filename
-        secure_name = self.generate_secure_filename(original_filename)
-        
-        # Create full file path
-        subfolder_path = os.path.join(self.upload_folder, subfolder)
-        if not os.path.exists(subfolder_path):
-            os.makedirs(subfolder_path, exist_ok=True)
-        
-        file_path = os.path.join(subfolder_path, secure_name)
-        
-        try:
-            # Save file
-            file.save(file_path)
-            
-            # Get file information
-            file_info = self.get_file_info(file_path, original_filename)
-            file_info['original_filename'] = original_filename
-            file_info['secure_filename'] = secure_name
-            file_info['relative_path'] = os.path.join(subfolder, secure_name)
-            
-            return file_path, file_info
-            
-        except Exception as e:
-            # Clean up file if save failed
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            raise FileUploadError(f"Failed to save file: {str(e)}")
+        # Size, content type and hash are all checked while the file is stored
+        return self.ingest_stream(file.stream, original_filename, subfolder, encrypt=encrypt)
     
     def delete_file(self, file_path: str) -> bool:
         """
@@ -258,14 +363,14 @@ def get_file_upload_handler():
 
 def save_evidence_file(file: FileStorage) -> Tuple[str, Dict[str, Any]]:
     """Convenience function for saving evidence files"""
-    return file_upload_handler.save_file(file, 'evidence')
+    return get_file_upload_handler().save_file(file, 'evidence')
 
 
 def save_form_file(file: FileStorage) -> Tuple[str, Dict[str, Any]]:
     """Convenience function for saving form-related files"""
-    return file_upload_handler.save_file(file, 'forms')
+    return get_file_upload_handler().save_file(file, 'forms')
 
 
 def delete_evidence_file(file_path: str) -> bool:
     """Convenience function for deleting evidence files"""
-    return file_upload_handler.delete_file(file_path)
\ No newline at end of file
+    return get_file_upload_handler().delete_file(file_path)
\ No newline at end of file
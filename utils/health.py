@@ -0,0 +1,192 @@
+"""
+Health Probes
+Concurrent health checks with per-check timeouts, cached and refreshed by a background sampler
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from flask import current_app
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """
+    Runs HealthCheck's checks off the request path
+
+    All checks run concurrently and share one deadline of ``timeout``
+    seconds; a check still running at the deadline is reported as failed
+    and is not started again until it returns, so a hung dependency ties up
+    one pool thread rather than a new one every round. Results are kept as
+    a snapshot for ``ttl`` seconds, and a per-worker sampler thread
+    refreshes it every ``interval`` seconds, so probes normally only read
+    memory. Readiness fails only on the ``critical`` checks; the rest are
+    reported but don't take the instance out of rotation.
+
+    The ``external`` checks (SMTP login, outbound network, SSL expiry) talk
+    to third parties, so the sampler and /readyz never run them; /health
+    runs them at most once every ``external_ttl`` seconds per worker.
+    """
+
+    def __init__(self, ttl: float = None, interval: float = None, timeout: float = None, critical=None,
+                 external=None, external_ttl: float = None):
+        self.ttl = ttl or float(os.environ.get('HEALTH_CACHE_TTL', 30))
+        # 0 disables the sampler; snapshots are then refreshed inline once they expire
+        self.interval = interval if interval is not None else \
+            float(os.environ.get('HEALTH_SAMPLE_INTERVAL', self.ttl / 2))
+        self.timeout = timeout or float(os.environ.get('HEALTH_CHECK_TIMEOUT', 5))
+        critical = critical or os.environ.get('READINESS_CHECKS', 'database,file_system,cache').split(',')
+        self.critical = {name.strip() for name in critical if name.strip()}
+        external = external if external is not None else \
+            os.environ.get('HEALTH_EXTERNAL_CHECKS', 'email,network,ssl').split(',')
+        self.external = {name.strip() for name in external if name.strip()}
+        self.external_ttl = external_ttl or float(os.environ.get('HEALTH_EXTERNAL_TTL', 600))
+        self._app = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._external_lock = threading.Lock()
+        self._external_snapshot: Optional[Dict[str, Any]] = None
+        self._running: Dict[str, Any] = {}
+        self._executor = None
+        self._sampler = None
+        self._pid = None
+
+    def init_app(self, app):
+        self._app = app
+
+    def checks(self) -> Dict[str, Callable[[], Tuple[bool, str]]]:
+        from utils.error_handling import HealthCheck
+        return HealthCheck.all_checks()
+
+    def snapshot(self, include_external: bool = False) -> Dict[str, Any]:
+        """
+        The last sampled results, refreshed inline only when missing or older than ``ttl``
+
+        With ``include_external`` the external checks are merged in, from
+        their own snapshot refreshed only once older than ``external_ttl``.
+        """
+        self._ensure_sampler()
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot['sampled_at'] > self.ttl:
+            with self._refresh_lock:
+                # Another thread may have refreshed while we waited
+                snapshot = self._snapshot
+                if snapshot is None or time.monotonic() - snapshot['sampled_at'] > self.ttl:
+                    snapshot = self.refresh()
+        if include_external and self.external:
+            external = self._external_results()
+            snapshot = dict(snapshot, checks={**snapshot['checks'], **external['checks']},
+                            external_checked_at=external['checked_at'])
+        return snapshot
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        snapshot = self.snapshot()
+        failing = sorted(name for name in self.critical
+                         if name in snapshot['checks'] and not snapshot['checks'][name]['ok'])
+        ready = not failing
+        return ready, {
+            'status': 'ready' if ready else 'not_ready',
+            'failing': failing,
+            'checked_at': snapshot['checked_at'],
+            'age_seconds': round(time.monotonic() - snapshot['sampled_at'], 1),
+            'checks': {name: snapshot['checks'][name] for name in sorted(self.critical) if name in snapshot['checks']}
+        }
+
+    def refresh(self, app=None) -> Dict[str, Any]:
+        """Run every local check now and store the result as the current snapshot"""
+        start = time.monotonic()
+        results = self.run_checks(app, exclude=self.external)
+        snapshot = {
+            'checks': results,
+            'checked_at': datetime.utcnow().isoformat(),
+            'sampled_at': time.monotonic(),
+            'duration_ms': round((time.monotonic() - start) * 1000, 2)
+        }
+        self._snapshot = snapshot
+        return snapshot
+
+    def run_checks(self, app=None, only=None, exclude=()) -> Dict[str, Dict[str, Any]]:
+        app = app or self._get_app()
+        executor = self._get_executor()
+        futures, results = {}, {}
+        with self._lock:
+            for name, check in self.checks().items():
+                if name in exclude or (only is not None and name not in only):
+                    continue
+                running = self._running.get(name)
+                if running is not None and not running.done():
+                    results[name] = {'ok': False, 'message': 'Previous check still running', 'duration_ms': None}
+                    continue
+                futures[name] = self._running[name] = executor.submit(self._run_check, app, check)
+
+        deadline = time.monotonic() + self.timeout
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                results[name] = {'ok': False, 'message': f"Timed out after {self.timeout:g}s", 'duration_ms': None}
+            except Exception as e:
+                results[name] = {'ok': False, 'message': f"Check raised: {str(e)}", 'duration_ms': None}
+        return results
+
+    def _external_results(self) -> Dict[str, Any]:
+        external = self._external_snapshot
+        if external is None or time.monotonic() - external['sampled_at'] > self.external_ttl:
+            with self._external_lock:
+                external = self._external_snapshot
+                if external is None or time.monotonic() - external['sampled_at'] > self.external_ttl:
+                    external = self._external_snapshot = {
+                        'checks': self.run_checks(only=self.external),
+                        'checked_at': datetime.utcnow().isoformat(),
+                        'sampled_at': time.monotonic()
+                    }
+        return external
+
+    @staticmethod
+    def _run_check(app, check) -> Dict[str, Any]:
+        start = time.perf_counter()
+        with app.app_context():
+            ok, message = check()
+        return {'ok': bool(ok), 'message': message, 'duration_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    def _get_app(self):
+        return self._app or current_app._get_current_object()
+
+    def _get_executor(self):
+        # Threads don't survive a fork; gunicorn workers each get their own pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=len(self.checks()), thread_name_prefix='health-check')
+            self._running = {}
+            self._pid = os.getpid()
+        return self._executor
+
+    def _ensure_sampler(self):
+        if self.interval <= 0:
+            return
+        # A thread inherited through fork reports not alive, so each worker starts its own
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        app = self._get_app()
+        with self._lock:
+            if self._sampler is not None and self._sampler.is_alive():
+                return
+            self._sampler = threading.Thread(target=self._sample, args=(app,), name='health-sampler', daemon=True)
+            self._sampler.start()
+
+    def _sample(self, app):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self._refresh_lock:
+                    self.refresh(app)
+            except Exception as e:
+                logger.error(f"Health sampler failed: {str(e)}")
+
+# Global health monitor
+health_monitor = HealthMonitor()
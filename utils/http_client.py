@@ -0,0 +1,194 @@
+"""
+Outbound HTTP Client
+Shared keep-alive sessions with per-host connection pools, timeouts and retries
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.retry import remaining_time, DeadlineExceeded
+from utils.metrics import observe_outbound
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose retry policy can be replaced for the requests of one thread"""
+
+    def __init__(self, overrides: threading.local, **kwargs):
+        self._overrides = overrides
+        self._max_retries = None
+        super().__init__(**kwargs)
+
+    @property
+    def max_retries(self) -> Retry:
+        override = getattr(self._overrides, 'retry', None)
+        return override if override is not None else self._max_retries
+
+    @max_retries.setter
+    def max_retries(self, value: Retry):
+        self._max_retries = value
+
+class HTTPClient:
+    """
+    Process-wide client for calls to third-party services
+
+    Requests go through one ``requests.Session`` per process whose adapters
+    keep a pool of keep-alive connections per host, so repeat calls to CanLII
+    or Cloudflare skip the TCP and TLS handshakes. Every request gets a
+    default (connect, read) timeout, and idempotent requests are retried on
+    connection errors and 429/502/503/504 responses, honouring Retry-After.
+    Timeouts are capped at the time left before the current request deadline.
+    Callers that retry on their own (``utils.retry`` with a retry budget)
+    pass ``retries=0`` so a logical call is not retried at both layers.
+    """
+
+    RETRY_STATUSES = (429, 502, 503, 504)
+
+    def __init__(self, pool_connections: int = None, pool_maxsize: int = None,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 retries: int = None, backoff_factor: float = 0.3):
+        self.pool_connections = pool_connections or int(os.environ.get('HTTP_POOL_HOSTS', 10))
+        self.pool_maxsize = pool_maxsize or int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+        self.timeout = (
+            connect_timeout or float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05)),
+            read_timeout or float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+        )
+        self.retries = int(os.environ.get('HTTP_RETRIES', 2)) if retries is None else retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._host_stats = {}  # host -> counters
+        self._overrides = threading.local()  # per-request retry policy
+
+    @property
+    def session(self) -> requests.Session:
+        # Sockets must not be shared with a forked child, so rebuild per process
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._build_session()
+                    self._pid = os.getpid()
+                    self._host_stats = {}
+        return self._session
+
+    def _retry_policy(self, retries: int) -> Retry:
+        return Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+
+    def _build_session(self) -> requests.Session:
+        adapter = _PooledAdapter(self._overrides, pool_connections=self.pool_connections,
+                                 pool_maxsize=self.pool_maxsize, max_retries=self._retry_policy(self.retries))
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def request(self, method: str, url: str, retries: int = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session, with the default timeout if none given
+
+        ``retries`` overrides the client's retry count for this request only.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        remaining = remaining_time()
+        if remaining is not None:
+            # Never wait on a socket past the caller's deadline
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Request deadline passed before calling {url}")
+            connect, read = kwargs['timeout'] if isinstance(kwargs['timeout'], tuple) else (kwargs['timeout'],) * 2
+            kwargs['timeout'] = (min(connect, remaining), min(read, remaining))
+        host = urlsplit(url).netloc
+        start = time.perf_counter()
+        if retries is not None:
+            self._overrides.retry = self._retry_policy(retries)
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._record(host, time.perf_counter() - start, error=True)
+            raise
+        finally:
+            self._overrides.retry = None
+        self._record(host, time.perf_counter() - start, error=response.status_code >= 500)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def _record(self, host: str, elapsed: float, error: bool):
+        with self._lock:
+            stats = self._host_stats.setdefault(host, {
+                'requests': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0
+            })
+            stats['requests'] += 1
+            stats['errors'] += int(error)
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+        observe_outbound(host, elapsed, error)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-host request latency and connection reuse for this process
+
+        ``connections_opened`` counts new TCP connections made by the host's
+        pool; every other request sent on it reused a kept-alive connection.
+        Pools evicted from the adapter's LRU are no longer reported.
+        """
+        with self._lock:
+            hosts = {host: dict(stats) for host, stats in self._host_stats.items()}
+
+        if self._session is not None:
+            for adapter in set(self._session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+                    stats = hosts.setdefault(host, {'requests': 0, 'errors': 0,
+                                                    'total_seconds': 0.0, 'max_seconds': 0.0})
+                    stats['connections_opened'] = stats.get('connections_opened', 0) + pool.num_connections
+                    stats['requests_sent'] = stats.get('requests_sent', 0) + pool.num_requests
+
+        for stats in hosts.values():
+            requests_count = stats['requests']
+            stats['avg_ms'] = round(stats['total_seconds'] * 1000 / requests_count, 2) if requests_count else 0.0
+            stats['max_ms'] = round(stats.pop('max_seconds') * 1000, 2)
+            stats.pop('total_seconds')
+            sent = stats.get('requests_sent', 0)
+            opened = stats.get('connections_opened', 0)
+            stats['reused'] = max(0, sent - opened)
+            stats['reuse_ratio'] = round(stats['reused'] / sent, 4) if sent else 0.0
+
+        return {
+            'pid': os.getpid(),
+            'timeout': {'connect': self.timeout[0], 'read': self.timeout[1]},
+            'retries': self.retries,
+            'hosts': hosts
+        }
+
+# Global outbound client; import this rather than calling requests directly
+http_client = HTTPClient()
@@ -0,0 +1,283 @@
+"""
+Background Job Queue
+Durable, database-backed job queue with worker processes, retries and visibility timeouts
+"""
+
+import os
+import time
+import socket
+import signal
+import logging
+import importlib
+import threading
+import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple, Type
+from sqlalchemy import or_, and_
+from utils.db import db
+from utils.retry import compute_delay
+from models.job import Job, JobStatus
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Modules whose import registers job handlers; loaded by every worker
+HANDLER_MODULES = [
+    'utils.evidence_processor',
+]
+
+@dataclass
+class JobHandler:
+    """A registered job function and its retry policy (same knobs as utils.retry.retry)"""
+    func: Callable
+    exceptions: Tuple[Type[Exception], ...] = (Exception,)
+    max_retries: int = 5
+    initial_delay: float = 1.0
+    max_delay: float = 60.0
+    backoff_factor: float = 2.0
+    jitter: float = 0.1
+
+_handlers: Dict[str, JobHandler] = {}
+
+def job_handler(
+    name: str,
+    exceptions: Tuple[Type[Exception], ...] = (Exception,),
+    max_retries: int = 5,
+    initial_delay: float = 1.0,
+    max_delay: float = 60.0,
+    backoff_factor: float = 2.0,
+    jitter: float = 0.1
+):
+    """
+    Decorator registering a function as the handler for jobs called ``name``
+
+    The handler receives the job payload as keyword arguments. Failures raising
+    one of ``exceptions`` are retried up to ``max_retries`` times with the same
+    exponential backoff and jitter as ``utils.retry.retry``; anything else fails
+    the job immediately.
+    """
+    def decorator(func: Callable):
+        _handlers[name] = JobHandler(func, exceptions, max_retries, initial_delay,
+                                     max_delay, backoff_factor, jitter)
+        return func
+    return decorator
+
+def enqueue(name: str, payload: Optional[dict] = None, delay: float = 0) -> Job:
+    """
+    Add a job to the queue
+
+    The job is added to the current session and becomes visible to workers
+    when the caller commits, so it is enqueued atomically with the rows it
+    refers to.
+    """
+    handler = _handlers.get(name)
+    max_retries = handler.max_retries if handler else 5
+    job = Job(
+        name=name,
+        payload=payload or {},
+        status=JobStatus.QUEUED,
+        max_attempts=max_retries + 1,
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    return job
+
+class JobWorker:
+    """
+    Claims and runs queued jobs inside one process
+
+    A job is claimed with a conditional UPDATE that only succeeds if the job is
+    still due, which works the same on SQLite and Postgres. A claimed job stays
+    invisible to other workers until ``locked_until``, which a heartbeat keeps
+    pushing out while the job runs. If the worker dies, the job becomes
+    claimable again after the visibility timeout.
+
+    Locks are taken per thread, so two threads of one process never both
+    believe they hold the same job.
+    """
+
+    def __init__(self, app, concurrency: int = 2, visibility_timeout: int = 300,
+                 poll_interval: float = 1.0, retention_days: int = 7):
+        self.app = app
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.retention_days = retention_days
+        self.process_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat_interval = visibility_timeout / 3
+        self._stop = threading.Event()
+        self._last_purge = 0.0
+
+        for module in HANDLER_MODULES:
+            importlib.import_module(module)
+
+    @property
+    def worker_id(self) -> str:
+        """Lock owner for the calling thread"""
+        return f"{self.process_id}:{threading.get_ident()}"
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(Job.status == JobStatus.QUEUED, Job.run_at <= now),
+            and_(Job.status == JobStatus.RUNNING, Job.locked_until < now)
+        )
+
+    def claim(self) -> Optional[Job]:
+        """Claim the next due job, or return None when the queue is idle"""
+        now = datetime.utcnow()
+        candidates = db.session.query(Job.id).filter(self._claimable(now)) \
+                                .order_by(Job.run_at).limit(self.concurrency * 2).all()
+        for (job_id,) in candidates:
+            claimed = db.session.query(Job).filter(Job.id == job_id, self._claimable(now)).update({
+                Job.status: JobStatus.RUNNING,
+                Job.locked_by: self.worker_id,
+                Job.locked_until: now + timedelta(seconds=self.visibility_timeout),
+                Job.attempts: Job.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                job = db.session.get(Job, job_id)
+                db.session.refresh(job)
+                if job.attempts > job.max_attempts:
+                    # Its worker kept dying mid-job; stop handing it out
+                    self._finish(job, JobStatus.FAILED, "Visibility timeout expired on final attempt")
+                    continue
+                return job
+        return None
+
+    def run_job(self, job: Job):
+        """Run a claimed job and record the outcome"""
+        handler = _handlers.get(job.name)
+        if handler is None:
+            self._finish(job, JobStatus.FAILED, f"No handler registered for job '{job.name}'")
+            return
+
+        try:
+            with self._lease(job):
+                handler.func(**(job.payload or {}))
+        except Exception as e:
+            db.session.rollback()
+            error = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+            if isinstance(e, handler.exceptions) and job.attempts <= handler.max_retries:
+                delay = compute_delay(job.attempts, handler.initial_delay, handler.max_delay,
+                                      handler.backoff_factor, handler.jitter)
+                logger.warning(f"Job {job.id} ({job.name}) attempt #{job.attempts} failed: {str(e)}. "
+                               f"Retrying in {delay:.2f}s...")
+                self._release(job, datetime.utcnow() + timedelta(seconds=delay), error)
+            else:
+                logger.error(f"Job {job.id} ({job.name}) failed permanently: {str(e)}")
+                self._finish(job, JobStatus.FAILED, error)
+            return
+
+        self._finish(job, JobStatus.SUCCEEDED)
+
+    @contextmanager
+    def _lease(self, job: Job):
+        """Extend the job's lock every ``heartbeat_interval`` seconds while the block runs"""
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job.id, self.worker_id, stop),
+                                     name=f"job-heartbeat-{job.id}", daemon=True)
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            heartbeat.join()
+
+    def _heartbeat(self, job_id: int, worker_id: str, stop: threading.Event):
+        # Own app context, so its own session and connection
+        with self.app.app_context():
+            try:
+                while not stop.wait(self.heartbeat_interval):
+                    extended = db.session.query(Job).filter(
+                        Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING
+                    ).update({
+                        Job.locked_until: datetime.utcnow() + timedelta(seconds=self.visibility_timeout)
+                    }, synchronize_session=False)
+                    db.session.commit()
+                    if not extended:
+                        logger.warning(f"Job {job_id} lease lost; another worker may run it again")
+                        return
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Job {job_id} heartbeat failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def _release(self, job: Job, run_at: datetime, error: str):
+        db.session.query(Job).filter(Job.id == job.id, Job.locked_by == self.worker_id).update({
+            Job.status: JobStatus.QUEUED,
+            Job.run_at: run_at,
+            Job.locked_by: None,
+            Job.locked_until: None,
+            Job.last_error: error
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def _finish(self, job: Job, status: JobStatus, error: str = None):
+        # Only the current lock holder may record an outcome
+        db.session.query(Job).filter(Job.id == job.id, Job.locked_by == self.worker_id).update({
+            Job.status: status,
+            Job.locked_until: None,
+            Job.finished_at: datetime.utcnow(),
+            Job.last_error: error
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def purge_finished(self) -> int:
+        """Delete succeeded jobs older than the retention period"""
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        deleted = db.session.query(Job).filter(
+            Job.status == JobStatus.SUCCEEDED, Job.finished_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def _loop(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    job = self.claim()
+                    if job is None:
+                        if time.time() - self._last_purge > 3600:
+                            self._last_purge = time.time()
+                            self.purge_finished()
+                        self._stop.wait(self.poll_interval)
+                        continue
+                    self.run_job(job)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Job worker error: {str(e)}")
+                    self._stop.wait(self.poll_interval)
+                finally:
+                    db.session.remove()
+
+    def run(self):
+        """Run ``concurrency`` worker threads until SIGTERM/SIGINT"""
+        def stop(signum, frame):
+            logger.info(f"Job worker {self.process_id} shutting down")
+            self._stop.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        threads = [threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        logger.info(f"Job worker {self.process_id} started with {self.concurrency} thread(s)")
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1.0)
+
+    def stop(self):
+        self._stop.set()
+
+def run_worker_process(concurrency: int, visibility_timeout: int, poll_interval: float):
+    """Entry point for a worker process started by ``manage.py worker``"""
+    from main import create_app
+    app = create_app()
+    JobWorker(app, concurrency=concurrency, visibility_timeout=visibility_timeout,
+              poll_interval=poll_interval).run()
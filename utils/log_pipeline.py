@@ -0,0 +1,292 @@
+"""
+Logging Pipeline
+Non-blocking log output: records are queued by request threads and written by one thread per process
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Iterable, Optional
+try:
+    import fcntl
+except ImportError:  # Windows: rotation falls back to a per-process lock
+    fcntl = None
+
+# Text formats per destination, used when LOG_FORMAT=text
+DESTINATIONS = {
+    'app': ('app.log', '%(asctime)s - %(name)s - %(levelname)s - %(message)s'),
+    'security': ('security.log', '%(asctime)s - SECURITY - %(levelname)s - %(message)s'),
+    'payments': ('payments.log', '%(asctime)s - PAYMENT - %(levelname)s - %(message)s'),
+    'ai_processing': ('ai_processing.log', '%(asctime)s - AI - %(levelname)s - %(message)s'),
+    'console': (None, '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+}
+
+# LogRecord attributes; anything else on a record came from ``extra=``
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'destinations'}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra=`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+            'module': record.module,
+            'line': record.lineno
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    Size and daily rotation that is safe with every worker appending to one file
+
+    Before each write the path is checked: if another process has rotated
+    it away, the new file is opened. Rotation itself happens under a host
+    wide lock and is skipped if another process got there first.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, daily: bool = True):
+        self._inode = None
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.daily = daily
+        self._thread_lock = threading.Lock()
+        digest = hashlib.sha1(self.baseFilename.encode('utf-8')).hexdigest()[:16]
+        self.lock_path = os.path.join(tempfile.gettempdir(), 'smartdispute-logs', f"{digest}.lock")
+
+    def _open(self):
+        stream = super()._open()
+        self._inode = os.fstat(stream.fileno()).st_ino
+        return stream
+
+    def _due(self, st: os.stat_result) -> bool:
+        if self.maxBytes and st.st_size >= self.maxBytes:
+            return True
+        return self.daily and st.st_size > 0 and date.fromtimestamp(st.st_mtime) != date.today()
+
+    def shouldRollover(self, record) -> bool:
+        try:
+            st = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            st = None
+        if self.stream is not None and (st is None or st.st_ino != self._inode):
+            # Rotated by another process; the next write opens the new file
+            self.stream.close()
+            self.stream = None
+        return st is not None and self._due(st)
+
+    def doRollover(self):
+        with self._interprocess_lock():
+            try:
+                st = os.stat(self.baseFilename)
+            except FileNotFoundError:
+                return
+            if self._due(st):
+                super().doRollover()
+            elif self.stream is not None and st.st_ino != self._inode:
+                self.stream.close()
+                self.stream = None
+
+    @contextmanager
+    def _interprocess_lock(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class PipelineHandler(QueueHandler):
+    """Attached to loggers; hands records to the pipeline for ``destinations``"""
+
+    def __init__(self, pipeline: 'LogPipeline', destinations: Iterable[str]):
+        super().__init__(None)
+        self.pipeline = pipeline
+        self.destinations = tuple(destinations)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the work that can't wait: the message and traceback must be
+        # captured now, everything else is formatted by the writer thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.destinations = self.destinations
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self.pipeline.enqueue(record)
+
+class _RoutingListener(QueueListener):
+    def __init__(self, log_queue, handlers: Dict[str, logging.Handler], pipeline: 'LogPipeline'):
+        super().__init__(log_queue, *handlers.values(), respect_handler_level=True)
+        self.routes = handlers
+        self.pipeline = pipeline
+
+    def handle(self, record: logging.LogRecord):
+        self.pipeline._report_drops()
+        for destination in record.destinations:
+            handler = self.routes.get(destination)
+            if handler is not None and record.levelno >= handler.level:
+                handler.handle(record)
+        self.pipeline._count('written')
+
+    def enqueue_sentinel(self):
+        # The queue may be full at shutdown; wait for room rather than raise
+        self.queue.put(self._sentinel)
+
+class LogPipeline:
+    """
+    Per-process log writer fed by a bounded queue
+
+    Loggers get a ``PipelineHandler``, which only copies the record onto the
+    queue; one listener thread per process formats it (JSON by default,
+    LOG_FORMAT=text for the old line format) and writes it to the
+    destination's file and to stdout. When the queue is full, records below
+    ERROR are dropped at once and errors wait at most ``error_wait``
+    seconds, so a slow disk never stalls a request. Drops are counted per
+    level and reported in the log once the writer catches up.
+    """
+
+    def __init__(self, directory: str = None, queue_size: int = None, max_bytes: int = None,
+                 backup_count: int = None, daily: bool = None, json_format: bool = None,
+                 error_wait: float = None, console: bool = True):
+        self.directory = directory or os.environ.get('LOG_DIR', 'logs')
+        self.queue_size = queue_size or int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+        self.max_bytes = max_bytes or int(os.environ.get('LOG_MAX_BYTES', 50 * 1024 * 1024))
+        self.backup_count = backup_count if backup_count is not None else \
+            int(os.environ.get('LOG_BACKUP_COUNT', 5))
+        self.daily = daily if daily is not None else os.environ.get('LOG_ROTATE_DAILY', 'true').lower() == 'true'
+        self.json_format = json_format if json_format is not None else \
+            os.environ.get('LOG_FORMAT', 'json').lower() == 'json'
+        self.error_wait = error_wait if error_wait is not None else float(os.environ.get('LOG_QUEUE_ERROR_WAIT', 0.05))
+        self.console = console
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._listener: Optional[_RoutingListener] = None
+        self._pid = None
+        self._stats = {'queued': 0, 'written': 0}
+        self._dropped: Dict[str, int] = {}
+        self._unreported = 0
+
+    def handler(self, *destinations: str) -> PipelineHandler:
+        """A handler sending records to ``destinations`` (keys of DESTINATIONS)"""
+        return PipelineHandler(self, destinations)
+
+    def start(self):
+        """Start this process's writer thread (idempotent, and restarted after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # The queue, its locks and the writer thread belong to the parent
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._listener = _RoutingListener(self._queue, self._build_handlers(), self)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Write out everything queued and stop the writer"""
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None and self._pid == os.getpid():
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+
+    def enqueue(self, record: logging.LogRecord):
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            try:
+                if record.levelno < logging.ERROR or self.error_wait <= 0:
+                    raise
+                self._queue.put(record, timeout=self.error_wait)
+            except queue.Full:
+                with self._lock:
+                    self._dropped[record.levelname] = self._dropped.get(record.levelname, 0) + 1
+                    self._unreported += 1
+                return
+        self._count('queued')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'format': 'json' if self.json_format else 'text',
+                'queue_size': self.queue_size,
+                'backlog': self._queue.qsize() if self._queue is not None else 0,
+                'dropped': dict(self._dropped),
+                **self._stats
+            }
+
+    def _count(self, field: str):
+        with self._lock:
+            self._stats[field] += 1
+
+    def _report_drops(self):
+        # Writer thread only
+        if not self._unreported:
+            return
+        with self._lock:
+            dropped, self._unreported = self._unreported, 0
+        record = logging.makeLogRecord({
+            'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': f"Log queue full: dropped {dropped} records", 'created': time.time(),
+            'process': os.getpid(), 'threadName': threading.current_thread().name,
+            'dropped': dropped, 'destinations': ('app', 'console')
+        })
+        for destination in record.destinations:
+            handler = self._listener.routes.get(destination) if self._listener else None
+            if handler is not None:
+                handler.handle(record)
+
+    def _build_handlers(self) -> Dict[str, logging.Handler]:
+        handlers = {}
+        os.makedirs(self.directory, exist_ok=True)
+        for destination, (filename, text_format) in DESTINATIONS.items():
+            if filename is None:
+                if not self.console:
+                    continue
+                handler = logging.StreamHandler(sys.stdout)
+            else:
+                handler = SharedRotatingFileHandler(os.path.join(self.directory, filename), self.max_bytes,
+                                                    self.backup_count, self.daily)
+            handler.setFormatter(JSONFormatter() if self.json_format else logging.Formatter(text_format))
+            handlers[destination] = handler
+        return handlers
+
+# Global pipeline; setup_logging attaches its handlers
+log_pipeline = LogPipeline()
+atexit.register(log_pipeline.stop)
@@ -0,0 +1,549 @@
+"""
+Metrics
+Prometheus text exposition aggregated across gunicorn workers through per-process mmap files
+"""
+
+import os
+import glob
+import hmac
+import json
+import mmap
+import time
+import struct
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from flask import Response, g, request
+from utils.system_metrics import default_metrics_dir
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Seconds; covers fast JSON endpoints up to the 60s request deadline
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def multiprocess_dir() -> str:
+    """
+    Directory holding this server's per-process value files
+
+    Workers of one gunicorn master share its pid as their parent, so files
+    left by an earlier server on the same host are never merged in. Set
+    METRICS_MULTIPROC_DIR to pin it (and clear it before each start).
+    """
+    return os.environ.get('METRICS_MULTIPROC_DIR') or \
+        os.path.join(default_metrics_dir(), f"prometheus-{os.getppid()}")
+
+# Value file layout: an 8-byte header holding the bytes used, then entries of
+# <int32 key length><utf-8 key, padded so the value is 8-byte aligned><float64 value>
+
+_HEADER = struct.Struct('<i')
+_LENGTH = struct.Struct('<i')
+_VALUE = struct.Struct('<d')
+
+def _iter_entries(data, used: int) -> Iterator[Tuple[str, float, int]]:
+    pos = 8
+    while pos < used:
+        length = _LENGTH.unpack_from(data, pos)[0]
+        pos += 4
+        key = bytes(data[pos:pos + length]).decode('utf-8')
+        pos += length + (8 - (length + 4) % 8) % 8
+        yield key, _VALUE.unpack_from(data, pos)[0], pos
+        pos += 8
+
+def read_values(path: str) -> List[Tuple[str, float]]:
+    """Every key and value in one process's file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 8:
+        return []
+    return [(key, value) for key, value, _ in _iter_entries(data, _HEADER.unpack_from(data, 0)[0])]
+
+class MmapedValues:
+    """
+    Float64 slots in a memory-mapped file written by a single process
+
+    Entries are appended and never moved, so readers in other processes can
+    parse the file at any time; the header is only advanced once an entry
+    is complete.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size < 8:
+            self._file.truncate(self.INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = _HEADER.unpack_from(self._map, 0)[0]
+        if self._used < 8:
+            self._used = 8
+            _HEADER.pack_into(self._map, 0, self._used)
+        self._positions = {key: pos for key, _, pos in _iter_entries(self._map, self._used)}
+
+    def _position(self, key: str) -> int:
+        pos = self._positions.get(key)
+        if pos is None:
+            encoded = key.encode('utf-8')
+            padding = (8 - (len(encoded) + 4) % 8) % 8
+            entry = _LENGTH.pack(len(encoded)) + encoded + b'\x00' * padding + _VALUE.pack(0.0)
+            while self._used + len(entry) > self._capacity:
+                self._capacity *= 2
+                self._map.close()
+                self._file.truncate(self._capacity)
+                self._map = mmap.mmap(self._file.fileno(), self._capacity)
+            self._map[self._used:self._used + len(entry)] = entry
+            pos = self._positions[key] = self._used + len(entry) - 8
+            self._used += len(entry)
+            _HEADER.pack_into(self._map, 0, self._used)
+        return pos
+
+    def get(self, key: str) -> float:
+        return _VALUE.unpack_from(self._map, self._position(key))[0]
+
+    def set(self, key: str, value: float):
+        _VALUE.pack_into(self._map, self._position(key), value)
+
+    def add(self, key: str, amount: float):
+        pos = self._position(key)
+        _VALUE.pack_into(self._map, pos, _VALUE.unpack_from(self._map, pos)[0] + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+class _Metric:
+    """A metric family; values live in the registry's value file for ``kind``"""
+
+    type_name = 'untyped'
+    kind = 'counter'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, labels: Dict[str, Any]) -> Dict[str, str]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return {name: str(labels[name]) for name in self.labelnames}
+
+    def _key(self, sample: str, labels: Dict[str, str]) -> str:
+        return json.dumps([self.name, sample, labels], sort_keys=True)
+
+class Counter(_Metric):
+    type_name = 'counter'
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry._add(self.kind, self._key(self.name, self._labels(labels)), amount)
+
+    def set_total(self, value: float, **labels):
+        """Mirror a running total kept elsewhere in this process (e.g. a stats() counter)"""
+        self.registry._set(self.kind, self._key(self.name, self._labels(labels)), value)
+
+class Gauge(_Metric):
+    """``mode`` 'livesum' adds up live workers; 'max' takes the highest (for shared or state values)"""
+    type_name = 'gauge'
+
+    def __init__(self, registry, name, documentation, labelnames=(), mode: str = 'livesum'):
+        super().__init__(registry, name, documentation, labelnames)
+        self.kind = f"gauge_{mode}"
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry._add(self.kind, self._key(self.name, self._labels(labels)), amount)
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self.registry._set(self.kind, self._key(self.name, self._labels(labels)), value)
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        labels = self._labels(labels)
+        # Only the first matching bucket is stored; exposition makes the counts cumulative
+        le = next((bound for bound in self.buckets if value <= bound), float('inf'))
+        self.registry._add(self.kind, self._key(f"{self.name}_bucket", dict(labels, le=_format_bound(le))), 1)
+        self.registry._add(self.kind, self._key(f"{self.name}_sum", labels), value)
+        self.registry._add(self.kind, self._key(f"{self.name}_count", labels), 1)
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = ('{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class MetricsRegistry:
+    """
+    Metric families plus this process's value files
+
+    Each process writes only its own ``<kind>_<pid>.db`` files, so updates
+    are a struct write under a process-local lock. ``render`` merges the
+    files of every process: counters and histograms are summed including
+    exited workers (their totals still happened), while gauges only count
+    live workers. Stats kept in ordinary objects (caches, circuit breakers,
+    SSE connections, ...) are mirrored into the files by collectors, run
+    every ``sync_interval`` seconds and before each render.
+    """
+
+    def __init__(self, directory: str = None, sync_interval: float = None):
+        self._directory = directory
+        self.sync_interval = sync_interval or float(os.environ.get('METRICS_SYNC_INTERVAL', 10))
+        self.app = None
+        self._families: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._files: Dict[str, MmapedValues] = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._sync_thread = None
+
+    @property
+    def directory(self) -> str:
+        return self._directory or multiprocess_dir()
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), mode='livesum') -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames, mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            return self._families.setdefault(metric.name, metric)
+
+    def register_collector(self, collector: Callable[[], None]):
+        """Run ``collector`` on every sync to copy process-local stats into metrics"""
+        self._collectors.append(collector)
+        return collector
+
+    # Value files
+
+    def _values(self, kind: str) -> MmapedValues:
+        # Caller holds the lock
+        if self._pid != os.getpid():
+            # Files opened before a fork belong to the parent
+            self._files = {}
+            self._pid = os.getpid()
+        values = self._files.get(kind)
+        if values is None:
+            os.makedirs(self.directory, exist_ok=True)
+            values = self._files[kind] = MmapedValues(os.path.join(self.directory, f"{kind}_{os.getpid()}.db"))
+        return values
+
+    def _add(self, kind: str, key: str, amount: float):
+        try:
+            with self._lock:
+                self._values(kind).add(key, amount)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Dropped metric update: {str(e)}")
+
+    def _set(self, kind: str, key: str, value: float):
+        try:
+            with self._lock:
+                self._values(kind).set(key, value)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Dropped metric update: {str(e)}")
+
+    # Collection
+
+    def start(self):
+        """Start this process's collector sync thread (idempotent, restarted after a fork)"""
+        if self._sync_thread is not None and self._sync_thread.is_alive():
+            return
+        with self._lock:
+            if self._sync_thread is not None and self._sync_thread.is_alive():
+                return
+            self._sync_thread = threading.Thread(target=self._sync_loop, name='metrics-sync', daemon=True)
+            self._sync_thread.start()
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            self.sync()
+
+    def sync(self):
+        for collector in self._collectors:
+            try:
+                if self.app is not None:
+                    with self.app.app_context():
+                        collector()
+                else:
+                    collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {str(e)}")
+
+    def merged(self) -> Dict[Tuple[str, str, str], float]:
+        """(family, sample, labels JSON) -> value across every process's files"""
+        merged: Dict[Tuple[str, str, str], float] = {}
+        for path in glob.glob(os.path.join(self.directory, '*.db')):
+            kind, _, pid = os.path.basename(path)[:-3].rpartition('_')
+            try:
+                pid = int(pid)
+                if kind.startswith('gauge') and not _pid_alive(pid):
+                    continue
+                entries = read_values(path)
+            except (OSError, ValueError, struct.error):
+                continue
+            for key, value in entries:
+                family, sample, labels = json.loads(key)
+                slot = (family, sample, json.dumps(labels, sort_keys=True))
+                if kind == 'gauge_max':
+                    merged[slot] = max(merged.get(slot, value), value)
+                else:
+                    merged[slot] = merged.get(slot, 0.0) + value
+        return merged
+
+    def render(self) -> str:
+        """Prometheus text format (0.0.4) for all workers"""
+        self.sync()
+        by_family: Dict[str, List[Tuple[str, Dict[str, str], float]]] = {}
+        for (family, sample, labels), value in self.merged().items():
+            by_family.setdefault(family, []).append((sample, json.loads(labels), value))
+
+        lines = []
+        for name in sorted(by_family):
+            metric = self._families.get(name)
+            if metric is None:
+                continue
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type_name}")
+            samples = by_family[name]
+            if isinstance(metric, Histogram):
+                lines.extend(self._render_histogram(metric, samples))
+            else:
+                for sample, labels, value in sorted(samples, key=lambda s: sorted(s[1].items())):
+                    lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(metric: Histogram, samples) -> Iterable[str]:
+        series: Dict[str, Dict[str, Any]] = {}
+        for sample, labels, value in samples:
+            le = labels.pop('le', None)
+            entry = series.setdefault(json.dumps(labels, sort_keys=True),
+                                      {'labels': labels, 'buckets': {}, 'sum': 0.0, 'count': 0.0})
+            if sample.endswith('_bucket'):
+                entry['buckets'][le] = value
+            elif sample.endswith('_sum'):
+                entry['sum'] = value
+            else:
+                entry['count'] = value
+        for _, entry in sorted(series.items()):
+            cumulative = 0.0
+            for bound in metric.buckets + (float('inf'),):
+                le = _format_bound(bound)
+                cumulative += entry['buckets'].get(le, 0.0)
+                labels = dict(entry['labels'], le=le)
+                yield f"{metric.name}_bucket{_format_labels(labels)} {_format_value(cumulative)}"
+            yield f"{metric.name}_sum{_format_labels(entry['labels'])} {_format_value(entry['sum'])}"
+            yield f"{metric.name}_count{_format_labels(entry['labels'])} {_format_value(entry['count'])}"
+
+# Global registry and the application's metric families
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter('http_requests_total', 'HTTP requests by endpoint, method and status',
+                            ('endpoint', 'method', 'status'))
+REQUEST_LATENCY = registry.histogram('http_request_duration_seconds', 'HTTP request latency by endpoint',
+                                     ('endpoint', 'method'))
+IN_FLIGHT = registry.gauge('http_requests_in_flight', 'Requests being handled, by blueprint', ('blueprint',))
+REQUEST_QUERIES = registry.histogram('http_request_db_queries', 'Database queries per request',
+                                     ('endpoint',), buckets=(0, 1, 2, 5, 10, 20, 50, 100))
+REQUEST_DB_TIME = registry.histogram('http_request_db_seconds', 'Database time per request', ('endpoint',))
+OUTBOUND_LATENCY = registry.histogram('http_client_request_duration_seconds',
+                                      'Outbound HTTP latency by host and outcome', ('host', 'outcome'))
+
+# Mirrored by collectors
+CACHE_REQUESTS = registry.counter('cache_requests_total', 'Cache lookups by result', ('cache', 'result'))
+CACHE_EVICTIONS = registry.counter('cache_evictions_total', 'Entries evicted to stay within limits', ('cache',))
+CACHE_ENTRIES = registry.gauge('cache_entries', 'Entries in per-process (memory) caches', ('cache',))
+SHARED_CACHE_ENTRIES = registry.gauge('cache_shared_entries', 'Entries in caches shared by the workers',
+                                      ('cache', 'backend'), mode='max')
+DASHBOARD_EVENTS = registry.counter('dashboard_cache_events_total', 'Dashboard lookups, rebuilds and invalidations',
+                                    ('event',))
+OUTBOUND_CONNECTIONS = registry.counter('http_client_connections_opened_total',
+                                        'New outbound TCP connections by host', ('host',))
+BREAKER_STATE = registry.gauge('circuit_breaker_open', 'Circuit state: 0 closed, 1 half-open, 2 open',
+                               ('breaker',), mode='max')
+BREAKER_CALLS = registry.counter('circuit_breaker_calls_total', 'Calls through circuit breakers by result',
+                                 ('breaker', 'result'))
+RETRY_BUDGET = registry.counter('retry_budget_total', 'Requests, retries and exhaustion per retry budget',
+                                ('budget', 'event'))
+RETRY_GIVEUPS = registry.counter('retry_giveups_total', 'Retries abandoned early, by reason', ('reason',))
+DB_POOL_CHECKED_OUT = registry.gauge('db_pool_checked_out', 'Database connections in use')
+SSE_CONNECTIONS = registry.gauge('notification_stream_connections', 'Open notification event streams')
+SSE_EVENTS = registry.counter('notification_stream_events_total', 'Notification events by outcome', ('result',))
+LOG_RECORDS = registry.counter('log_records_total', 'Log records written or dropped by level', ('result', 'level'))
+ERROR_LOGS = registry.counter('error_log_events_total', 'Application errors logged, suppressed as repeats, '
+                              'or summarized', ('result',))
+PROCESS_RSS = registry.gauge('process_resident_memory_bytes', 'Resident memory of the workers')
+PROCESS_FDS = registry.gauge('process_open_fds', 'Open file descriptors of the workers')
+PROCESS_THREADS = registry.gauge('process_threads', 'Threads in the workers')
+PROCESS_CPU = registry.gauge('process_cpu_percent', 'CPU use of the workers since their last sample')
+
+def observe_outbound(host: str, seconds: float, error: bool):
+    OUTBOUND_LATENCY.observe(seconds, host=host, outcome='error' if error else 'ok')
+
+@registry.register_collector
+def _collect_caches():
+    from utils.cache import all_caches
+    totals: Dict[str, Dict[str, Any]] = {}
+    for cache in all_caches():
+        stats = cache.stats()
+        total = totals.setdefault(cache.name, {'backend': stats['backend'], 'hits': 0, 'stale_hits': 0,
+                                               'misses': 0, 'evictions': 0, 'entries': 0})
+        for field in ('hits', 'stale_hits', 'misses', 'evictions', 'entries'):
+            total[field] += stats.get(field, 0)
+    for name, total in totals.items():
+        CACHE_REQUESTS.set_total(total['hits'], cache=name, result='hit')
+        CACHE_REQUESTS.set_total(total['stale_hits'], cache=name, result='stale_hit')
+        CACHE_REQUESTS.set_total(total['misses'], cache=name, result='miss')
+        CACHE_EVICTIONS.set_total(total['evictions'], cache=name)
+        if total['backend'] == 'memory':
+            CACHE_ENTRIES.set(total['entries'], cache=name)
+        else:
+            SHARED_CACHE_ENTRIES.set(total['entries'], cache=name, backend=total['backend'])
+
+@registry.register_collector
+def _collect_dashboard():
+    from utils.dashboard import dashboard_manager
+    stats = dashboard_manager.stats()
+    for event in ('lookups', 'rebuilds', 'invalidations'):
+        DASHBOARD_EVENTS.set_total(stats[event], event=event)
+
+@registry.register_collector
+def _collect_outbound_http():
+    from utils.http_client import http_client
+    for host, stats in http_client.stats()['hosts'].items():
+        OUTBOUND_CONNECTIONS.set_total(stats.get('connections_opened', 0), host=host)
+
+@registry.register_collector
+def _collect_resilience():
+    from utils.retry import resilience_metrics
+    metrics = resilience_metrics()
+    states = {'closed': 0, 'half_open': 1, 'open': 2}
+    for name, breaker in metrics['circuit_breakers'].items():
+        BREAKER_STATE.set(states.get(breaker['state'], 0), breaker=name)
+        for result in ('successes', 'failures', 'rejected'):
+            BREAKER_CALLS.set_total(breaker.get(result, 0), breaker=name, result=result)
+    for name, budget in metrics['retry_budgets'].items():
+        for event, value in budget.items():
+            RETRY_BUDGET.set_total(value, budget=name, event=event)
+    for reason, value in metrics['retries'].items():
+        RETRY_GIVEUPS.set_total(value, reason=reason)
+
+@registry.register_collector
+def _collect_database_pool():
+    from utils.db import db, pool_stats
+    stats = pool_stats(db.engine)
+    if 'checkedout' in stats:
+        DB_POOL_CHECKED_OUT.set(stats['checkedout'])
+
+@registry.register_collector
+def _collect_notification_streams():
+    from utils.notification_stream import notification_broker
+    stats = notification_broker.stats()
+    SSE_CONNECTIONS.set(stats['connections'])
+    for result in ('published', 'delivered', 'dropped', 'rejected'):
+        SSE_EVENTS.set_total(stats[result], result=result)
+
+@registry.register_collector
+def _collect_logging():
+    from utils.log_pipeline import log_pipeline
+    stats = log_pipeline.stats()
+    LOG_RECORDS.set_total(stats['written'], result='written', level='all')
+    for level, dropped in stats['dropped'].items():
+        LOG_RECORDS.set_total(dropped, result='dropped', level=level)
+
+@registry.register_collector
+def _collect_error_logging():
+    from utils.error_handling import error_handler
+    stats = error_handler.stats()
+    for result in ('logged', 'suppressed', 'summaries'):
+        ERROR_LOGS.set_total(stats[result], result=result)
+
+@registry.register_collector
+def _collect_process():
+    from utils.system_metrics import system_metrics
+    samples = system_metrics.samples()
+    if not samples:
+        # Sampler not started in this process; don't take a blocking sample here
+        return
+    latest = samples[-1]
+    PROCESS_THREADS.set(latest['threads'])
+    for gauge, field in ((PROCESS_RSS, 'rss_bytes'), (PROCESS_FDS, 'open_fds'), (PROCESS_CPU, 'cpu_percent')):
+        if latest.get(field) is not None:
+            gauge.set(latest[field])
+
+def init_metrics(app):
+    """Record per-request metrics for ``app`` and serve them at /metrics"""
+    registry.app = app
+
+    @app.before_request
+    def start_request_metrics():
+        registry.start()
+        g.metrics_start = time.perf_counter()
+        g.metrics_blueprint = request.blueprint or 'app'
+        IN_FLIGHT.inc(blueprint=g.metrics_blueprint)
+
+    @app.after_request
+    def record_response_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    # Registered after init_db, so this runs before its teardown drops g.query_stats
+    @app.teardown_request
+    def record_request_metrics(exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        IN_FLIGHT.dec(blueprint=g.pop('metrics_blueprint'))
+        endpoint = request.endpoint or 'unmatched'
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=g.pop('metrics_status', 500))
+        REQUEST_LATENCY.observe(elapsed, endpoint=endpoint, method=request.method)
+        stats = g.get('query_stats')
+        if stats is not None:
+            REQUEST_QUERIES.observe(stats.count, endpoint=endpoint)
+            REQUEST_DB_TIME.observe(stats.seconds, endpoint=endpoint)
+
+    # Denied unless METRICS_TOKEN is set; scrapers send it as a bearer token
+    @app.route('/metrics')
+    def metrics():
+        token = os.environ.get('METRICS_TOKEN')
+        if not token:
+            return Response('Metrics are disabled\n', status=404, mimetype='text/plain')
+        # Compared as bytes: compare_digest raises TypeError on non-ASCII str
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f"Bearer {token}".encode()):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
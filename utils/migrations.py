@@ -0,0 +1,135 @@
+"""
+Schema Migrations
+Ordered, recorded schema changes for databases created before a model change
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select, text
+from sqlalchemy.schema import CreateIndex
+from utils.db import db
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Kept out of db.metadata so create_all never touches it
+_migration_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _migration_metadata,
+    Column('version', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+def ensure_indexes(connection, *names: str):
+    """
+    Create model-declared indexes that are missing from an existing database
+
+    ``db.create_all`` only creates indexes together with new tables, so an
+    index added to a model's ``__table_args__`` also needs a migration
+    listing it here. On PostgreSQL the indexes are built ``CONCURRENTLY`` so
+    writes to the table are not blocked meanwhile; that cannot run inside a
+    transaction, so the calling migration must be ``outside_transaction``.
+    """
+    indexes = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    for name in names:
+        index = indexes[name]
+        if connection.dialect.name == 'postgresql':
+            _create_concurrently(connection, index)
+        else:
+            index.create(connection, checkfirst=True)
+        logger.info(f"Ensured index {name} on {index.table.name}")
+
+def _create_concurrently(connection, index):
+    valid = connection.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {'name': index.name}).scalar()
+    if valid:
+        return
+    if valid is not None:
+        # Left INVALID by an interrupted concurrent build; it is not used and must be rebuilt
+        logger.warning(f"Rebuilding invalid index {index.name}")
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+    options = index.dialect_options['postgresql']
+    options['concurrently'] = True
+    try:
+        connection.execute(CreateIndex(index))
+    finally:
+        del options['concurrently']
+
+def outside_transaction(migration: Callable) -> Callable:
+    """Run ``migration`` on an autocommit connection (for statements like CREATE INDEX CONCURRENTLY)"""
+    migration.transactional = False
+    return migration
+
+@outside_transaction
+def _hot_path_indexes(connection):
+    """Owner + time composite indexes for the list and dashboard queries"""
+    ensure_indexes(
+        connection,
+        'ix_cases_user_id_created_at',
+        'ix_cases_user_id_updated_at',
+        'ix_notifications_user_id_is_read_created_at',
+        'ix_notifications_unread',
+        'ix_evidence_case_id_uploaded_at',
+        'ix_evidence_user_id_uploaded_at',
+        'ix_payments_user_id_created_at',
+    )
+
+def _case_progress_snapshots(connection):
+    """Materialized per-case progress; fill it with ``manage.py rebuild-progress``"""
+    from models.case_progress import CaseProgress
+    CaseProgress.__table__.create(connection, checkfirst=True)
+    logger.info("Ensured table case_progress")
+
+def _case_milestones(connection):
+    """Append-only milestone events, replacing the unused JSON list on cases"""
+    from models.case_milestone import CaseMilestone
+    CaseMilestone.__table__.create(connection, checkfirst=True)
+    logger.info("Ensured table case_milestones")
+
+def _notification_counters(connection):
+    """Per-user unread counters; rows are seeded on first use or by ``manage.py recount-notifications``"""
+    from models.notification import NotificationCounter
+    NotificationCounter.__table__.create(connection, checkfirst=True)
+    logger.info("Ensured table notification_counters")
+
+# Append only; each entry runs once per database, in order
+MIGRATIONS: List[Tuple[str, Callable]] = [
+    ('0001_hot_path_indexes', _hot_path_indexes),
+    ('0002_case_progress_snapshots', _case_progress_snapshots),
+    ('0003_case_milestones', _case_milestones),
+    ('0004_notification_counters', _notification_counters),
+]
+
+def pending_migrations(engine=None) -> List[str]:
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+    return [version for version, _ in MIGRATIONS if version not in applied]
+
+def _record(connection, version: str):
+    connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+
+def run_migrations(engine=None) -> List[str]:
+    """Apply pending migrations, each in its own transaction unless ``outside_transaction``; returns the versions applied"""
+    engine = engine or db.engine
+    pending = set(pending_migrations(engine))
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version not in pending:
+            continue
+        logger.info(f"Applying migration {version}")
+        if getattr(migration, 'transactional', True):
+            with engine.begin() as connection:
+                migration(connection)
+                _record(connection, version)
+        else:
+            # Not atomic: a rerun after a failure must be safe, which checkfirst-style steps are
+            with engine.connect() as connection:
+                migration(connection.execution_options(isolation_level='AUTOCOMMIT'))
+            with engine.begin() as connection:
+                _record(connection, version)
+        applied.append(version)
+    return applied
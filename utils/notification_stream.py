@@ -0,0 +1,313 @@
+"""
+Notification Stream
+Per-user fan-out of notification events to Server-Sent Event connections
+"""
+
+import os
+import json
+import time
+import queue
+import select
+import socket
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from utils.db import db
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Postgres channel carrying events between workers
+CHANNEL = 'notification_events'
+# pg_notify payloads are capped at 8000 bytes; keep messages well under it
+MAX_MESSAGE_CHARS = 200
+
+_PENDING_EVENTS = 'notification_stream_pending'
+
+def format_event(name: str, data: Any, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Event frame"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+def client_disconnected(environ: Dict[str, Any]) -> Callable[[], bool]:
+    """
+    A check for whether the client behind a WSGI request has hung up
+
+    A closed connection polls readable with nothing left to read. Only
+    gunicorn exposes the socket; elsewhere, and on TLS sockets (which can't
+    be peeked), a dead client is noticed when a write fails instead.
+    """
+    sock = environ.get('gunicorn.socket')
+
+    def check() -> bool:
+        if sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except ValueError:
+            return False
+        except OSError:
+            return True
+
+    return check
+
+class Subscription:
+    """One open stream; events past ``maxsize`` are dropped and the stream resyncs from the database"""
+
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.lagged = False
+
+    def put(self, message: Dict[str, Any]) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.lagged = True
+            return False
+
+class NotificationBroker:
+    """
+    In-process pub/sub for per-user notification events
+
+    ``publish`` queues an event on the writer's session and delivers it
+    only if the transaction commits. On PostgreSQL it rides on pg_notify,
+    which Postgres itself holds until commit, and a listener thread in every
+    worker fans it out to local streams. Elsewhere events reach only the
+    worker that committed them, so streams also re-read the unread counters
+    every ``resync_interval`` seconds.
+
+    Each open stream occupies a gunicorn thread for its whole lifetime, so
+    connections per worker are capped (by default one less than
+    GUNICORN_THREADS, leaving a thread for ordinary requests) and every
+    stream ends after ``max_duration``; EventSource reconnects on its own
+    and resumes from Last-Event-ID. The stream wakes at least every
+    ``heartbeat`` seconds and checks whether the client has gone, so a
+    closed tab gives its thread back within one heartbeat.
+    """
+
+    def __init__(self, max_connections: int = None, queue_size: int = None, heartbeat: float = None,
+                 max_duration: float = None, resync_interval: float = None):
+        threads = int(os.environ.get('GUNICORN_THREADS', 2))
+        self.max_connections = max_connections if max_connections is not None else \
+            int(os.environ.get('SSE_MAX_CONNECTIONS', max(1, threads - 1)))
+        self.queue_size = queue_size or int(os.environ.get('SSE_QUEUE_SIZE', 100))
+        self.heartbeat = heartbeat or float(os.environ.get('SSE_HEARTBEAT', 5))
+        self.max_duration = max_duration or float(os.environ.get('SSE_MAX_DURATION', 300))
+        self.resync_interval = resync_interval or float(os.environ.get('SSE_RESYNC_INTERVAL', 60))
+        self.retry_ms = int(os.environ.get('SSE_RETRY_MS', 3000))
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._connections = 0
+        self._listener = None
+        self._listener_pid = None
+        self._listening = threading.Event()
+        self._stats = {'published': 0, 'delivered': 0, 'dropped': 0, 'rejected': 0}
+
+    # Publishing
+
+    def publish(self, user_id: int, name: str, data: Any, event_id: Optional[int] = None, session=None):
+        """Queue an event for ``user_id``'s streams; it is delivered when ``session`` commits"""
+        session = session or db.session
+        message = {'user_id': user_id, 'event': name, 'data': data, 'id': event_id}
+        with self._lock:
+            self._stats['published'] += 1
+        if session.get_bind().dialect.name == 'postgresql':
+            session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                            {'channel': CHANNEL, 'payload': json.dumps(message, default=str)})
+        else:
+            session.info.setdefault(_PENDING_EVENTS, []).append(message)
+
+    def deliver(self, message: Dict[str, Any]):
+        """Hand a committed event to this worker's streams for its user"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(message['user_id'], ()))
+        for subscription in subscribers:
+            delivered = subscription.put(message)
+            with self._lock:
+                self._stats['delivered' if delivered else 'dropped'] += 1
+
+    # Connections
+
+    def subscribe(self, user_id: int) -> Optional[Subscription]:
+        """Register a stream for ``user_id``; None when this worker is at its connection cap"""
+        with self._lock:
+            if self._connections >= self.max_connections:
+                self._stats['rejected'] += 1
+                return None
+            subscription = Subscription(user_id, self.queue_size)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._connections += 1
+        self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._connections -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    @property
+    def cross_process(self) -> bool:
+        """True while the Postgres listener is delivering other workers' events"""
+        return self._listening.is_set() and self._listener_pid == os.getpid()
+
+    def stream(self, subscription: Subscription, last_event_id: Optional[int],
+               load_counts: Callable[[], Dict[str, int]],
+               load_missed: Callable[[int], List[Dict[str, Any]]],
+               disconnected: Callable[[], bool] = None) -> Iterator[str]:
+        """
+        Event frames for one connection
+
+        Sends the current counts (plus anything after ``last_event_id``) on
+        connect, then pushed events, a comment heartbeat when idle and a
+        resync whenever the subscription dropped events. Ends early once
+        ``disconnected`` reports the client gone.
+        """
+        last_id = last_event_id
+        last_counts = None
+
+        def resync(force_counts=True):
+            nonlocal last_id, last_counts
+            counts = load_counts()
+            if last_id is not None and (last_counts is None or counts['total_count'] != last_counts['total_count']):
+                for item in load_missed(last_id):
+                    last_id = item['id']
+                    yield format_event('notification', item, item['id'])
+            if force_counts or counts != last_counts:
+                yield format_event('unread', counts)
+            last_counts = counts
+
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            yield from resync()
+            now = time.monotonic()
+            deadline = now + self.max_duration
+            next_resync = now + self.resync_interval
+            while now < deadline:
+                wait = min(self.heartbeat, deadline - now)
+                if not self.cross_process:
+                    wait = min(wait, max(0.0, next_resync - now))
+                try:
+                    message = subscription.queue.get(timeout=wait)
+                except queue.Empty:
+                    message = None
+                now = time.monotonic()
+                if disconnected is not None and disconnected():
+                    break
+
+                if subscription.lagged:
+                    subscription.lagged = False
+                    yield from resync()
+                elif message is not None:
+                    if message['id'] is not None:
+                        last_id = message['id']
+                    if message['event'] == 'unread':
+                        last_counts = message['data']
+                    yield format_event(message['event'], message['data'], message['id'])
+                elif not self.cross_process and now >= next_resync:
+                    yield from resync(force_counts=False)
+                    next_resync = now + self.resync_interval
+                else:
+                    yield ": heartbeat\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    # Postgres LISTEN
+
+    def _ensure_listener(self):
+        if self._listener_pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+            return
+        try:
+            engine = db.engine
+        except RuntimeError:
+            return
+        if engine.dialect.name != 'postgresql':
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+                return
+            self._listening.clear()
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, args=(engine,),
+                                              name='notification-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self, engine):
+        backoff = 1.0
+        while True:
+            connection = None
+            try:
+                # Detached from the pool: this connection sits in LISTEN for the life of the worker
+                raw = engine.raw_connection()
+                raw.detach()
+                connection = raw.driver_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                self._listening.set()
+                self._mark_all_lagged()  # anything sent while we weren't listening is gone
+                backoff = 1.0
+                logger.info(f"Listening for notification events on {CHANNEL}")
+                while True:
+                    if select.select([connection], [], [], self.heartbeat) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        try:
+                            self.deliver(json.loads(notify.payload))
+                        except (ValueError, KeyError) as e:
+                            logger.warning(f"Ignoring malformed notification event: {str(e)}")
+            except Exception as e:
+                self._listening.clear()
+                logger.error(f"Notification listener failed, reconnecting in {backoff:.0f}s: {str(e)}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _mark_all_lagged(self):
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group]
+        for subscription in subscribers:
+            subscription.lagged = True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': 'postgres' if self.cross_process else 'local',
+                'connections': self._connections,
+                'max_connections': self.max_connections,
+                **self._stats
+            }
+
+# Global notification broker
+notification_broker = NotificationBroker()
+
+# Local delivery
+#
+# Without pg_notify, events wait in session.info until the transaction
+# commits, so a rolled-back notification is never pushed.
+
+@event.listens_for(Session, 'after_commit')
+def _deliver_pending_events(session):
+    for message in session.info.pop(_PENDING_EVENTS, ()):
+        notification_broker.deliver(message)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_events(session):
+    session.info.pop(_PENDING_EVENTS, None)
@@ -1,7 +1,15 @@
-from utils.db import db
-from models.notification import Notification, NotificationType, NotificationPriority
+import logging
+from utils.db import db, has_table
+from models.notification import Notification, NotificationCounter, NotificationType, NotificationPriority
+from utils.notification_stream import MAX_MESSAGE_CHARS, notification_broker
 from datetime import datetime, timedelta
 from enum import Enum as PyEnum
+from typing import Dict, Iterable, Optional
+from sqlalchemy import case, false, func, select, true, update
+from sqlalchemy.exc import IntegrityError
+
+# Initialize logger
+logger = logging.getLogger(__name__)
 
 class DeadlineType(PyEnum):  # Added enum
     """Types of deadlines for notifications"""
@@ -11,10 +19,50 @@ class DeadlineType(PyEnum):  # Added enum
     EVIDENCE_SUBMISSION = "evidence_submission"
     CASE_MILESTONE = "case_milestone"
 
+# Counter columns; each is the number of matching notifications for the user
+COUNTER_FIELDS = ('total_count', 'unread_count', 'urgent_count', 'high_count', 'deadline_count')
+
+def _counts(is_read, priority, notification_type) -> Dict[str, int]:
+    """What one notification contributes to each counter"""
+    unread = 0 if is_read else 1
+    return {
+        'total_count': 1,
+        'unread_count': unread,
+        'urgent_count': unread if priority == NotificationPriority.URGENT else 0,
+        'high_count': unread if priority == NotificationPriority.HIGH else 0,
+        'deadline_count': unread if notification_type == NotificationType.HEARING_REMINDER else 0
+    }
+
 class NotificationManager:
-    """Manages notification creation and delivery"""
-    
-    def create_notification(self, user_id, title, message, notif_type, priority=NotificationPriority.MEDIUM, case_id=None):
+    """
+    Manages notification creation and delivery
+
+    Badge and summary reads come from the ``notification_counters`` row of
+    the user instead of counting the notifications table. Every write below
+    adjusts that row by a delta in the same transaction as the notification
+    change, and state changes go through guarded UPDATE/DELETE ... RETURNING
+    statements so concurrent requests (two tabs marking the same item read)
+    are only counted once. Notifications must therefore be created, read and
+    deleted through this manager; ``recount`` repairs counters otherwise.
+    """
+
+    # Streaming payload for one notification; kept small enough for pg_notify
+    @staticmethod
+    def to_event(notification) -> Dict:
+        message = notification.message or ''
+        return {
+            'id': notification.id,
+            'title': notification.title,
+            'message': message[:MAX_MESSAGE_CHARS] + ('...' if len(message) > MAX_MESSAGE_CHARS else ''),
+            'type': notification.notification_type.value,
+            'priority': (notification.priority or NotificationPriority.MEDIUM).value,
+            'created_at': notification.created_at.isoformat() if notification.created_at else None,
+            'case_id': notification.related_case_id,
+            'action_url': notification.action_url
+        }
+
+    def create_notification(self, user_id, title, message, notif_type, priority=NotificationPriority.MEDIUM,
+                            case_id=None, action_url=None):
         """Create and save a notification"""
         notification = Notification(
             user_id=user_id,
@@ -22,12 +70,17 @@ class NotificationManager:
             message=message,
             notification_type=notif_type,
             priority=priority,
-            related_case_id=case_id
+            related_case_id=case_id,
+            action_url=action_url
         )
         db.session.add(notification)
+        db.session.flush()
+        self._adjust(user_id, _counts(False, priority, notif_type))
+        notification_broker.publish(user_id, 'notification', self.to_event(notification), notification.id)
+        self._publish_counts([user_id])
         db.session.commit()
         return notification
-    
+
     def send_reminder(self, user_id, deadline_type, deadline_date, case_id=None):
         """Send deadline reminder notification"""
         title = f"Reminder: {deadline_type.value.replace('_', ' ').title()}"
@@ -40,15 +93,188 @@ class NotificationManager:
             priority=NotificationPriority.HIGH,
             case_id=case_id
         )
-    
+
     def mark_as_read(self, notification_id):
         """Mark notification as read"""
-        notification = Notification.query.get(notification_id)
-        if notification:
-            notification.is_read = True
+        return self._mark_read(Notification.id == notification_id) is not None
+
+    def mark_notification_read(self, notification_id, user_id):
+        """Mark one of ``user_id``'s notifications as read; False if it isn't theirs"""
+        marked = self._mark_read(Notification.id == notification_id, Notification.user_id == user_id)
+        if marked == 0:
+            # Already read is fine; someone else's (or a missing) notification isn't
+            return db.session.query(
+                Notification.query.filter_by(id=notification_id, user_id=user_id).exists()).scalar()
+        return marked is not None
+
+    def mark_all_read(self, user_id):
+        """Mark every unread notification of ``user_id`` as read"""
+        return self._mark_read(Notification.user_id == user_id) is not None
+
+    def delete_notification(self, notification_id, user_id):
+        """Delete one of ``user_id``'s notifications"""
+        table = Notification.__table__
+        try:
+            rows = db.session.execute(
+                table.delete().where(table.c.id == notification_id, table.c.user_id == user_id).returning(
+                    table.c.user_id, table.c.is_read, table.c.priority, table.c.notification_type)
+            ).all()
+            self._apply_removed(rows)
+            self._publish_counts({row.user_id for row in rows})
+            db.session.commit()
+            return bool(rows)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to delete notification {notification_id}: {str(e)}")
+            return False
+
+    def cleanup_old_notifications(self, days_old=30):
+        """Delete read notifications older than ``days_old`` days; returns how many were removed"""
+        table = Notification.__table__
+        cutoff = datetime.utcnow() - timedelta(days=days_old)
+        rows = db.session.execute(
+            table.delete().where(table.c.is_read == true(), table.c.created_at < cutoff).returning(
+                table.c.user_id, table.c.is_read, table.c.priority, table.c.notification_type)
+        ).all()
+        self._apply_removed(rows)
+        db.session.commit()
+        return len(rows)
+
+    def get_user_notifications(self, user_id, unread_only=False, limit=20):
+        """Newest notifications of ``user_id``"""
+        query = Notification.query.filter_by(user_id=user_id)
+        if unread_only:
+            query = query.filter_by(is_read=False)
+        return query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit).all()
+
+    def get_notifications_since(self, user_id, last_id, limit=50):
+        """Notifications created after ``last_id``, oldest first, for resuming a stream"""
+        notifications = Notification.query.filter(
+            Notification.user_id == user_id, Notification.id > last_id
+        ).order_by(Notification.id).limit(limit).all()
+        return [self.to_event(notification) for notification in notifications]
+
+    def get_notification_summary(self, user_id) -> Dict[str, int]:
+        """Counters for badges and the notification list header; one primary-key read"""
+        if not has_table(db.session, NotificationCounter.__tablename__):
+            return self._count(user_id)
+        summary = self._read_counters(user_id)
+        if summary is not None:
+            return summary
+        # First read for this user: seed the row from one count of their notifications
+        summary = self._seed(user_id)
+        db.session.commit()
+        return summary if summary is not None else self.get_notification_summary(user_id)
+
+    def get_unread_count(self, user_id) -> int:
+        return self.get_notification_summary(user_id)['unread_count']
+
+    def recount(self, user_ids: Optional[Iterable[int]] = None) -> int:
+        """Rebuild counters from the notifications table (all users by default); returns rows written"""
+        user_ids = list(user_ids) if user_ids is not None else \
+            db.session.execute(select(Notification.user_id).distinct()).scalars().all()
+        table = NotificationCounter.__table__
+        for user_id in user_ids:
+            db.session.execute(table.delete().where(table.c.user_id == user_id))
+            self._seed(user_id)
+        db.session.commit()
+        return len(user_ids)
+
+    def _mark_read(self, *criteria):
+        """Flip matching unread rows to read and take them off the counters; None on failure"""
+        table = Notification.__table__
+        try:
+            rows = db.session.execute(
+                update(table).where(*criteria, table.c.is_read == false()).values(is_read=True).returning(
+                    table.c.user_id, table.c.priority, table.c.notification_type)
+            ).all()
+            by_user = {}
+            for row in rows:
+                delta = by_user.setdefault(row.user_id, dict.fromkeys(COUNTER_FIELDS, 0))
+                for field, value in _counts(False, row.priority, row.notification_type).items():
+                    if field != 'total_count':
+                        delta[field] -= value
+            for user_id, delta in by_user.items():
+                self._adjust(user_id, delta)
+            self._mark_stale(by_user)
+            self._publish_counts(by_user)
             db.session.commit()
-            return True
-        return False
+            return len(rows)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to mark notifications read: {str(e)}")
+            return None
+
+    def _apply_removed(self, rows):
+        by_user = {}
+        for row in rows:
+            delta = by_user.setdefault(row.user_id, dict.fromkeys(COUNTER_FIELDS, 0))
+            for field, value in _counts(row.is_read, row.priority, row.notification_type).items():
+                delta[field] -= value
+        for user_id, delta in by_user.items():
+            self._adjust(user_id, delta)
+        self._mark_stale(by_user)
+
+    def _read_counters(self, user_id) -> Optional[Dict[str, int]]:
+        table = NotificationCounter.__table__
+        row = db.session.execute(
+            select(*(table.c[field] for field in COUNTER_FIELDS)).where(table.c.user_id == user_id)
+        ).first()
+        return dict(row._mapping) if row is not None else None
+
+    def _publish_counts(self, user_ids):
+        """Push each user's counters as they stand in this transaction; sent on commit"""
+        for user_id in user_ids:
+            summary = self._read_counters(user_id) if has_table(db.session, NotificationCounter.__tablename__) else None
+            notification_broker.publish(user_id, 'unread', summary or self._count(user_id))
+
+    def _mark_stale(self, user_ids):
+        # Core UPDATE/DELETE statements bypass the session hooks that invalidate dashboards
+        if user_ids:
+            from utils.dashboard import mark_dashboard_stale
+            mark_dashboard_stale(db.session, user_ids)
+
+    def _adjust(self, user_id, delta: Dict[str, int]):
+        """Add ``delta`` to the user's counter row, seeding the row if it doesn't exist yet"""
+        if not any(delta.values()) or not has_table(db.session, NotificationCounter.__tablename__):
+            return
+        table = NotificationCounter.__table__
+        values = {field: table.c[field] + amount for field, amount in delta.items() if amount}
+        result = db.session.execute(
+            update(table).where(table.c.user_id == user_id).values(updated_at=datetime.utcnow(), **values)
+        )
+        if result.rowcount == 0 and self._seed(user_id) is None:
+            # Seeded concurrently; that count can't see our uncommitted change, so add it now
+            db.session.execute(
+                update(table).where(table.c.user_id == user_id).values(updated_at=datetime.utcnow(), **values)
+            )
+
+    def _seed(self, user_id) -> Optional[Dict[str, int]]:
+        """Insert the counter row for ``user_id`` from a count of their notifications; None if it exists"""
+        summary = self._count(user_id)
+        try:
+            with db.session.begin_nested():
+                db.session.execute(NotificationCounter.__table__.insert().values(
+                    user_id=user_id, updated_at=datetime.utcnow(), **summary))
+        except IntegrityError:
+            logger.debug(f"Notification counters for user {user_id} seeded concurrently")
+            return None
+        return summary
+
+    def _count(self, user_id) -> Dict[str, int]:
+        unread = Notification.is_read == false()
+
+        def unread_where(condition):
+            return func.coalesce(func.sum(case((unread & condition, 1), else_=0)), 0)
+
+        row = db.session.query(
+            func.count(Notification.id).label('total_count'),
+            unread_where(true()).label('unread_count'),
+            unread_where(Notification.priority == NotificationPriority.URGENT).label('urgent_count'),
+            unread_where(Notification.priority == NotificationPriority.HIGH).label('high_count'),
+            unread_where(Notification.notification_type == NotificationType.HEARING_REMINDER).label('deadline_count')
+        ).filter(Notification.user_id == user_id).one()
+        return {field: int(getattr(row, field)) for field in COUNTER_FIELDS}
 
 # Global notification manager instance
-notification_manager = NotificationManager()
\ No newline at end of file
+notification_manager = NotificationManager()
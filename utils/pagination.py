@@ -0,0 +1,130 @@
+"""
+Keyset Pagination
+Cursor-based paging over (timestamp, id) so deep pages cost the same as the first
+"""
+
+import json
+import base64
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from flask import request, abort
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.types import DateTime
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+class CursorError(ValueError):
+    """Raised for cursors that are malformed or do not match the ordering"""
+    pass
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque, URL-safe cursor for the sort key of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str, columns) -> List[Any]:
+    """Decode a cursor back into typed sort-key values for ``columns``"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"Invalid cursor: {str(e)}")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise CursorError("Invalid cursor: wrong number of values")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise CursorError("Invalid cursor: bad timestamp")
+        decoded.append(value)
+    return decoded
+
+class KeysetPage:
+    """One page of results plus the cursor for the next one"""
+
+    def __init__(self, items: List[Any], next_cursor: Optional[str], limit: int):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.limit = limit
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def to_dict(self, serialize: Callable[[Any], Dict[str, Any]], key: str = 'items') -> Dict[str, Any]:
+        """JSON body with the serialized items under ``key``"""
+        return {
+            key: [serialize(item) for item in self.items],
+            'next_cursor': self.next_cursor,
+            'has_next': self.has_next,
+            'limit': self.limit
+        }
+
+def _after(columns, values, descending, dialect: Optional[str] = None):
+    """
+    WHERE clause selecting rows strictly after ``values`` in (col1, col2, ...) order
+
+    PostgreSQL seeks an index directly on a row-value comparison. Elsewhere
+    the expanded OR needs the redundant bound on the first column: without
+    it the planner cannot start a range seek and filters every newer row.
+    """
+    if dialect == 'postgresql':
+        return tuple_(*columns) < tuple_(*values) if descending else tuple_(*columns) > tuple_(*values)
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        step = column < value if descending else column > value
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], step))
+    bound = columns[0] <= values[0] if descending else columns[0] >= values[0]
+    return and_(bound, or_(*clauses))
+
+def paginate_keyset(query, columns, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                    descending: bool = True) -> KeysetPage:
+    """
+    Return one page of ``query`` ordered by ``columns``
+
+    ``columns`` must end with a unique column (normally the primary key) so
+    the ordering is total; for most lists it is ``(Model.created_at, Model.id)``.
+    The page is fetched with ``LIMIT limit + 1`` after a seek predicate on
+    the cursor, so it stays an index range scan however deep the page is.
+    Any existing ORDER BY on ``query`` is replaced.
+    """
+    columns = list(columns)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        dialect = query.session.get_bind().dialect.name
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending, dialect))
+    ordering = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(None).order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return KeysetPage(rows, next_cursor, limit)
+
+def paginate_request(query, columns, default_limit: int = DEFAULT_PAGE_SIZE,
+                     descending: bool = True) -> KeysetPage:
+    """``paginate_keyset`` driven by the ``cursor`` and ``limit`` query string arguments"""
+    limit = request.args.get('limit', default_limit, type=int)
+    try:
+        return paginate_keyset(query, columns, request.args.get('cursor'), limit, descending)
+    except CursorError as e:
+        abort(400, description=str(e))
+
+def wants_json() -> bool:
+    """Whether a list view should answer with JSON instead of HTML"""
+    if request.args.get('format') == 'json' or request.is_json:
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'application/json' and request.accept_mimetypes[best] > request.accept_mimetypes['text/html']
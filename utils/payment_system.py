@@ -6,6 +6,7 @@ Handles e-transfer payments for Canadian legal services
 import logging
 from datetime import datetime
 from utils.db import db  # Corrected import
+from utils.pagination import paginate_keyset, DEFAULT_PAGE_SIZE
 from models.payment import Payment, PaymentStatus
 
 # Initialize logger
@@ -48,9 +49,10 @@ class PaymentManager:
         """Get payment by ID"""
         return Payment.query.get(payment_id)
     
-    def get_user_payments(self, user_id):
-        """Get all payments for a user"""
-        return Payment.query.filter_by(user_id=user_id).all()
+    def get_user_payments(self, user_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Get one page of a user's payments, newest first"""
+        return paginate_keyset(Payment.query.filter_by(user_id=user_id),
+                               (Payment.created_at, Payment.id), cursor, limit)
 
 # Global payment manager instance
 payment_manager = PaymentManager()
\ No newline at end of file
@@ -1,21 +1,327 @@
 """
-Robust retry mechanism with exponential backoff and jitter
+Robust retry mechanism with exponential backoff and jitter, circuit breakers,
+retry budgets and request deadlines
 """
 import time
 import random
+import asyncio
 import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
 from functools import wraps
-from typing import Callable, Optional, Tuple, Type
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union
 
 logger = logging.getLogger(__name__)
 
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+    pass
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the current request's deadline has passed"""
+    pass
+
+# Deadlines
+
+_deadline = contextvars.ContextVar('retry_deadline', default=None)
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Bound the remaining work in this context to ``seconds``
+
+    Nested deadlines never extend an outer one. ``retry`` and ``async_retry``
+    stop retrying once the next attempt could not start before the deadline.
+    """
+    if seconds is None:
+        yield
+        return
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires_at if current is None else min(current, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def set_deadline(seconds: Optional[float]):
+    """Start a deadline without a ``with`` block; pass the token to ``clear_deadline``"""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+def clear_deadline(token):
+    _deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none"""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return max(0.0, expires_at - time.monotonic())
+
+# Circuit breakers
+
+class CircuitBreaker:
+    """
+    Per-dependency circuit breaker
+
+    Closed: calls pass through and consecutive failures are counted. After
+    ``failure_threshold`` failures the circuit opens and calls fail fast with
+    ``CircuitOpenError`` for ``recovery_timeout`` seconds. It then goes
+    half-open and lets ``half_open_max_calls`` trial calls through; a success
+    closes it again and a failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, exceptions: Tuple[Type[Exception], ...] = (Exception,)):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.exceptions = exceptions
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.metrics = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'rejected': 0,
+            'transitions': {}
+        }
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now; counts it as in flight when half-open"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self.metrics['rejected'] += 1
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self.metrics['rejected'] += 1
+                    return False
+                self._half_open_calls += 1
+            self.metrics['calls'] += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.metrics['successes'] += 1
+            self._failures = 0
+            if self.state == self.HALF_OPEN:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.metrics['failures'] += 1
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call ``func`` through the breaker"""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        try:
+            result = func(*args, **kwargs)
+        except self.exceptions:
+            self.record_failure()
+            raise
+        except BaseException:
+            self._release_trial()
+            raise
+        self.record_success()
+        return result
+
+    def __call__(self, func: Callable):
+        """Use the breaker as a decorator"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self.metrics, transitions=dict(self.metrics['transitions']))
+            return dict(metrics, state=self.state, consecutive_failures=self._failures)
+
+    def _release_trial(self):
+        # An exception outside ``exceptions`` says nothing about the dependency
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def _transition(self, state: str):
+        """Change state; caller holds the lock"""
+        previous, self.state = self.state, state
+        key = f"{previous}->{state}"
+        self.metrics['transitions'][key] = self.metrics['transitions'].get(key, 0) + 1
+        self._half_open_calls = 0
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+            logger.warning(f"Circuit '{self.name}' opened after {self._failures} failure(s)")
+        else:
+            self._failures = 0
+            logger.info(f"Circuit '{self.name}' {previous} -> {state}")
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Get the process-wide breaker for a dependency, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+# Retry budgets
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent requests to a dependency
+
+    Over a sliding ``window`` of seconds, a retry is allowed while retries
+    stay below ``ratio`` times the first attempts plus ``min_retries``, so a
+    degraded dependency sees at most ``1 + ratio`` times its normal load.
+    """
+
+    def __init__(self, name: str, ratio: float = 0.2, min_retries: int = 10, window: float = 10.0):
+        self.name = name
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self.metrics = {'requests': 0, 'retries': 0, 'exhausted': 0}
+
+    def record_request(self):
+        with self._lock:
+            self._requests.append(time.monotonic())
+            self.metrics['requests'] += 1
+
+    def try_retry(self) -> bool:
+        """Reserve a retry if the budget allows one"""
+        with self._lock:
+            now = time.monotonic()
+            for events in (self._requests, self._retries):
+                while events and events[0] < now - self.window:
+                    events.popleft()
+            if len(self._retries) >= len(self._requests) * self.ratio + self.min_retries:
+                self.metrics['exhausted'] += 1
+                return False
+            self._retries.append(now)
+            self.metrics['retries'] += 1
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.metrics)
+
+_budgets: Dict[str, RetryBudget] = {}
+
+def get_retry_budget(name: str, **kwargs) -> RetryBudget:
+    """Get the process-wide retry budget for a dependency, creating it on first use"""
+    with _breakers_lock:
+        budget = _budgets.get(name)
+        if budget is None:
+            budget = _budgets[name] = RetryBudget(name, **kwargs)
+        return budget
+
+_retry_metrics = {'deadline_exceeded': 0, 'circuit_open': 0}
+
+def resilience_metrics() -> Dict[str, Any]:
+    """Breaker states and transition counts, budgets and retry give-ups, for /metrics"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+        budgets = list(_budgets.values())
+        retries = dict(_retry_metrics)
+    return {
+        'circuit_breakers': {breaker.name: breaker.snapshot() for breaker in breakers},
+        'retry_budgets': {budget.name: budget.snapshot() for budget in budgets},
+        'retries': retries
+    }
+
+def _count_giveup(reason: str):
+    with _breakers_lock:
+        _retry_metrics[reason] += 1
+
+def _resolve(breaker, budget):
+    if isinstance(breaker, str):
+        breaker = get_breaker(breaker)
+    if isinstance(budget, str):
+        budget = get_retry_budget(budget)
+    return breaker, budget
+
+def _next_delay(func_name, attempt, error, max_retries, circuit, budget, delay_args) -> Optional[float]:
+    """Delay before the next attempt, or None if we should give up and re-raise"""
+    if circuit is not None and circuit.state == CircuitBreaker.OPEN:
+        _count_giveup('circuit_open')
+        logger.warning(f"Not retrying {func_name}: circuit '{circuit.name}' is open")
+        return None
+    if attempt > max_retries:
+        logger.error(f"Max retries exceeded for {func_name}: {str(error)}")
+        return None
+
+    delay = compute_delay(attempt, *delay_args)
+    remaining = remaining_time()
+    if remaining is not None and delay >= remaining:
+        _count_giveup('deadline_exceeded')
+        logger.warning(f"Not retrying {func_name}: {remaining:.2f}s left before the request deadline")
+        return None
+    if budget is not None and not budget.try_retry():
+        logger.warning(f"Not retrying {func_name}: retry budget '{budget.name}' exhausted")
+        return None
+
+    logger.warning(
+        f"Attempt #{attempt} failed for {func_name}: {str(error)}. "
+        f"Retrying in {delay:.2f}s..."
+    )
+    return delay
+
+def _check_deadline(func_name):
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        _count_giveup('deadline_exceeded')
+        raise DeadlineExceeded(f"Request deadline passed before calling {func_name}")
+
+def compute_delay(
+    attempt: int,
+    initial_delay: float = 1.0,
+    max_delay: float = 60.0,
+    backoff_factor: float = 2.0,
+    jitter: float = 0.1
+) -> float:
+    """
+    Delay before retry number ``attempt`` (1-based) with exponential backoff and jitter
+    
+    Shared by the ``retry`` decorator and the background job queue so both back
+    off the same way.
+    """
+    delay = initial_delay * (backoff_factor ** (attempt - 1))
+    jitter_amount = delay * jitter * random.uniform(-1, 1)
+    return max(0.0, min(max_delay, delay + jitter_amount))
+
 def retry(
     exceptions: Tuple[Type[Exception]] = (Exception,),
     max_retries: int = 5,
     initial_delay: float = 1.0,
     max_delay: float = 60.0,
     backoff_factor: float = 2.0,
-    jitter: float = 0.1
+    jitter: float = 0.1,
+    breaker: Union[str, CircuitBreaker, None] = None,
+    budget: Union[str, RetryBudget, None] = None
 ):
     """
     Decorator for retrying a function with exponential backoff and jitter
@@ -27,33 +333,89 @@ def retry(
         max_delay: Maximum delay in seconds
         backoff_factor: Multiplier for exponential backoff
         jitter: Random jitter factor (0-1)
+        breaker: Circuit breaker (or dependency name) guarding each attempt
+        budget: Retry budget (or dependency name) that retries must fit in
+    
+    Retries stop early when the circuit is open, the budget is spent, or the
+    next attempt would start after the current ``deadline``.
     """
     def decorator(func: Callable):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            circuit, retry_budget = _resolve(breaker, budget)
+            if retry_budget is not None:
+                retry_budget.record_request()
             retries = 0
-            delay = initial_delay
             
-            while retries <= max_retries:
+            while True:
+                _check_deadline(func.__name__)
                 try:
+                    if circuit is not None:
+                        return circuit.call(func, *args, **kwargs)
                     return func(*args, **kwargs)
+                except CircuitOpenError:
+                    _count_giveup('circuit_open')
+                    raise
                 except exceptions as e:
                     retries += 1
-                    if retries > max_retries:
-                        logger.error(f"Max retries exceeded for {func.__name__}: {str(e)}")
+                    actual_delay = _next_delay(func.__name__, retries, e, max_retries, circuit, retry_budget,
+                                               (initial_delay, max_delay, backoff_factor, jitter))
+                    if actual_delay is None:
                         raise
                     
-                    # Calculate delay with jitter
-                    jitter_amount = delay * jitter * random.uniform(-1, 1)
-                    actual_delay = min(max_delay, delay + jitter_amount)
+                    time.sleep(actual_delay)
                     
-                    logger.warning(
-                        f"Attempt #{retries} failed for {func.__name__}: {str(e)}. "
-                        f"Retrying in {actual_delay:.2f}s..."
-                    )
+        return wrapper
+    return decorator
+
+def async_retry(
+    exceptions: Tuple[Type[Exception]] = (Exception,),
+    max_retries: int = 5,
+    initial_delay: float = 1.0,
+    max_delay: float = 60.0,
+    backoff_factor: float = 2.0,
+    jitter: float = 0.1,
+    breaker: Union[str, CircuitBreaker, None] = None,
+    budget: Union[str, RetryBudget, None] = None
+):
+    """
+    ``retry`` for coroutine functions; waits with ``asyncio.sleep`` so the
+    event loop keeps running between attempts
+    """
+    def decorator(func: Callable):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            circuit, retry_budget = _resolve(breaker, budget)
+            if retry_budget is not None:
+                retry_budget.record_request()
+            retries = 0
+            
+            while True:
+                _check_deadline(func.__name__)
+                if circuit is not None and not circuit.allow():
+                    _count_giveup('circuit_open')
+                    raise CircuitOpenError(f"Circuit '{circuit.name}' is open")
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException as e:
+                    if circuit is not None:
+                        if isinstance(e, circuit.exceptions):
+                            circuit.record_failure()
+                        else:
+                            circuit._release_trial()
+                    if not isinstance(e, exceptions):
+                        raise
+                    retries += 1
+                    actual_delay = _next_delay(func.__name__, retries, e, max_retries, circuit, retry_budget,
+                                               (initial_delay, max_delay, backoff_factor, jitter))
+                    if actual_delay is None:
+                        raise
                     
-                    time.sleep(actual_delay)
-                    delay *= backoff_factor
+                    await asyncio.sleep(actual_delay)
+                    continue
+                if circuit is not None:
+                    circuit.record_success()
+                return result
                     
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
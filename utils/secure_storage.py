@@ -1,17 +1,192 @@
 import functools
-from flask import current_app, g, abort
+from flask import current_app, abort
+from flask_login import current_user
 from models.evidence import Evidence
 from utils.db import db
 import os
+import base64
+import struct
 import logging
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# Segmented stream format (version 1)
+#
+#   header: MAGIC (4) | version (1) | frame size (4, big endian) | nonce prefix (7)
+#   frames: AES-256-GCM(frame plaintext) || tag (16), one per FRAME_SIZE bytes
+#
+# Each frame nonce is nonce prefix (7) | frame counter (4) | final flag (1), and the
+# header is bound to every frame as associated data. The last frame is always
+# encrypted with the final flag set, so truncating or reordering frames fails
+# authentication. Frames have a fixed ciphertext size, which lets readers seek
+# straight to the frame covering any plaintext offset.
+STREAM_MAGIC = b'SDSE'
+STREAM_VERSION = 1
+STREAM_HEADER = struct.Struct('>4sBI7s')
+STREAM_HEADER_SIZE = STREAM_HEADER.size
+STREAM_TAG_SIZE = 16
+DEFAULT_FRAME_SIZE = 64 * 1024
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+_FRAME_NONCE = struct.Struct('>7sIB')
+
+
+class StreamFormatError(ValueError):
+    """Raised when an encrypted stream is malformed or fails authentication"""
+    pass
+
+
+def derive_stream_key(encryption_key):
+    """Derive the AES-256-GCM stream key from the configured Fernet key"""
+    if isinstance(encryption_key, str):
+        encryption_key = encryption_key.encode('utf-8')
+    raw_key = base64.urlsafe_b64decode(encryption_key)
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'smartdispute-evidence-stream-v1',
+    ).derive(raw_key)
+
+
+class StreamEncryptor:
+    """Incrementally encrypts plaintext into the segmented stream format.
+
+    Plaintext is buffered only up to one frame, so memory use is bounded by
+    ``frame_size`` regardless of the total amount written.
+    """
+
+    def __init__(self, key, fileobj, frame_size=DEFAULT_FRAME_SIZE):
+        if not 0 < frame_size <= MAX_FRAME_SIZE:
+            raise ValueError(f"Invalid frame size: {frame_size}")
+        self._aead = AESGCM(key)
+        self._out = fileobj
+        self._frame_size = frame_size
+        self._prefix = os.urandom(7)
+        self._header = STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION, frame_size, self._prefix)
+        self._buffer = bytearray()
+        self._counter = 0
+        self._closed = False
+        self.bytes_written = 0
+        self._out.write(self._header)
+
+    def write(self, data):
+        """Buffer plaintext and flush every complete non-final frame"""
+        if self._closed:
+            raise ValueError("write to closed StreamEncryptor")
+        self._buffer.extend(data)
+        # Keep at least one byte back so the final frame is never emitted early
+        while len(self._buffer) > self._frame_size:
+            chunk = bytes(self._buffer[:self._frame_size])
+            del self._buffer[:self._frame_size]
+            self._write_frame(chunk, final=False)
+        return len(data)
+
+    def close(self):
+        """Emit the authenticated final frame"""
+        if self._closed:
+            return
+        self._write_frame(bytes(self._buffer), final=True)
+        self._buffer = bytearray()
+        self._closed = True
+
+    def _write_frame(self, chunk, final):
+        if self._counter > 0xFFFFFFFF:
+            raise StreamFormatError("Stream too long for frame counter")
+        nonce = _FRAME_NONCE.pack(self._prefix, self._counter, 1 if final else 0)
+        self._out.write(self._aead.encrypt(nonce, chunk, self._header))
+        self._counter += 1
+        self.bytes_written += len(chunk)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+
+
+class StreamDecryptor:
+    """Random-access reader over a file in the segmented stream format"""
+
+    def __init__(self, key, fileobj):
+        self._aead = AESGCM(key)
+        self._in = fileobj
+        self._header = self._in.read(STREAM_HEADER_SIZE)
+        if len(self._header) != STREAM_HEADER_SIZE:
+            raise StreamFormatError("Truncated stream header")
+        magic, version, frame_size, prefix = STREAM_HEADER.unpack(self._header)
+        if magic != STREAM_MAGIC or version != STREAM_VERSION:
+            raise StreamFormatError("Unsupported stream format")
+        if not 0 < frame_size <= MAX_FRAME_SIZE:
+            raise StreamFormatError(f"Invalid frame size: {frame_size}")
+        self.frame_size = frame_size
+        self._prefix = prefix
+
+        self._in.seek(0, os.SEEK_END)
+        body_size = self._in.tell() - STREAM_HEADER_SIZE
+        stored_frame = frame_size + STREAM_TAG_SIZE
+        self.frame_count = -(-body_size // stored_frame)
+        last_frame = body_size - (self.frame_count - 1) * stored_frame
+        if self.frame_count == 0 or last_frame < STREAM_TAG_SIZE:
+            raise StreamFormatError("Truncated stream body")
+        self.plaintext_size = (self.frame_count - 1) * frame_size + last_frame - STREAM_TAG_SIZE
+
+    def read_frame(self, index):
+        """Decrypt and return a single frame"""
+        if not 0 <= index < self.frame_count:
+            raise IndexError(index)
+        final = index == self.frame_count - 1
+        stored_frame = self.frame_size + STREAM_TAG_SIZE
+        self._in.seek(STREAM_HEADER_SIZE + index * stored_frame)
+        if final:
+            length = self.plaintext_size - index * self.frame_size + STREAM_TAG_SIZE
+        else:
+            length = stored_frame
+        data = self._in.read(length)
+        nonce = _FRAME_NONCE.pack(self._prefix, index, 1 if final else 0)
+        try:
+            return self._aead.decrypt(nonce, data, self._header)
+        except Exception:
+            raise StreamFormatError(f"Frame {index} failed authentication")
+
+    def iter_range(self, start=0, end=None):
+        """Yield plaintext for bytes ``start`` to ``end`` inclusive, one frame at a time"""
+        if end is None or end >= self.plaintext_size:
+            end = self.plaintext_size - 1
+        if self.plaintext_size == 0:
+            # Still authenticate the empty final frame
+            self.read_frame(0)
+            return
+        if start > end:
+            return
+        first = start // self.frame_size
+        last = end // self.frame_size
+        for index in range(first, last + 1):
+            frame = self.read_frame(index)
+            base = index * self.frame_size
+            lo = max(start - base, 0)
+            hi = min(end - base + 1, len(frame))
+            yield frame[lo:hi]
+
+
+def is_stream_file(path):
+    """Check whether a file uses the segmented stream format"""
+    with open(path, 'rb') as f:
+        return f.read(len(STREAM_MAGIC)) == STREAM_MAGIC
+
+
 class SecureFileManager:
     """Manages secure file storage with encryption and access control"""
     
+    # Read size for streaming plaintext into the encryptor
+    READ_BLOCK_SIZE = 1024 * 1024
+
     def __init__(self):
         self.encryption_key = current_app.config.get('ENCRYPTION_KEY')
         if not self.encryption_key:
@@ -19,39 +194,87 @@ class SecureFileManager:
         
         # Fernet key must be 32 url-safe base64-encoded bytes.
         # Environment variables are strings, so we need to encode it back to bytes.
+        # Fernet is kept for reading legacy whole-file .enc blobs.
         self.cipher = Fernet(self.encryption_key.encode('utf-8'))
+        self.stream_key = derive_stream_key(self.encryption_key)
+        self.frame_size = current_app.config.get('ENCRYPTION_FRAME_SIZE', DEFAULT_FRAME_SIZE)
     
+    def open_encryptor(self, fileobj):
+        """Return a StreamEncryptor writing to an open binary file"""
+        return StreamEncryptor(self.stream_key, fileobj, self.frame_size)
+
+    def encrypt_stream(self, source, destination):
+        """Encrypt a readable binary stream into a writable one in constant memory"""
+        with self.open_encryptor(destination) as encryptor:
+            for block in iter(lambda: source.read(self.READ_BLOCK_SIZE), b''):
+                encryptor.write(block)
+        return encryptor.bytes_written
+
     def encrypt_file(self, file_path):
         """Encrypt a file and store it securely"""
+        encrypted_path = os.path.join(
+            current_app.config['ENCRYPTED_FOLDER'],
+            os.path.basename(file_path) + '.enc'
+        )
+        temp_path = encrypted_path + '.tmp'
         try:
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-            encrypted_data = self.cipher.encrypt(file_data)
-            
-            # Save encrypted file
-            encrypted_path = os.path.join(
-                current_app.config['ENCRYPTED_FOLDER'],
-                os.path.basename(file_path) + '.enc'
-            )
-            with open(encrypted_path, 'wb') as f:
-                f.write(encrypted_data)
-                
+            with open(file_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                self.encrypt_stream(src, dst)
+            os.replace(temp_path, encrypted_path)
             return encrypted_path
         except Exception as e:
             logger.error(f"File encryption failed: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             raise
     
-    def decrypt_file(self, encrypted_path):
-        """Decrypt a file for authorized access"""
+    def plaintext_size(self, encrypted_path):
+        """Get the decrypted size of an encrypted file without decrypting it"""
+        with open(encrypted_path, 'rb') as f:
+            if f.read(len(STREAM_MAGIC)) != STREAM_MAGIC:
+                return len(self._decrypt_legacy(encrypted_path))
+            f.seek(0)
+            return StreamDecryptor(self.stream_key, f).plaintext_size
+
+    def iter_decrypt(self, encrypted_path, start=0, end=None):
+        """Yield decrypted bytes ``start`` to ``end`` (inclusive) frame by frame.
+
+        Only the frames covering the requested span are read and authenticated.
+        Legacy Fernet blobs are decrypted whole and sliced.
+        """
         try:
             with open(encrypted_path, 'rb') as f:
-                encrypted_data = f.read()
-            decrypted_data = self.cipher.decrypt(encrypted_data)
-            return decrypted_data
+                if f.read(len(STREAM_MAGIC)) != STREAM_MAGIC:
+                    data = self._decrypt_legacy(encrypted_path)
+                    stop = len(data) if end is None else end + 1
+                    yield data[start:stop]
+                    return
+                f.seek(0)
+                decryptor = StreamDecryptor(self.stream_key, f)
+                for chunk in decryptor.iter_range(start, end):
+                    yield chunk
         except Exception as e:
             logger.error(f"File decryption failed: {str(e)}")
             raise
 
+    def decrypt_to(self, encrypted_path, destination):
+        """Decrypt a file into a writable binary stream in constant memory"""
+        written = 0
+        for chunk in self.iter_decrypt(encrypted_path):
+            destination.write(chunk)
+            written += len(chunk)
+        return written
+
+    def decrypt_file(self, encrypted_path):
+        """Decrypt a file for authorized access"""
+        return b''.join(self.iter_decrypt(encrypted_path))
+
+    def _decrypt_legacy(self, encrypted_path):
+        """Decrypt a whole-file Fernet token written before the stream format"""
+        with open(encrypted_path, 'rb') as f:
+            encrypted_data = f.read()
+        return self.cipher.decrypt(encrypted_data)
+
 def require_file_access(func):
     """Decorator to check file access permissions with functools.wraps"""
     @functools.wraps(func)
@@ -64,7 +287,7 @@ def require_file_access(func):
         if not file:
             abort(404, "File not found")
         
-        if file.uploaded_by != g.user.id:
+        if file.user_id != current_user.id:
             abort(403, "Access denied")
         
         return func(*args, **kwargs)
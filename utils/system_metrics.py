@@ -0,0 +1,223 @@
+"""
+System Metrics
+Per-process background sampling of CPU, memory, file descriptors, threads, disk and GC into a ring buffer
+"""
+
+import os
+import gc
+import json
+import time
+import glob
+import logging
+import tempfile
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Fields summarized with rolling percentiles
+PERCENTILE_FIELDS = ('cpu_percent', 'system_cpu_percent', 'rss_bytes', 'open_fds', 'threads', 'gc_pause_ms')
+
+def default_metrics_dir() -> str:
+    """Directory where the workers on this host publish their summaries"""
+    return os.environ.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'smartdispute-metrics')
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 and max"""
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+    return {'p50': rank(0.5), 'p95': rank(0.95), 'p99': rank(0.99), 'max': round(ordered[-1], 2)}
+
+class _GCTimer:
+    """Collections and pause time from gc.callbacks, accumulated until the next sample"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = None
+        self.collections = 0
+        self.pause_seconds = 0.0
+        self.max_pause_seconds = 0.0
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._started = time.perf_counter()
+        elif self._started is not None:
+            elapsed = time.perf_counter() - self._started
+            self._started = None
+            with self._lock:
+                self.collections += 1
+                self.pause_seconds += elapsed
+                self.max_pause_seconds = max(self.max_pause_seconds, elapsed)
+
+    def drain(self):
+        with self._lock:
+            totals = (self.collections, self.pause_seconds, self.max_pause_seconds)
+            self.collections, self.pause_seconds, self.max_pause_seconds = 0, 0.0, 0.0
+        return totals
+
+class SystemMetrics:
+    """
+    Samples this process every ``interval`` seconds into the last ``size`` samples
+
+    Reads never touch psutil: health checks and the admin views get the
+    newest sample or percentiles over the buffer. CPU percentages are
+    measured since the previous sample, so nothing sleeps. Each sample is
+    also published as ``system-<pid>.json`` in the metrics directory so any
+    worker can report on all of its siblings.
+    """
+
+    def __init__(self, interval: float = None, size: int = None, directory: str = None, disk_path: str = None):
+        self.interval = interval or float(os.environ.get('SYSTEM_METRICS_INTERVAL', 10))
+        self.size = size or int(os.environ.get('SYSTEM_METRICS_SAMPLES', 360))
+        self.directory = directory or default_metrics_dir()
+        self.disk_path = disk_path or os.environ.get('SYSTEM_METRICS_DISK_PATH', '/')
+        self._samples = deque(maxlen=self.size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._process = None
+        self._gc = _GCTimer()
+
+    def start(self):
+        """Start this process's sampler (idempotent, and restarted after a fork)"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Samples and the psutil handle belong to the parent
+                self._samples.clear()
+                self._process = None
+                self._gc.drain()
+            self._pid = os.getpid()
+            if self._gc not in gc.callbacks:
+                gc.callbacks.append(self._gc)
+            self._thread = threading.Thread(target=self._run, name='system-metrics', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"System metrics sample failed: {str(e)}")
+            time.sleep(self.interval)
+
+    def sample(self) -> Dict[str, Any]:
+        """Record one sample now"""
+        collections, pause, max_pause = self._gc.drain()
+        sample = {
+            'timestamp': time.time(),
+            'pid': os.getpid(),
+            'threads': threading.active_count(),
+            'gc_collections': collections,
+            'gc_pause_ms': round(pause * 1000, 3),
+            'gc_max_pause_ms': round(max_pause * 1000, 3),
+            'gc_counts': list(gc.get_count())
+        }
+        if PSUTIL_AVAILABLE:
+            if self._process is None or self._process.pid != os.getpid():
+                self._process = psutil.Process()
+                # The first reading of cpu_percent(None) is meaningless; it starts the interval
+                self._process.cpu_percent(None)
+                psutil.cpu_percent(None)
+            process = self._process
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage(self.disk_path)
+            with process.oneshot():
+                sample.update({
+                    'cpu_percent': process.cpu_percent(None),
+                    'rss_bytes': process.memory_info().rss,
+                    'open_fds': process.num_fds() if hasattr(process, 'num_fds') else process.num_handles(),
+                    'threads': process.num_threads()
+                })
+            sample.update({
+                'system_cpu_percent': psutil.cpu_percent(None),
+                'memory_percent': memory.percent,
+                'memory_used_bytes': memory.used,
+                'memory_total_bytes': memory.total,
+                'memory_available_bytes': memory.available,
+                'disk_percent': round(disk.used / disk.total * 100, 2) if disk.total else 0.0,
+                'disk_used_bytes': disk.used,
+                'disk_total_bytes': disk.total,
+                'disk_free_bytes': disk.free
+            })
+        with self._lock:
+            self._samples.append(sample)
+        self._publish()
+        return sample
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Newest sample, taking one if the sampler hasn't produced any yet"""
+        with self._lock:
+            if self._samples:
+                return self._samples[-1]
+        return self.sample()
+
+    def samples(self, window: float = None) -> List[Dict[str, Any]]:
+        """Buffered samples, oldest first, optionally only the last ``window`` seconds"""
+        with self._lock:
+            samples = list(self._samples)
+        if window:
+            cutoff = time.time() - window
+            samples = [sample for sample in samples if sample['timestamp'] >= cutoff]
+        return samples
+
+    def summary(self, window: float = None) -> Dict[str, Any]:
+        """Latest sample and rolling percentiles for this process"""
+        samples = self.samples(window)
+        return {
+            'pid': os.getpid(),
+            'interval': self.interval,
+            'samples': len(samples),
+            'window_seconds': round(samples[-1]['timestamp'] - samples[0]['timestamp'], 1) if samples else 0.0,
+            'latest': samples[-1] if samples else None,
+            'gc_collections': sum(sample['gc_collections'] for sample in samples),
+            'percentiles': {
+                field: percentiles([sample[field] for sample in samples if sample.get(field) is not None])
+                for field in PERCENTILE_FIELDS
+            }
+        }
+
+    def workers(self) -> List[Dict[str, Any]]:
+        """Summaries published by every live worker on this host, including this one"""
+        stale_after = self.interval * 3
+        summaries = []
+        for path in glob.glob(os.path.join(self.directory, 'system-*.json')):
+            try:
+                if time.time() - os.path.getmtime(path) > stale_after:
+                    # Left behind by an exited worker
+                    os.unlink(path)
+                    continue
+                with open(path) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(summaries, key=lambda summary: summary['pid'])
+
+    def _publish(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"system-{os.getpid()}.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.summary(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Could not publish system metrics: {str(e)}")
+
+# Global system metrics sampler
+system_metrics = SystemMetrics()